@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from isa import Opcode
+
+
+class AluOperation(namedtuple("AluOperation", "function arity carry")):
+    """Операция АЛУ.
+
+    function -- function(верхний) или function(верхний, второй); arity -- сколько значений снимается со стека;
+    carry -- выставляет ли операция флаг переноса (результат проходит через check_carry). Операции без
+    переноса флаг не меняют.
+    """
+
+
+def divide(first, second):
+    if first == 0:
+        raise Exception("Division by zero")
+    return first // second
+
+
+alu_operations = {
+    Opcode.ADD: AluOperation(lambda first, second: first + second, 2, True),
+    Opcode.SUB: AluOperation(lambda first, second: first - second, 2, True),
+    Opcode.MUL: AluOperation(lambda first, second: first * second, 2, True),
+    Opcode.DIV: AluOperation(divide, 2, True),
+    Opcode.MOD: AluOperation(lambda first, second: first % second, 2, False),
+    Opcode.NEGATE: AluOperation(lambda first: -first, 1, True),
+    Opcode.EQUAL: AluOperation(lambda first, second: int(first == second), 2, False),
+    Opcode.LESS: AluOperation(lambda first, second: int(first < second), 2, False),
+    Opcode.GREATER: AluOperation(lambda first, second: int(first > second), 2, False),
+    Opcode.AND: AluOperation(lambda first, second: first & second, 2, False),
+    Opcode.OR: AluOperation(lambda first, second: first | second, 2, False),
+    Opcode.XOR: AluOperation(lambda first, second: first ^ second, 2, False),
+    Opcode.INVERT: AluOperation(lambda first: ~first, 1, False),
+}
+
+WORD_BITS = (16, 32, 64)
+
+
+class WordModel(namedtuple("WordModel", "bits minimum maximum wrap")):
+    """Машинное слово для операций с переносом.
+
+    Результат вне [minimum, maximum] выставляет перенос и приводится функцией wrap. bits=None -- прежняя
+    модель: границы 32-битные, wrap однократно вычитает 2 ** 31, значения не ограничены. Иначе -- слово
+    из bits бит в дополнительном коде: wrap оставляет младшие bits бит, перенос -- результат не поместился.
+    """
+
+
+def word_model(bits=None):
+    if bits is None:
+        return WordModel(None, -2 ** 31, 2 ** 31 - 1, lambda value: value - 2 ** 31)
+    if bits not in WORD_BITS:
+        raise ValueError(f"Unsupported word width: {bits}")
+    half = 1 << (bits - 1)
+    mask = (1 << bits) - 1
+    return WordModel(bits, -half, half - 1, lambda value: ((value + half) & mask) - half)
+
+
+binary_opcodes = frozenset(opcode for opcode, operation in alu_operations.items() if operation.arity == 2)
@@ -0,0 +1,159 @@
+import itertools
+
+import pytest
+
+import machine
+from alu import WORD_BITS, alu_operations, word_model
+from isa import Opcode
+from machine_test import assert_same_state, load_golden, run_engine
+
+VALUES = [-2 ** 32, -2 ** 31 - 1, -2 ** 31, -2 ** 31 + 1, -65536, -7, -1, 0, 1, 2, 7, 65535,
+          2 ** 31 - 2, 2 ** 31 - 1, 2 ** 31, 2 ** 32, 3 * 2 ** 31]
+OPERANDS = {
+    Opcode.ADD: "+", Opcode.SUB: "-", Opcode.MUL: "*", Opcode.DIV: "/", Opcode.MOD: "%", Opcode.NEGATE: "--",
+    Opcode.EQUAL: "==", Opcode.LESS: "<", Opcode.GREATER: ">", Opcode.AND: "&", Opcode.OR: "|", Opcode.XOR: "^",
+    Opcode.INVERT: "~",
+}
+
+
+def reference_alu(operand, first, second, carry):
+    """Прежний Datapath.alu (цепочка if по строке операции) и check_carry: (результат, перенос)."""
+
+    def check_carry(value):
+        nonlocal carry
+        if value < -2 ** 31 or value > 2 ** 31 - 1:
+            carry = 1
+            value -= 2 ** 31
+        else:
+            carry = 0
+        return value
+
+    value = 0
+    if operand == "+":
+        value = check_carry(first + second)
+    if operand == "-":
+        value = check_carry(first - second)
+    if operand == "*":
+        value = check_carry(first * second)
+    if operand == "/":
+        if first == 0:
+            raise Exception("Division by zero")
+        value = check_carry(first // second)
+    if operand == "~":
+        value = ~first
+    if operand == "%":
+        value = first % second
+    if operand == "&":
+        value = first & second
+    if operand == "|":
+        value = first | second
+    if operand == "^":
+        value = first ^ second
+    if operand == "--":
+        value = check_carry(-first)
+    if operand == "==":
+        value = int(first == second)
+    if operand == ">":
+        value = int(first > second)
+    if operand == "<":
+        value = int(first < second)
+    return value, carry
+
+
+def outcome(function):
+    try:
+        return function()
+    except Exception as error:
+        return type(error), str(error)
+
+
+def make_data_path(first, second, carry):
+    data_path = machine.Datapath(10, [], [], 0)
+    data_path.stack.push(second)
+    data_path.stack.push(first)
+    data_path.carry = carry
+    return data_path
+
+
+@pytest.mark.parametrize("opcode", list(alu_operations))
+def test_alu_table_matches_reference(opcode):
+    assert set(OPERANDS) == set(alu_operations)
+    unary = alu_operations[opcode].arity == 1
+    for first, second, carry in itertools.product(VALUES, VALUES, (0, 1)):
+        expected = outcome(lambda: reference_alu(OPERANDS[opcode], first, second, carry))
+
+        data_path = make_data_path(first, second, carry)
+
+        def run_datapath(data_path=data_path):
+            data_path.alu(opcode)
+            return data_path.alu_result, data_path.carry
+
+        assert outcome(run_datapath) == expected, (opcode, first, second, carry)
+        if not isinstance(expected[0], type):
+            # операнды сняты: под ними начальные нули стека данных (для унарной операции -- второй)
+            assert list(data_path.stack) == ([0, 0, second] if unary else [0, 0])
+
+        data_path = make_data_path(first, second, carry)
+        handler = machine.handler_builders[opcode](machine.PredecodedControlUnit(data_path), 0, None)
+
+        def run_handler(data_path=data_path, handler=handler):
+            handler()
+            return data_path.stack.first, data_path.carry
+
+        assert outcome(run_handler) == expected, (opcode, first, second, carry)
+
+
+@pytest.mark.parametrize("bits", WORD_BITS)
+@pytest.mark.parametrize("opcode", [opcode for opcode, operation in alu_operations.items() if operation.carry])
+def test_word_model_wraps_in_twos_complement(opcode, bits):
+    half = 1 << (bits - 1)
+    values = [-half, -half + 1, -7, -1, 1, 7, half - 2, half - 1]
+    operation = alu_operations[opcode]
+    for first, second in itertools.product(values, values):
+        exact = operation.function(first) if operation.arity == 1 else operation.function(first, second)
+        wrapped = (exact + half) % (1 << bits) - half
+        expected = wrapped, int(wrapped != exact)  # перенос -- результат не поместился в слово
+
+        data_path = machine.Datapath(10, [], [], 0, word_bits=bits)
+        data_path.stack.push(second)
+        data_path.stack.push(first)
+        data_path.alu(opcode)
+        assert (data_path.alu_result, data_path.carry) == expected, (first, second)
+
+        data_path = machine.Datapath(10, [], [], 0, word_bits=bits)
+        data_path.stack.push(second)
+        data_path.stack.push(first)
+        machine.handler_builders[opcode](machine.PredecodedControlUnit(data_path), 0, None)()
+        assert (data_path.stack.first, data_path.carry) == expected, (first, second)
+
+
+@pytest.mark.parametrize("engine", ["predecoded", "fused"])
+@pytest.mark.parametrize("bits", WORD_BITS)
+def test_engines_agree_on_word_width(engine, bits):
+    golden = load_golden("carry_check")
+    assert_same_state(*run_engine(golden, engine, word_bits=bits), *run_engine(golden, "mc", word_bits=bits))
+
+
+PUSH_WIDE = """0x9C40 VARIABLE big
+_start:
+    lit 40000
+    out 2
+    lit big @
+    out 2
+    in 0
+    out 2
+    halt"""
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+@pytest.mark.parametrize(("bits", "expected"), [(16, "-25536"), (32, "40000"), (None, "40000")])
+def test_lit_fetch_and_in_push_values_that_fit_the_word(engine, bits, expected):
+    golden = {"in_code": PUSH_WIDE, "in_stdin": chr(40000)}
+    data_path, control_unit = run_engine(golden, engine, word_bits=bits)
+    assert "".join(data_path.output_buffer0) == expected * 3
+    assert_same_state(data_path, control_unit, *run_engine(golden, "mc", word_bits=bits))
+
+
+def test_unknown_word_width_is_rejected():
+    with pytest.raises(ValueError, match="word width"):
+        word_model(24)
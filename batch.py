@@ -0,0 +1,98 @@
+"""Пакетный запуск модели: много пар (программа, ввод) на пуле процессов.
+
+Манифест -- JSON lines, по заданию на строку:
+    {"binary": "sort.bin", "input": "in/0.txt", "limit": 100000}
+limit необязателен. Относительные пути отсчитываются от каталога манифеста.
+
+Результаты выводятся JSON lines в порядке завершения заданий:
+    {"job": 0, "binary": ..., "input": ..., "status": "halted", "output": ..., "ticks": ...}
+status: halted -- останов по HALT, limit -- исчерпан лимит тактов, error -- исключение (текст в "error").
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import multiprocessing
+import os
+import sys
+
+import machine
+from image import ProgramImage
+
+DEFAULT_LIMIT = 200000000
+
+
+def read_manifest(path):
+    """Задания из манифеста: словари с ключами job, binary, input, limit."""
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            jobs.append({
+                "job": len(jobs),
+                "binary": os.path.join(base, entry["binary"]),
+                "input": os.path.join(base, entry["input"]),
+                "limit": entry.get("limit", DEFAULT_LIMIT),
+            })
+    return jobs
+
+
+@functools.lru_cache(maxsize=64)
+def load_program(path):
+    """Образ программы (image.ProgramImage). Кэшируется в процессе: каждый исполнитель разбирает файл один раз,
+    а образы, загруженные до создания пула, исполнители получают от родителя без копирования."""
+    return ProgramImage.load(path)
+
+
+def run_job(job, engine="predecoded", data_memory_size=3000):
+    result = {"job": job["job"], "binary": job["binary"], "input": job["input"]}
+    try:
+        image = load_program(job["binary"])
+        with open(job["input"], encoding="utf-8") as file:
+            input_tokens = list(file.read())
+        # итог останова report_halt() печатает в stdout -- в пакетном режиме он не нужен
+        with contextlib.redirect_stdout(io.StringIO()):
+            output, ticks = machine.simulation(image, image.code_len, input_tokens, data_memory_size, job["limit"], engine)
+    except Exception as error:
+        result.update(status="error", error=f"{type(error).__name__}: {error}")
+        return result
+    result.update(status="limit" if ticks >= job["limit"] else "halted", output=output, ticks=ticks)
+    return result
+
+
+def run(jobs, workers=None, engine="predecoded", data_memory_size=3000, chunksize=1):
+    """Генератор результатов в порядке завершения. workers=1 -- без пула, в текущем процессе."""
+    worker = functools.partial(run_job, engine=engine, data_memory_size=data_memory_size)
+    if workers == 1:
+        yield from map(worker, jobs)
+        return
+    for path in {job["binary"] for job in jobs}:
+        # ошибку загрузки сообщит исполнитель в результате задания
+        with contextlib.suppress(Exception):
+            load_program(path)
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(worker, jobs, chunksize)
+
+
+def main(manifest, out, workers=None, engine="predecoded", data_memory_size=3000, chunksize=1):
+    for result in run(read_manifest(manifest), workers, engine, data_memory_size, chunksize):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетный запуск модели по манифесту (JSON lines).")
+    parser.add_argument("manifest")
+    parser.add_argument("--workers", type=int, help="число процессов (по умолчанию -- число ядер)")
+    parser.add_argument("--engine", choices=machine.ENGINES, default="predecoded")
+    parser.add_argument("--memory-size", type=int, default=3000, help="число ячеек памяти данных после программы")
+    parser.add_argument("--chunksize", type=int, default=1, help="заданий на одну передачу исполнителю")
+    parser.add_argument("--output", help="файл результатов (по умолчанию stdout)")
+    args = parser.parse_args()
+    with open(args.output, "w", encoding="utf-8") if args.output else contextlib.nullcontext(sys.stdout) as out:
+        main(args.manifest, out, args.workers, args.engine, args.memory_size, args.chunksize)
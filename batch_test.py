@@ -0,0 +1,56 @@
+import contextlib
+import io
+import json
+import os
+
+import batch
+import machine
+import translator
+from isa import bin_to_opcode
+
+INPUTS = ["5Artem", "3Bob", "5Alice", "4Anna"]
+
+
+def write_job_files(directory):
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.main(os.path.join("examples", "hello_user_name"), os.path.join(directory, "hello.bin"))
+    lines = []
+    for number, text in enumerate(INPUTS):
+        with open(os.path.join(directory, f"{number}.txt"), "w", encoding="utf-8") as file:
+            file.write(text)
+        lines.append({"binary": "hello.bin", "input": f"{number}.txt"})
+    lines.append({"binary": "hello.bin", "input": "0.txt", "limit": 50})
+    lines.append({"binary": "missing.bin", "input": "0.txt"})
+    manifest = os.path.join(directory, "manifest.jsonl")
+    with open(manifest, "w", encoding="utf-8") as file:
+        file.write("\n".join(json.dumps(line) for line in lines) + "\n")
+    return manifest
+
+
+def test_batch_matches_single_runs(tmp_path):
+    manifest = write_job_files(tmp_path)
+    out = io.StringIO()
+    batch.main(manifest, out, workers=2)
+    results = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda result: result["job"])
+    assert [result["job"] for result in results] == list(range(len(INPUTS) + 2))
+
+    with open(os.path.join(tmp_path, "hello.bin"), "rb") as file:
+        code, code_len = bin_to_opcode(bytearray(file.read()))
+    for text, result in zip(INPUTS, results):
+        with contextlib.redirect_stdout(io.StringIO()):
+            output, ticks = machine.simulation(code, code_len, list(text), 3000, batch.DEFAULT_LIMIT, "mc")
+        assert result["status"] == "halted"
+        assert (result["output"], result["ticks"]) == (output, ticks)
+
+    assert results[-2]["status"] == "limit"
+    assert results[-2]["ticks"] >= 50
+    assert results[-1]["status"] == "error"
+    assert "FileNotFoundError" in results[-1]["error"]
+
+
+def test_worker_decodes_binary_once(tmp_path):
+    jobs = batch.read_manifest(write_job_files(tmp_path))[:len(INPUTS)]
+    batch.load_program.cache_clear()
+    results = list(batch.run(jobs, workers=1))
+    assert all(result["status"] == "halted" for result in results)
+    assert batch.load_program.cache_info().misses == 1
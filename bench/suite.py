@@ -0,0 +1,196 @@
+"""Набор замеров производительности транслятора и модели с сохранением результатов в JSON.
+
+Запуск из корня репозитория:
+    python -m bench.suite [--output results.json] [--baseline baseline.json] [--tolerance 0.1] [--repeat N]
+
+Замеры:
+  * translate/<программа> -- термов в секунду через translate_stage_1 + translate_stage_2;
+  * translate_stream/<программа> -- то же через потоковый Translator.translate;
+  * decode/<программа> -- байт образа в секунду через isa.bin_to_opcode;
+  * simulate/<программа>/<движок>/<уровень> -- инструкций и тактов модели в секунду.
+
+Программы -- examples/* и синтетические (synthetic_*), которые строятся генератором ниже.
+С --baseline каждая метрика сравнивается с сохранённой; падение больше tolerance считается
+регрессией, код возврата -- 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+import machine
+from isa import bin_to_opcode, to_bytes
+from tracing import TraceLevel, TraceSink
+from translator import Translator
+
+LIMIT = 200000000
+LOW_LEVELS = (TraceLevel.NONE, TraceLevel.INSTRUCTION)
+# (программа, ввод, уровни трассировки для simulate); подробная трассировка длинных прогонов идёт минутами
+SIMULATED = [
+    ("prob1", "", LOW_LEVELS),
+    ("sort", "5Artem", tuple(TraceLevel)),
+    ("hello_user_name", "5Artem", tuple(TraceLevel)),
+    ("synthetic_loop", "", LOW_LEVELS),
+]
+TRANSLATED = ["arifm", "cat", "hello_user_name", "hello_world", "prob1", "sort", "test_sort", "synthetic_large"]
+# метрики «чем больше, тем лучше»
+METRICS = ("terms_per_sec", "bytes_per_sec", "instructions_per_sec", "ticks_per_sec")
+
+
+def synthetic_source(name):
+    """synthetic_large -- длинная прямолинейная программа (трансляция, декодирование),
+    synthetic_loop -- цикл со счётчиком в памяти (исполнение)."""
+    if name == "synthetic_large":
+        lines = [f"0x{number:x} VARIABLE var{number}" for number in range(200)]
+        lines.append("_start:")
+        for number in range(2000):
+            lines.append(f"    lit var{number % 200} lit {number} ! lit var{number % 200} @ dup + drop")
+            if number % 50 == 0:
+                lines.append(f"label{number}:")
+        lines.append("    halt")
+        return "\n".join(lines)
+    if name == "synthetic_loop":
+        body = "\n".join("    lit 3 lit 4 + lit 5 * drop" for _ in range(8))
+        return f"""0x0 VARIABLE counter
+_start:
+    lit counter lit 2000 !
+loop:
+{body}
+    lit 1 lit counter @ -
+    dup
+    if end
+    lit counter swap !
+    jump loop
+end:
+    halt"""
+    with open(os.path.join("examples", name), encoding="utf-8") as file:
+        return file.read()
+
+
+def translate(source):
+    translator = Translator()
+    code = translator.translate_stage_2(translator.translate_stage_1(source))
+    return to_bytes(code, translator.get_first_executable_instr())
+
+
+def translate_stream(source):
+    return Translator().translate(source.split("\n"))
+
+
+def best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class CountingSink(TraceSink):
+    level = TraceLevel.INSTRUCTION
+
+    def __init__(self):
+        self.count = -1  # первый вызов -- начальное состояние
+
+    def instruction(self, control_unit):
+        self.count += 1
+
+
+def simulate(binary, input_text, engine, trace):
+    code, code_len = bin_to_opcode(bytearray(binary))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return machine.simulation(code, code_len, list(input_text), 3000, LIMIT, engine, trace)
+
+
+def run(repeat):
+    results = {}
+    for name in TRANSLATED:
+        source = synthetic_source(name)
+        terms = len(Translator().text_to_terms(source))
+        elapsed = best_of(repeat, translate, source)
+        results[f"translate/{name}"] = {"seconds": elapsed, "terms": terms, "terms_per_sec": terms / elapsed}
+        elapsed = best_of(repeat, translate_stream, source)
+        results[f"translate_stream/{name}"] = {"seconds": elapsed, "terms": terms, "terms_per_sec": terms / elapsed}
+
+        binary = bytearray(translate(source))
+        elapsed = best_of(repeat, bin_to_opcode, binary)
+        results[f"decode/{name}"] = {"seconds": elapsed, "bytes": len(binary), "bytes_per_sec": len(binary) / elapsed}
+
+    for name, input_text, levels in SIMULATED:
+        binary = translate(synthetic_source(name))
+        counter = CountingSink()
+        _, ticks = simulate(binary, input_text, "predecoded", counter)
+        for engine in machine.ENGINES:
+            for level in levels:
+                times = 1 if level > TraceLevel.INSTRUCTION else repeat
+                elapsed = best_of(times, simulate, binary, input_text, engine, level)
+                results[f"simulate/{name}/{engine}/{level.name.lower()}"] = {
+                    "seconds": elapsed,
+                    "instructions": counter.count,
+                    "ticks": ticks,
+                    "instructions_per_sec": counter.count / elapsed,
+                    "ticks_per_sec": ticks / elapsed,
+                }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Строки сравнения и список регрессий (ключ, метрика, отношение к базовому значению)."""
+    lines, regressions = [], []
+    for key, values in results.items():
+        old = baseline.get(key)
+        if old is None:
+            lines.append(f"{key:<48} new")
+            continue
+        for metric in METRICS:
+            if metric in values and old.get(metric):
+                ratio = values[metric] / old[metric]
+                mark = ""
+                if ratio < 1 - tolerance:
+                    regressions.append((key, metric, ratio))
+                    mark = "  REGRESSION"
+                lines.append(f"{key:<48} {metric:<22} {ratio:>7.2f}x{mark}")
+    return lines, regressions
+
+
+def main(output, baseline_path, tolerance, repeat):
+    # журнал форматируется, но никуда не пишется: измеряется стоимость построения строк
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [logging.StreamHandler(io.StringIO())]
+
+    results = run(repeat)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    for key, values in results.items():
+        rates = ", ".join(f"{metric} {values[metric]:.0f}" for metric in METRICS if metric in values)
+        print(f"{key:<48} {values['seconds'] * 1000:>10.2f} ms  {rates}")
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        lines, regressions = compare(results, baseline, tolerance)
+        print()
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности транслятора и модели.")
+    parser.add_argument("--output", help="записать результаты в JSON")
+    parser.add_argument("--baseline", help="сравнить с ранее сохранёнными результатами")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="допустимое падение метрики (доля)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(main(args.output, args.baseline, args.tolerance, args.repeat))
@@ -0,0 +1,81 @@
+"""Стоимость трассировки: время simulation() на каждом уровне против «голого» цикла движка.
+
+Запуск из корня репозитория:
+    python -m bench.trace_levels [--repeat N]
+
+«raw» -- control_unit.run() без приёмника трассировки и без simulation(); «none» должен быть
+к нему близок, остальные уровни показывают цену форматирования журнала.
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+import machine
+import translator
+from isa import bin_to_opcode
+from tracing import TraceLevel
+
+PROGRAMS = [("prob1", ""), ("sort", "5Artem"), ("hello_user_name", "Artem\n")]
+LIMIT = 200000000
+
+
+def translate(name):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        target = os.path.join(tmpdirname, "target.bin")
+        with contextlib.redirect_stdout(io.StringIO()):
+            translator.main(os.path.join("examples", name), target)
+        with open(target, "rb") as file:
+            return file.read()
+
+
+def run_raw(binary, input_text, engine):
+    code, code_len = bin_to_opcode(bytearray(binary))
+    control_unit = machine.ENGINES[engine](machine.Datapath(3000, list(input_text), code, code_len))
+    with contextlib.suppress(StopIteration):
+        control_unit.run(LIMIT)
+
+
+def run_level(binary, input_text, engine, level):
+    code, code_len = bin_to_opcode(bytearray(binary))
+    machine.simulation(code, code_len, list(input_text), 3000, LIMIT, engine, level)
+
+
+def best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(repeat):
+    # журнал форматируется, но никуда не пишется: измеряется стоимость построения строк
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [logging.StreamHandler(io.StringIO())]
+
+    print(f"{'program':<16}{'engine':<12}{'level':<13}{'ms':>10}{'x raw':>8}")
+    for name, input_text in PROGRAMS:
+        binary = translate(name)
+        for engine in machine.ENGINES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                raw = best_of(repeat, run_raw, binary, input_text, engine)
+            print(f"{name:<16}{engine:<12}{'raw':<13}{raw * 1000:>10.1f}{1:>8.2f}")
+            for level in TraceLevel:
+                # полная трассировка prob1 на mc идёт минутами -- достаточно одного прогона
+                times = 1 if level > TraceLevel.NONE and name == "prob1" else repeat
+                with contextlib.redirect_stdout(io.StringIO()):
+                    elapsed = best_of(times, run_level, binary, input_text, engine, level)
+                print(f"{'':<16}{'':<12}{level.name.lower():<13}{elapsed * 1000:>10.1f}{elapsed / raw:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Стоимость уровней трассировки.")
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args().repeat)
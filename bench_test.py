@@ -0,0 +1,23 @@
+from bench import suite
+
+
+def test_compare_flags_drops_over_tolerance():
+    baseline = {
+        "decode/sort": {"seconds": 1.0, "bytes_per_sec": 100.0},
+        "simulate/sort/mc/none": {"seconds": 1.0, "instructions_per_sec": 100.0, "ticks_per_sec": 300.0},
+    }
+    results = {
+        "decode/sort": {"seconds": 1.05, "bytes_per_sec": 95.0},
+        "simulate/sort/mc/none": {"seconds": 2.0, "instructions_per_sec": 50.0, "ticks_per_sec": 330.0},
+        "translate/sort": {"seconds": 1.0, "terms_per_sec": 10.0},
+    }
+    lines, regressions = suite.compare(results, baseline, 0.1)
+    assert regressions == [("simulate/sort/mc/none", "instructions_per_sec", 0.5)]
+    assert any(line.startswith("translate/sort") and line.endswith("new") for line in lines)
+
+
+def test_synthetic_programs_translate():
+    for name in ("synthetic_large", "synthetic_loop"):
+        assert suite.translate(suite.synthetic_source(name))
+    _, ticks = suite.simulate(suite.translate(suite.synthetic_source("synthetic_loop")), "", "predecoded", 0)
+    assert ticks < suite.LIMIT
@@ -0,0 +1,118 @@
+class Cache:
+    """Модель кэша перед памятью (выборка инструкций, `@` и `!`).
+
+    Размеры задаются в ячейках памяти и должны быть степенями двойки. Набор (set) хранит номера строк
+    в порядке вытеснения: слева -- кандидат на вытеснение. При LRU попадание переносит строку в конец,
+    при FIFO порядок не меняется.
+
+    access() возвращает штраф в тактах:
+      * промах -- miss_ticks (загрузка строки);
+      * write-back: вытеснение изменённой строки -- ещё write_ticks; запись размещает строку в кэше;
+      * write-through: каждая запись -- write_ticks, промах по записи строку не размещает.
+    """
+
+    def __init__(self, size=64, line_size=4, associativity=2, replacement="lru", write_policy="back",
+                 miss_ticks=10, write_ticks=10):
+        for name, value in (("size", size), ("line_size", line_size), ("associativity", associativity)):
+            if value <= 0 or value & (value - 1):
+                raise ValueError(f"Cache {name} should be a power of two: {value}")
+        if size < line_size * associativity:
+            raise ValueError("Cache size should hold at least one set")
+        if replacement not in ("lru", "fifo"):
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+        if write_policy not in ("back", "through"):
+            raise ValueError(f"Unknown write policy: {write_policy}")
+        self.size = size
+        self.line_size = line_size
+        self.associativity = associativity
+        self.replacement = replacement
+        self.write_policy = write_policy
+        self.miss_ticks = miss_ticks
+        self.write_ticks = write_ticks
+
+        self.offset_bits = line_size.bit_length() - 1
+        self.set_mask = size // (line_size * associativity) - 1
+        self.sets = [[] for _ in range(self.set_mask + 1)]
+        self.lru = replacement == "lru"
+        self.write_back = write_policy == "back"
+        self.dirty = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def access(self, address, write=False):
+        """Обращение к ячейке address. Возвращает штраф в тактах."""
+        line = address >> self.offset_bits
+        ways = self.sets[line & self.set_mask]
+        penalty = 0
+        if line in ways:
+            self.hits += 1
+            if self.lru and ways[-1] != line:
+                ways.remove(line)
+                ways.append(line)
+        else:
+            self.misses += 1
+            if write and not self.write_back:
+                return self.write_ticks
+            penalty = self.miss_ticks
+            if len(ways) == self.associativity:
+                victim = ways.pop(0)
+                self.evictions += 1
+                if victim in self.dirty:
+                    self.dirty.discard(victim)
+                    self.writebacks += 1
+                    penalty += self.write_ticks
+            ways.append(line)
+        if write:
+            if self.write_back:
+                self.dirty.add(line)
+            else:
+                penalty += self.write_ticks
+        return penalty
+
+    def geometry(self):
+        """Параметры, от которых зависит смысл содержимого наборов."""
+        return {
+            "size": self.size,
+            "line_size": self.line_size,
+            "associativity": self.associativity,
+            "replacement": self.replacement,
+            "write_policy": self.write_policy,
+        }
+
+    def state(self):
+        """Содержимое кэша, его параметры и счётчики (для контрольной точки)."""
+        return {
+            "geometry": self.geometry(),
+            "sets": [list(ways) for ways in self.sets],
+            "dirty": sorted(self.dirty),
+            "counters": [self.hits, self.misses, self.evictions, self.writebacks],
+        }
+
+    def restore(self, state):
+        if state.get("geometry") != self.geometry():
+            raise ValueError("Cache geometry does not match the checkpoint")
+        self.sets = [list(ways) for ways in state["sets"]]
+        self.dirty = set(state["dirty"])
+        self.hits, self.misses, self.evictions, self.writebacks = state["counters"]
+
+    def stats(self):
+        accesses = self.hits + self.misses
+        return {
+            "accesses": accesses,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "writebacks": self.writebacks,
+            "hit_rate": self.hits / accesses if accesses else 0.0,
+        }
+
+    def __str__(self):
+        stats = self.stats()
+        return (f"Cache: size {self.size}, line {self.line_size}, {self.associativity}-way, "
+                f"{self.replacement}, write-{self.write_policy}; "
+                f"accesses: {stats['accesses']}, hits: {stats['hits']}, misses: {stats['misses']}, "
+                f"evictions: {stats['evictions']}, writebacks: {stats['writebacks']}, "
+                f"hit rate: {stats['hit_rate']:.2%}")
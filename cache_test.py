@@ -0,0 +1,54 @@
+import pytest
+
+from cache import Cache
+
+
+def test_lru_keeps_recently_used_line():
+    # один набор на две строки по 4 ячейки
+    cache = Cache(size=8, line_size=4, associativity=2, replacement="lru", miss_ticks=5)
+    assert cache.access(0) == 5
+    assert cache.access(1) == 0  # та же строка
+    assert cache.access(4) == 5
+    assert cache.access(0) == 0  # строка 0 становится самой свежей
+    assert cache.access(8) == 5  # вытесняет строку 4
+    assert cache.access(0) == 0
+    assert cache.access(4) == 5
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 4, 2)
+
+
+def test_fifo_ignores_hits():
+    cache = Cache(size=8, line_size=4, associativity=2, replacement="fifo", miss_ticks=5)
+    for address in (0, 4, 0, 8):
+        cache.access(address)
+    assert cache.access(0) == 5  # строка 0 была загружена первой и вытеснена
+    assert cache.access(8) == 0
+
+
+def test_write_back_pays_on_dirty_eviction():
+    cache = Cache(size=4, line_size=4, associativity=1, write_policy="back", miss_ticks=5, write_ticks=3)
+    assert cache.access(0, write=True) == 5
+    assert cache.access(1, write=True) == 0
+    assert cache.access(4) == 5 + 3
+    assert cache.access(8) == 5  # строка 4 чистая
+    assert cache.writebacks == 1
+
+
+def test_write_through_pays_every_write_without_allocation():
+    cache = Cache(size=4, line_size=4, associativity=1, write_policy="through", miss_ticks=5, write_ticks=3)
+    assert cache.access(0, write=True) == 3
+    assert cache.access(0) == 5  # промах по записи строку не размещает
+    assert cache.access(1, write=True) == 3
+    assert cache.writebacks == 0
+    assert cache.stats()["hit_rate"] == pytest.approx(1 / 3)
+
+
+@pytest.mark.parametrize(("options", "message"), [
+    ({"size": 48}, "power of two"),
+    ({"line_size": 3}, "power of two"),
+    ({"size": 4, "line_size": 4, "associativity": 2}, "at least one set"),
+    ({"replacement": "random"}, "replacement policy"),
+    ({"write_policy": "around"}, "write policy"),
+])
+def test_invalid_configuration(options, message):
+    with pytest.raises(ValueError, match=message):
+        Cache(**options)
@@ -0,0 +1,169 @@
+"""Контрольные точки модели: сохранение состояния процессора в файл и продолжение с него.
+
+Формат файла (little-endian):
+    MAGIC, версия (u32);
+    длина и JSON состояния -- регистры, такт, стеки, порты ввода-вывода, кэш, размер и номера страниц памяти;
+    длина и zlib(words) -- слова памяти (array('q')) сохранённых страниц подряд; если значение не помещается
+        в 64 бита (модель слова без заворачивания), в состоянии wide_words, а слова -- списком JSON;
+    длина и zlib(kinds) -- виды ячеек тех же страниц.
+Сохраняются страницы, изменённые после загрузки образа (Memory.dirty_pages), остальные при продолжении
+берутся из образа. У плотной памяти страница одна -- вся память; точка версии 1 читается так же.
+
+Точка пишется только между инструкциями, поэтому состояние не зависит от движка: точку,
+записанную одним движком, можно продолжить другим. Таблица инструкций памяти не сохраняется --
+она строится заново по образу программы, перезаписанные ячейки кода определяются по kinds.
+У порта ввода из потока сохраняются позиция в потоке и остаток текущего блока (ports.InputPort.state):
+поток должен поддерживать seek, при продолжении тот же поток передаётся порту снова. У порта вывода
+в поток сохраняется только то, что не ушло в поток (ничего).
+"""
+import json
+import struct
+import zlib
+from array import array
+from collections import namedtuple
+from pathlib import Path
+
+from memory import CELL_DATA
+
+MAGIC = b"CSACHKPT"
+VERSION = 2
+SECTION = struct.Struct("<I")
+
+Checkpoint = namedtuple("Checkpoint", "state words kinds")
+
+
+def stack_state(stack):
+    # регистры сохраняются отдельно: при глубине меньше двух в них остаются прежние значения (их видно в журнале)
+    return {"values": list(stack), "first": stack.first, "second": stack.second}
+
+
+def restore_stack(stack, state):
+    stack.drop(len(stack))
+    for value in state["values"]:
+        stack.push(value)
+    stack.first, stack.second = state["first"], state["second"]
+
+
+def capture(control_unit):
+    """Состояние процессора между инструкциями."""
+    data_path = control_unit.data_path
+    memory = data_path.data_memory
+    state = {
+        "tick": control_unit.get_tick(),
+        "pc": data_path.program_counter,
+        "mpc": control_unit.mpc,
+        "halted": control_unit.halted,
+        "next_command": control_unit.next_command,
+        "a": data_path.a,
+        "carry": data_path.carry,
+        "alu_result": data_path.alu_result,
+        "code_len": data_path.code_len,
+        "program_size": len(memory.instructions),
+        "memory_size": len(memory),
+        "stack": stack_state(data_path.stack),
+        "return_stack": stack_state(data_path.return_stack),
+        "buffers": {number: port.state() for number, port in data_path.ports.items()},
+        "cache": data_path.cache.state() if data_path.cache is not None else None,
+        "word_bits": data_path.word.bits,
+        "page_size": memory.page_size,
+        "pages": memory.dirty_pages(),
+    }
+    words, kinds = [], bytearray()
+    for number in state["pages"]:
+        page_words, page_kinds = memory.page(number)
+        words.extend(page_words)
+        kinds += page_kinds
+    try:
+        words = array("q", words)
+    except OverflowError:
+        state["wide_words"] = True
+    return Checkpoint(state, words, kinds)
+
+
+def write(path, control_unit):
+    """Записать контрольную точку. Файл заменяется атомарно: прерванная запись не портит прежнюю точку."""
+    state, words, kinds = capture(control_unit)
+    packed = json.dumps(words).encode("utf-8") if state.get("wide_words") else words.tobytes()
+    sections = [json.dumps(state).encode("utf-8"), zlib.compress(packed), zlib.compress(bytes(kinds))]
+    staging = f"{path}.tmp"
+    with open(staging, "wb") as file:
+        file.write(MAGIC + SECTION.pack(VERSION))
+        for section in sections:
+            file.write(SECTION.pack(len(section)))
+            file.write(section)
+    Path(staging).replace(path)
+
+
+def read(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"Not a checkpoint file: {path}")
+    position = len(MAGIC)
+    (version,) = SECTION.unpack_from(data, position)
+    if version not in (1, VERSION):
+        raise ValueError(f"Unsupported checkpoint version: {version}")
+    position += SECTION.size
+    sections = []
+    for _ in range(3):
+        (length,) = SECTION.unpack_from(data, position)
+        position += SECTION.size
+        sections.append(data[position:position + length])
+        position += length
+    state = json.loads(sections[0])
+    if state.get("wide_words"):
+        words = json.loads(zlib.decompress(sections[1]))
+    else:
+        words = array("q")
+        words.frombytes(zlib.decompress(sections[1]))
+    if version == 1:  # вся память одной страницей
+        state["page_size"], state["pages"] = state["memory_size"], [0]
+    return Checkpoint(state, words, bytearray(zlib.decompress(sections[2])))
+
+
+def restore_datapath(checkpoint, data_path):
+    """Перенести состояние в только что созданный Datapath той же программы (до создания ControlUnit:
+    предекодирующие движки разбирают уже восстановленную память)."""
+    state = checkpoint.state
+    memory = data_path.data_memory
+    if (state["code_len"], state["program_size"], state["memory_size"]) != (
+            data_path.code_len, len(memory.instructions), len(memory)):
+        raise ValueError("Checkpoint does not match the program or memory size")
+    if (data_path.cache is None) != (state["cache"] is None):
+        raise ValueError("Checkpoint cache model does not match")
+    if state.get("word_bits") != data_path.word.bits:
+        raise ValueError("Checkpoint word width does not match")
+
+    page_size = state["page_size"]
+    position = 0
+    for number in state["pages"]:
+        start = number * page_size
+        length = min(page_size, len(memory) - start)
+        kinds = checkpoint.kinds[position:position + length]
+        for address in range(start, min(start + length, len(memory.instructions))):
+            if memory.kinds[address] != kinds[address - start]:
+                if kinds[address - start] != CELL_DATA:
+                    raise ValueError("Checkpoint does not match the program")
+                memory.overwrite(address)
+        memory.load(start, checkpoint.words[position:position + length], kinds)
+        position += length
+
+    data_path.program_counter = state["pc"]
+    data_path.a = state["a"]
+    data_path.carry = state["carry"]
+    data_path.alu_result = state["alu_result"]
+    restore_stack(data_path.stack, state["stack"])
+    restore_stack(data_path.return_stack, state["return_stack"])
+    # обработчики predecoded держат ссылки на порты -- состояние меняется на месте
+    for number, values in state["buffers"].items():
+        data_path.ports[int(number)].restore(values)
+    if data_path.cache is not None:
+        data_path.cache.restore(state["cache"])
+
+
+def restore_control_unit(checkpoint, control_unit):
+    state = checkpoint.state
+    control_unit._tick = state["tick"]
+    control_unit.mpc = state["mpc"]
+    control_unit.halted = state["halted"]
+    control_unit.next_command = state["next_command"]
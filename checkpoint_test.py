@@ -0,0 +1,151 @@
+import contextlib
+import io
+import json
+import os
+
+import pytest
+
+import checkpoint
+import machine
+from cache import Cache
+from machine_test import WIDE_STORE, assert_same_state, load_golden, run_engine, translate
+
+LIMIT = 200000000
+
+
+def simulate(golden, engine, limit=LIMIT, cache=None, **options):
+    code, code_len = translate(golden)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return machine.simulation(code, code_len, list(golden["in_stdin"]), 3000, limit, engine, cache=cache, **options)
+
+
+def resume_engine(golden, engine, path, cache=None):
+    """Как run_engine, но с состоянием из контрольной точки."""
+    code, code_len = translate(golden)
+    saved = checkpoint.read(path)
+    data_path = machine.Datapath(3000, [], code, code_len, cache=cache)
+    checkpoint.restore_datapath(saved, data_path)
+    control_unit = machine.ENGINES[engine](data_path)
+    checkpoint.restore_control_unit(saved, control_unit)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            control_unit.run(LIMIT)
+        except (EOFError, StopIteration):
+            pass
+    return data_path, control_unit
+
+
+@pytest.mark.parametrize(("saver", "resumer"), [("mc", "predecoded"), ("predecoded", "mc"), ("fused", "fused")])
+@pytest.mark.parametrize("name", ["hello_user_name0", "sort", "carry_check"])
+def test_resume_is_identical_to_uninterrupted_run(tmp_path, name, saver, resumer):
+    golden = load_golden(name)
+    expected = simulate(golden, "mc")
+    path = tmp_path / "state.ckpt"
+    simulate(golden, saver, limit=expected[1] // 2, checkpoint_path=path)
+    assert checkpoint.read(path).state["tick"] >= expected[1] // 2
+
+    assert simulate(golden, resumer, resume=path) == expected
+    assert_same_state(*resume_engine(golden, resumer, path), *run_engine(golden, "mc"))
+
+
+def test_resume_keeps_words_wider_than_64_bits(tmp_path):
+    golden = {"in_code": WIDE_STORE, "in_stdin": ""}
+    expected = simulate(golden, "mc")
+    path = tmp_path / "state.ckpt"
+    simulate(golden, "predecoded", limit=expected[1] - 5, checkpoint_path=path)
+    saved = checkpoint.read(path)
+    assert saved.state["wide_words"]
+    assert max(saved.words) > 2 ** 63
+    assert simulate(golden, "predecoded", resume=path) == expected
+    assert_same_state(*resume_engine(golden, "predecoded", path), *run_engine(golden, "mc"))
+
+
+def test_resume_restores_cache_state(tmp_path):
+    golden = load_golden("sort")
+    path = tmp_path / "state.ckpt"
+    simulate(golden, "predecoded", limit=1000, cache=Cache(size=16, line_size=2), checkpoint_path=path)
+    cache = Cache(size=16, line_size=2)
+    resumed = resume_engine(golden, "mc", path, cache=cache)
+    reference_cache = Cache(size=16, line_size=2)
+    assert_same_state(*resumed, *run_engine(golden, "mc", cache=reference_cache))
+    assert cache.stats() == reference_cache.stats()
+
+
+@pytest.mark.parametrize("cache", [
+    Cache(size=32, line_size=2, associativity=2),
+    Cache(size=64, line_size=4, associativity=2),
+    Cache(size=64, line_size=2, associativity=4, replacement="fifo"),
+    Cache(size=64, line_size=2, associativity=4, write_policy="through"),
+])
+def test_resume_rejects_other_cache_geometry(tmp_path, cache):
+    golden = load_golden("sort")
+    path = tmp_path / "state.ckpt"
+    # то же число наборов (8), но другие пути, строки или политика
+    simulate(golden, "predecoded", limit=1000, cache=Cache(size=64, line_size=2, associativity=4), checkpoint_path=path)
+    assert len(cache.sets) == 8
+    with pytest.raises(ValueError, match="Cache geometry"):
+        simulate(golden, "predecoded", resume=path, cache=cache)
+
+
+def test_periodic_checkpoints_do_not_change_run(tmp_path):
+    golden = load_golden("sort")
+    path = tmp_path / "state.ckpt"
+    expected = simulate(golden, "fused")
+    assert simulate(golden, "fused", checkpoint_path=path, checkpoint_every=97) == expected
+    # последняя точка -- у самого останова, временный файл не остаётся
+    assert expected[1] - 2 * 97 < checkpoint.read(path).state["tick"] <= expected[1]
+    assert [entry.name for entry in tmp_path.iterdir()] == ["state.ckpt"]
+
+
+def test_resume_after_store_into_code(tmp_path):
+    with open(os.path.join("examples", "memory_save"), encoding="utf-8") as file:
+        golden = {"in_code": file.read(), "in_stdin": "A"}
+    _, reference_unit = run_engine(golden, "mc")
+    path = tmp_path / "state.ckpt"
+    for limit in range(1, reference_unit.get_tick(), 5):
+        simulate(golden, "mc", limit=limit, checkpoint_path=path)
+        assert_same_state(*resume_engine(golden, "fused", path), *run_engine(golden, "mc"))
+
+
+def test_checkpoint_of_other_program_is_rejected(tmp_path):
+    path = tmp_path / "state.ckpt"
+    simulate(load_golden("sort"), "predecoded", limit=100, checkpoint_path=path)
+    with pytest.raises(ValueError, match="does not match"):
+        simulate(load_golden("hello_world"), "predecoded", resume=path)
+
+
+@pytest.mark.parametrize(("saver", "resumer"), [(16, None), (None, 16), (16, 64)])
+def test_paged_checkpoint_keeps_dirty_pages(tmp_path, saver, resumer):
+    golden = load_golden("sort")
+    expected = simulate(golden, "mc")
+    path = tmp_path / "state.ckpt"
+    simulate(golden, "predecoded", limit=expected[1] // 2, checkpoint_path=path, memory_pages=saver)
+    saved = checkpoint.read(path)
+    if saver is not None:
+        assert 0 < len(saved.state["pages"]) < saved.state["memory_size"] // saver
+        assert len(saved.words) == len(saved.kinds) <= len(saved.state["pages"]) * saver
+    assert simulate(golden, "predecoded", resume=path, memory_pages=resumer) == expected
+
+
+def test_memory_dump_lists_changed_pages(tmp_path):
+    golden = load_golden("sort")
+    path = tmp_path / "memory.jsonl"
+    simulate(golden, "predecoded", memory_pages=16, memory_dump=path)
+    pages = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert pages
+    assert all(page["start"] % 16 == 0 and len(page["words"]) == 16 for page in pages)
+    data_path, _ = run_engine(golden, "predecoded", memory_pages=16)
+    memory = data_path.data_memory
+    assert [page["start"] // 16 for page in pages] == memory.dirty_pages()
+    for page in pages:
+        assert page["words"] == [memory[address] for address in range(page["start"], page["start"] + 16)]
+
+
+def test_checkpoint_keeps_word_width(tmp_path):
+    golden = load_golden("carry_check")
+    expected = simulate(golden, "mc", word_bits=32)
+    path = tmp_path / "state.ckpt"
+    simulate(golden, "predecoded", limit=expected[1] // 2, checkpoint_path=path, word_bits=32)
+    assert simulate(golden, "fused", resume=path, word_bits=32) == expected
+    with pytest.raises(ValueError, match="word width"):
+        simulate(golden, "fused", resume=path)
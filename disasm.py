@@ -0,0 +1,48 @@
+"""Листинг готового образа (.bin) в формате .hex транслятора без повторной трансляции.
+
+Имена переменных берутся из файла символов (<образ>.sym), если он есть. Диапазон -- полуинтервал
+смещений записей в образе (адресов в первом столбце листинга), десятичных или 0x...
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from isa import write_hex
+from symbols import Symbols, sidecar_path
+
+
+def parse_range(text):
+    """'START:END' -> (START, END); любую границу можно опустить, числа -- как в Python (0x10, 16)."""
+    start, _, end = text.partition(":")
+    return int(start, 0) if start else 0, int(end, 0) if end else None
+
+
+def variables_map(binary, symbols=None):
+    """{переменная: адрес} из файла символов (по умолчанию -- рядом с образом) или {}, если его нет."""
+    path = symbols or sidecar_path(binary)
+    if symbols is None and not Path(path).exists():
+        return {}
+    return {name: address for address, _, name in Symbols.load(path).variables}
+
+
+def main(binary, addresses=None, symbols=None, output=None):
+    start, stop = addresses or (0, None)
+    with open(binary, "rb") as file:
+        data = file.read()
+    names = variables_map(binary, symbols)
+    if output is None:
+        write_hex(sys.stdout, data, names, start, stop)
+        sys.stdout.write("\n")
+    else:
+        with open(output, "w", encoding="utf-8") as file:
+            write_hex(file, data, names, start, stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Листинг образа программы (как .hex транслятора).")
+    parser.add_argument("binary")
+    parser.add_argument("--range", dest="addresses", type=parse_range, help="диапазон смещений START:END")
+    parser.add_argument("--symbols", help="файл символов (по умолчанию BINARY.sym, если есть)")
+    parser.add_argument("--output", help="записать листинг в файл, а не на стандартный вывод")
+    args = parser.parse_args()
+    main(args.binary, args.addresses, args.symbols, args.output)
@@ -0,0 +1,40 @@
+import contextlib
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+import disasm
+import translator
+from isa import hex_listing
+
+
+def build(tmp_path, name):
+    target = str(tmp_path / f"{name}.bin")
+    with contextlib.redirect_stdout(io.StringIO()):
+        translated = translator.translate_file(os.path.join("examples", name), target)
+    return target, translated.variables_map
+
+
+@pytest.mark.parametrize("name", ["hello_user_name", "sort", "prob1"])
+def test_listing_matches_translator_hex(tmp_path, name):
+    target, variables = build(tmp_path, name)
+    assert disasm.variables_map(target) == variables  # имена переменных -- из файла символов
+    disasm.main(target, output=str(tmp_path / "listing.hex"))
+    assert (tmp_path / "listing.hex").read_text() == (tmp_path / f"{name}.bin.hex").read_text()
+
+
+def test_range_selects_lines(tmp_path):
+    target, _ = build(tmp_path, "sort")
+    lines = (tmp_path / "sort.bin.hex").read_text().split("\n")
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        disasm.main(target, disasm.parse_range("0x10:0x20"))
+    assert output.getvalue().split("\n")[:-1] == [line for line in lines if 0x10 <= int(line.split()[0], 16) < 0x20]
+
+    with open(target, "rb") as file:
+        data = file.read()
+    assert list(hex_listing(data, {}, 0x1B, 0x1C)) == ["0x1b -         11 - !"]
+    Path(target + ".sym").unlink()
+    assert disasm.variables_map(target) == {}
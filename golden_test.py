@@ -1,46 +1,125 @@
 import pytest
 import contextlib
+import hashlib
 import io
 import logging
 import os
 import tempfile
 import machine
 import translator
+from translation_cache import TranslationCache
 MAX_LOG = 400000000
-
-
+LOG_FORMAT = "%(levelname)-8s %(name)s:%(filename)s:%(lineno)d %(message)s"
 
 
 @pytest.mark.golden_test("golden/hello_world.yml")
-def test_translator_and_machine_hello_world(golden, caplog):
-    run_test(golden, caplog, True)
+def test_translator_and_machine_hello_world(golden, request):
+    run_test(golden, request, True)
 
 @pytest.mark.golden_test("golden/hello_user_name0.yml")
-def test_translator_and_machine_hello_user_name0(golden, caplog):
-    run_test(golden, caplog, True)
+def test_translator_and_machine_hello_user_name0(golden, request):
+    run_test(golden, request, True)
 
 @pytest.mark.golden_test("golden/hello_user_name1.yml")
-def test_translator_and_machine_hello_user_name1(golden, caplog):
-    run_test(golden, caplog, True)
+def test_translator_and_machine_hello_user_name1(golden, request):
+    run_test(golden, request, True)
 
 @pytest.mark.golden_test("golden/cat.yml")
-def test_translator_and_machine_cat(golden, caplog):
-    run_test(golden, caplog, True)
+def test_translator_and_machine_cat(golden, request):
+    run_test(golden, request, True)
 
 @pytest.mark.golden_test("golden/sort.yml")
-def test_translator_and_machine_sort(golden, caplog):
-    run_test(golden, caplog, True)
+def test_translator_and_machine_sort(golden, request):
+    run_test(golden, request, True)
 
 @pytest.mark.golden_test("golden/carry_check.yml")
-def test_translator_and_machine_carry_check(golden, caplog):
-    run_test(golden, caplog, True)
+def test_translator_and_machine_carry_check(golden, request):
+    run_test(golden, request, True)
 
 @pytest.mark.golden_test("golden/prob.yml")
-def test_translator_and_machine_prob1(golden, caplog):
-    run_test(golden, caplog, False)
+def test_translator_and_machine_prob1(golden, request):
+    run_test(golden, request, False)
+
+
+def translate_cached(cache_dir, source, target):
+    """Трансляция source -> target (+ target.hex) через кэш трансляции (translation_cache) в кэше pytest."""
+    translator.main(source, target, TranslationCache(cache_dir) if cache_dir is not None else None)
+
+
+class StreamingLogCompare(logging.Handler):
+    """Сравнивает журнал с ожидаемым по мере записи, не накапливая его.
+
+    Запоминает первое расхождение и считает дайджест фактического журнала.
+    """
+
+    def __init__(self, expected):
+        super().__init__(logging.DEBUG)
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.expected = expected
+        self.position = 0
+        self.mismatch = None  # позиция первого расхождения
+        self.actual_tail = ""  # фактический текст начиная с расхождения (для сообщения)
+        self.digest = hashlib.sha256()
+
+    def feed(self, text):
+        self.digest.update(text.encode("utf-8"))
+        if self.mismatch is None:
+            if self.expected.startswith(text, self.position):
+                self.position += len(text)
+                return
+            prefix = os.path.commonprefix([text, self.expected[self.position:self.position + len(text)]])
+            self.mismatch = self.position + len(prefix)
+            self.actual_tail = text[len(prefix):]
+        elif len(self.actual_tail) < 200:
+            self.actual_tail += text
+
+    def emit(self, record):
+        # caplog.text: записи через "\n", после последней тоже "\n"
+        if self.position < MAX_LOG:
+            self.feed(self.format(record) + "\n")
+
+    def finish(self):
+        self.feed("EOF")
+
+
+def assert_same_text(name, actual, expected):
+    """Сравнение по дайджесту; при расхождении -- строка и столбец первого отличия вместо полного diff."""
+    if isinstance(actual, StreamingLogCompare):
+        compare = actual
+    else:
+        compare = StreamingLogCompare(expected)
+        compare.feed(actual)
+    if compare.mismatch is None and compare.position == len(expected):
+        return
+    position = compare.mismatch if compare.mismatch is not None else compare.position
+    line = expected.count("\n", 0, position) + 1
+    column = position - (expected.rfind("\n", 0, position) + 1) + 1
+    expected_line = expected[expected.rfind("\n", 0, position) + 1:].split("\n", 1)[0]
+    pytest.fail(f"{name} differs at line {line}, column {column} "
+                f"(sha256 expected {hashlib.sha256(expected.encode('utf-8')).hexdigest()[:16]}, "
+                f"actual {compare.digest.hexdigest()[:16]}):\n"
+                f"  expected: {expected_line!r}\n"
+                f"  actual:   ...{compare.actual_tail.split(chr(10), 1)[0]!r}", pytrace=False)
+
+
+@contextlib.contextmanager
+def capture_log(handler):
+    """Весь журнал -- только в handler (без накопления в caplog и отчётах pytest)."""
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    root.handlers = [handler]
+    root.setLevel(logging.DEBUG)
+    try:
+        yield handler
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+
 
-def run_test(golden, caplog, need_ticks):
-    caplog.set_level(logging.DEBUG)
+def run_test(golden, request, need_ticks):
+    cache = getattr(request.config, "cache", None)
+    cache_dir = str(cache.mkdir("golden-translations")) if cache is not None else None
+    log = StreamingLogCompare(golden.out["out_log"] if need_ticks else "")
 
     with tempfile.TemporaryDirectory() as tmpdirname:
         source = os.path.join(tmpdirname, "in_code")
@@ -53,14 +132,15 @@ def run_test(golden, caplog, need_ticks):
         with open(input_stream, "w", encoding="utf-8") as file:
             file.write(golden["in_stdin"])
 
-        with contextlib.redirect_stdout(io.StringIO()) as stdout:
-            translator.main(source, target)
+        with contextlib.redirect_stdout(io.StringIO()) as stdout, capture_log(log):
+            translate_cached(cache_dir, source, target)
             print("============================================================")
             machine.main(target, input_stream, not need_ticks)
+        log.finish()
 
         with open(target_hex, encoding="utf-8") as file:
             code_hex = file.read()
         if need_ticks:
             assert code_hex == golden.out["out_code_hex"]
-            assert stdout.getvalue() == golden.out["out_stdout"]
-            assert caplog.text[:MAX_LOG] + "EOF" == golden.out["out_log"]
+            assert_same_text("stdout", stdout.getvalue(), golden.out["out_stdout"])
+            assert_same_text("log", log, golden.out["out_log"])
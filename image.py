@@ -0,0 +1,114 @@
+from array import array
+
+import isa
+from isa import ARG_OPCODES, binary_to_opcode, decode_image
+from memory import CELL_DATA, CELL_INSTRUCTION, CELL_PADDING
+
+
+class ProgramImage:
+    """Образ программы из бинарного файла без промежуточного списка ячеек (как у isa.bin_to_opcode).
+
+    Один проход по байтам строит таблицу ячеек: words -- машинные слова (array('q')), kinds -- вид ячейки
+    (memory.CELL_*); большой образ при NumPy раскладывается векторно по массивам isa.decode_image.
+    Раскладка ячеек та же, что у bin_to_opcode: инструкция лежит по адресу своего байта в файле,
+    после инструкции с аргументом -- три заполнителя, переменные -- через три заполнителя.
+    Словари инструкций создаются лениво при первом обращении (instruction) и общие для всех
+    memory.Memory, созданных по образу.
+
+    Таблицы -- собственная копия образа (около 9 байт на ячейку), а каждая memory.Memory копирует их ещё раз:
+    программа может писать в код. Между процессами таблицы общие, только если образ загружен до fork
+    (batch.py), и лишь пока их страницы не изменены.
+    """
+
+    def __init__(self, data):
+        size = len(data)
+        first = int.from_bytes(data[4:8], byteorder="big")
+        if isa.np is not None and size - first >= isa.BULK_MIN_BYTES:
+            self.scatter(decode_image(data))
+            return
+        words = array("q", [0]) * max(size, first)
+        kinds = bytearray([CELL_PADDING]) * max(size, first)
+        code_len = first
+        first_variable = None
+        address = first
+        i = first
+        while i < size:
+            byte = data[i]
+            if byte == 0x00:
+                if first_variable is None:
+                    first_variable = address
+                else:
+                    address += 3
+                words[address] = data[i + 1] << 16 | data[i + 2] << 8 | data[i + 3]
+                kinds[address] = CELL_DATA
+                address += 1
+                i += 4
+            elif byte in ARG_OPCODES:
+                words[address] = byte << 24 | data[i + 1] << 16 | data[i + 2] << 8 | data[i + 3]
+                kinds[address] = CELL_INSTRUCTION
+                address += 4
+                i += 4
+                code_len += 4
+            elif byte in binary_to_opcode:
+                words[address] = byte << 24
+                kinds[address] = CELL_INSTRUCTION
+                address += 1
+                i += 1
+                code_len += 1
+            else:
+                raise KeyError(byte)
+        del words[address:]
+        del kinds[address:]
+        self.words = words
+        self.kinds = kinds
+        self.code_len = code_len + 1  # как второе значение bin_to_opcode
+        self.first_variable = first_variable
+        self.decoded = {}
+
+    def scatter(self, decoded):
+        """Таблица ячеек по массивам NumPy из decode_image: у переменной опкод 0, слово -- её значение."""
+        np = isa.np
+        words = np.zeros(decoded.size, dtype=np.int64)
+        words[decoded.addresses] = decoded.opcodes.astype(np.int64) << 24 | decoded.args
+        kinds = np.full(decoded.size, CELL_PADDING, dtype=np.uint8)
+        kinds[decoded.addresses] = np.where(decoded.opcodes, CELL_INSTRUCTION, CELL_DATA)
+        self.words = array("q", words.tobytes())
+        self.kinds = bytearray(kinds.tobytes())
+        self.code_len = decoded.code_len
+        self.first_variable = decoded.first_variable
+        self.decoded = {}
+
+    @classmethod
+    def load(cls, path):
+        """Загрузка файла: байты читаются целиком и сразу разбираются в таблицы, файл после этого не нужен."""
+        with open(path, "rb") as file:
+            return cls(file.read())
+
+    def __len__(self):
+        return len(self.words)
+
+    def instruction(self, address):
+        """Словарь инструкции по адресу ячейки вида CELL_INSTRUCTION (как в списке bin_to_opcode)."""
+        instr = self.decoded.get(address)
+        if instr is None:
+            word = self.words[address]
+            byte = word >> 24
+            # после первой переменной адрес ячейки на 3 меньше смещения в файле
+            index = address + 3 if self.first_variable is not None and address > self.first_variable else address
+            instr = {"index": index, "opcode": binary_to_opcode[byte]}
+            if byte in ARG_OPCODES:
+                instr["arg"] = word & 0xFFFFFF
+            self.decoded[address] = instr
+        return instr
+
+    def cells(self):
+        """Список ячеек в виде bin_to_opcode: "0", число или словарь инструкции."""
+        result = []
+        for address, kind in enumerate(self.kinds):
+            if kind == CELL_PADDING:
+                result.append("0")
+            elif kind == CELL_DATA:
+                result.append(self.words[address])
+            else:
+                result.append(self.instruction(address))
+        return result
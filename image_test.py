@@ -0,0 +1,122 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import machine
+import translator
+from image import ProgramImage
+import isa
+from isa import bin_to_opcode
+from machine_test import assert_same_state, load_golden
+from memory import UNDECODED, Memory
+
+EXAMPLES = ["arifm", "cat", "hello_user_name", "hello_world", "memory_save", "prob1", "sort", "test_sort"]
+
+
+def build(tmp_path, source):
+    target = os.path.join(tmp_path, "target.bin")
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.main(source, target)
+    with open(target, "rb") as file:
+        return target, bin_to_opcode(bytearray(file.read()))
+
+
+@pytest.mark.parametrize("name", EXAMPLES)
+def test_image_matches_bin_to_opcode(tmp_path, name):
+    target, (code, code_len) = build(tmp_path, os.path.join("examples", name))
+    image = ProgramImage.load(target)
+    assert image.code_len == code_len
+    assert image.cells() == code
+
+    lazy, eager = Memory(len(image) + 10, image), Memory(len(code) + 10, code)
+    assert lazy == eager
+    assert all(entry is UNDECODED for entry in lazy.instructions)
+    for address in range(len(code)):
+        assert lazy.entry(address) == eager.instructions[address]
+
+
+@pytest.mark.parametrize("engine", ["mc", "predecoded", "fused"])
+@pytest.mark.parametrize("name", ["sort", "memory_save"])
+def test_engines_on_image_match_cell_list(tmp_path, name, engine):
+    source = os.path.join("examples", name) if name == "memory_save" else os.path.join(tmp_path, "in_code")
+    stdin = "A" if name == "memory_save" else load_golden(name)["in_stdin"]
+    if name != "memory_save":
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(load_golden(name)["in_code"])
+    target, (code, code_len) = build(tmp_path, source)
+    runs = []
+    for program in (ProgramImage.load(target), code):
+        data_path = machine.Datapath(3000, list(stdin), program, code_len)
+        control_unit = machine.ENGINES[engine](data_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                control_unit.run(200000000)
+            except (EOFError, StopIteration):
+                pass
+        runs.append((data_path, control_unit))
+    assert_same_state(*runs[0], *runs[1])
+
+
+def test_handlers_are_decoded_on_first_execution(tmp_path):
+    target, _ = build(tmp_path, os.path.join("examples", "hello_world"))
+    image = ProgramImage.load(target)
+    control_unit = machine.PredecodedControlUnit(machine.Datapath(3000, [], image, 0))
+    assert all(handler is None for handler in control_unit.handlers)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(StopIteration):
+        control_unit.run(200000000)
+    # PC 0 -- заполнитель заголовка, он ссылается на первую инструкцию; остальной заголовок
+    # и строка данных не исполнялись и не декодировались
+    assert control_unit.handlers[0] is control_unit.handlers[8] is not None
+    assert control_unit.handlers[1:8] == [None] * 7
+    assert set(control_unit.handlers[image.first_variable:]) == {None}
+
+
+def corrupt(tmp_path, edit):
+    target, _ = build(tmp_path, os.path.join("examples", "hello_world"))
+    with open(target, "rb") as file:
+        data = bytearray(file.read())
+    edit(data, int.from_bytes(data[4:8], byteorder="big"))
+    return data
+
+
+@pytest.fixture(params=["pure", "numpy"])
+def decoder(request, monkeypatch):
+    """Оба пути isa.decode_image; векторный -- и на маленьких образах."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(isa, "BULK_MIN_BYTES", 0)
+    else:
+        monkeypatch.setattr(isa, "np", None)
+    return isa.decode_image
+
+
+@pytest.mark.parametrize("name", EXAMPLES)
+def test_decoded_arrays_match_bin_to_opcode(tmp_path, decoder, name):
+    _, (code, code_len) = build(tmp_path, os.path.join("examples", name))
+    with open(os.path.join(tmp_path, "target.bin"), "rb") as file:
+        decoded = decoder(file.read())
+    assert (decoded.size, decoded.code_len) == (len(code), code_len)
+    records = list(zip(decoded.offsets.tolist(), decoded.addresses.tolist(), decoded.opcodes.tolist(),
+                       decoded.args.tolist(), decoded.next_pc.tolist()))
+    assert len(records) == sum(cell != "0" for cell in code)
+    for offset, address, opcode, arg, next_pc in records:
+        if opcode:
+            expected = {"index": offset, "opcode": isa.binary_to_opcode[opcode]}
+            if isa.has_arg(opcode):
+                expected["arg"] = arg
+            assert code[address] == expected
+        else:
+            assert code[address] == arg
+        assert all(filler == "0" for filler in code[address + 1:next_pc])
+    assert decoded.first_variable == next((address for _, address, opcode, _, _ in records if not opcode), None)
+
+
+def test_decoder_rejects_bad_images(tmp_path, decoder):
+    unknown = corrupt(tmp_path, lambda data, first: data.__setitem__(first, 0xFF))
+    with pytest.raises(KeyError):
+        decoder(unknown)
+    truncated = corrupt(tmp_path, lambda data, _: data.extend(b"\x15\x00"))
+    with pytest.raises(IndexError):
+        decoder(truncated)
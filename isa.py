@@ -1,7 +1,14 @@
 from __future__ import annotations
 
+from array import array
 from collections import namedtuple
 from enum import Enum
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него образ разбирается одним проходом на array
+    np = None
 
 # Константы для магических чисел
 MAX_ARG_VALUE = 0xFFFFFFFF
@@ -95,127 +102,146 @@ def to_bytes(code, first_ex_instr):
     binary_bytes += bytes(4)
     binary_bytes += first_ex_instr.to_bytes(4, byteorder="big")
     for instr in code:
-        # print("instr", instr)
-        if "opcode" in instr:
-            opcode_bin = opcode_to_binary[instr["opcode"]]
-            binary_bytes.append(opcode_bin)
-            if "arg" in instr:
-                arg = instr.get("arg", 0)
-                # print(arg)
-                binary_bytes.extend(((arg >> 16) & 0xFF, (arg >> 8) & 0xFF, arg & 0xFF))
-                # print(((arg >> 16) & 0xFF, (arg >> 8) & 0xFF, arg & 0xFF))
-                # print(binary_bytes)
-        elif "arg" in instr and "opcode" not in instr:
+        append_cell(binary_bytes, instr)
+    return bytes(binary_bytes)
+
+
+def append_cell(binary_bytes, instr):
+    """Дописать в binary_bytes одну запись кода: инструкцию (опкод и 3 байта аргумента) или значение переменной."""
+    if "opcode" in instr:
+        opcode_bin = opcode_to_binary[instr["opcode"]]
+        binary_bytes.append(opcode_bin)
+        if "arg" in instr:
             arg = instr.get("arg", 0)
-            # print(arg)
-            if isinstance(arg, int):
-                if not (-(2 ** 31) <= arg <= 2 ** 31 - 1):
-                    binary_bytes.extend(
-                        (
-                            (arg >> 56) & 0xFF,
-                            (arg >> 48) & 0xFF,
-                            (arg >> 40) & 0xFF,
-                            (arg >> 32) & 0xFF,
-                        )
+            binary_bytes.extend(((arg >> 16) & 0xFF, (arg >> 8) & 0xFF, arg & 0xFF))
+    elif "arg" in instr and "opcode" not in instr:
+        arg = instr.get("arg", 0)
+        if isinstance(arg, int):
+            if not (-(2 ** 31) <= arg <= 2 ** 31 - 1):
+                binary_bytes.extend(
+                    (
+                        (arg >> 56) & 0xFF,
+                        (arg >> 48) & 0xFF,
+                        (arg >> 40) & 0xFF,
+                        (arg >> 32) & 0xFF,
                     )
-                    binary_bytes.extend(
-                        (
-                            (arg >> 24) & 0xFF,
-                            (arg >> 16) & 0xFF,
-                            (arg >> 8) & 0xFF,
-                            arg & 0xFF,
-                        )
-                    )
-                else:
-                    binary_bytes.extend(
-                        (
-                            (arg >> 24) & 0xFF,
-                            (arg >> 16) & 0xFF,
-                            (arg >> 8) & 0xFF,
-                            arg & 0xFF,
-                        )
-                    )
-            elif isinstance(arg, str):
-                for i in range(len(arg)):
-                    binary_bytes += bytes(3)
-                    binary_bytes.extend(arg[i].encode("ascii"))
-    return bytes(binary_bytes)
+                )
+            binary_bytes.extend(
+                (
+                    (arg >> 24) & 0xFF,
+                    (arg >> 16) & 0xFF,
+                    (arg >> 8) & 0xFF,
+                    arg & 0xFF,
+                )
+            )
+        elif isinstance(arg, str):
+            for i in range(len(arg)):
+                binary_bytes += bytes(3)
+                binary_bytes.extend(arg[i].encode("ascii"))
+
+
+ARG_OPCODES = frozenset({
+    0x15,  # lit
+    0x17,  # jump
+    0x18,  # call
+    0x10,  # if
+    0x13,  # in
+    0x16,  # out
+})
 
 
 def has_arg(opcode) -> bool:
-    return opcode in [
-        0x15,  # lit
-        0x17,  # jump
-        0x18,  # call
-        0x10,  # if
-        0x13,  # in
-        0x16,  # out
-    ]
+    return opcode in ARG_OPCODES
 
 
-def to_hex(code, variables_map):
-    addr_to_var = {addr - 4 * len(variables_map): name for name, addr in variables_map.items()}
-    # print(code)
+# длина записи образа по её первому байту: 4 -- инструкция с аргументом или переменная (0x00),
+# 1 -- инструкция без аргумента, 0 -- такого опкода нет
+RECORD_LENGTH = bytes(4 if byte == 0 or byte in ARG_OPCODES else 1 if byte in binary_to_opcode else 0
+                      for byte in range(256))
+BULK_MIN_BYTES = 1 << 16  # образы меньше разбираются без NumPy: на них его накладные расходы больше
+SCAN_BLOCK = 256  # байт в блоке при поиске начал записей на NumPy
+
 
+def to_hex(code, variables_map):
     """Преобразует машинный код в текстовый файл c шестнадцатеричным представлением.
 
     Формат вывода:
     <address> - <HEXCODE> - <mnemonic>
     """
-    binary_code = to_bytes(code, 8)
-
-    result = []
-    after_halt = False
-    # print(binary_code)
-    i = 8
-    while i < len(binary_code):
-        has_argument = has_arg(int(str(binary_code[i]), 10))
-        if has_argument & (not after_halt) & i + 4 >= len(binary_code):
+    return binary_to_hex(to_bytes(code, 8), variables_map)
+
+
+def binary_to_hex(binary_code, variables_map):
+    """То же, что to_hex, но по готовому бинарному образу (заголовок не читается)."""
+    return "\n".join(hex_listing(binary_code, variables_map))
+
+
+HEX_FIRST = 8  # листинг идёт с первой записи после заголовка
+HEX_CHUNK = 4096  # строк листинга на одну запись в файл
+# у инструкции с аргументом 32-битное слово -- опкод (не меньше 0x10) и аргумент, с выравниванием до 10 символов
+HEX_OPCODE = tuple(f"  {byte:02X}" for byte in range(256))
+HEX_MNEMONIC = tuple(binary_to_opcode[byte].value if byte in binary_to_opcode else None for byte in range(256))
+HEX_SHORT = tuple(f" - {byte:10X} - {HEX_MNEMONIC[byte]}" for byte in range(256))  # хвост строки без аргумента
+
+
+def hex_listing(binary_code, variables_map, start=HEX_FIRST, stop=None):
+    """Строки листинга binary_to_hex по одной, только для записей со смещением из [start, stop).
+
+    Записи разбираются по таблицам опкодов (RECORD_LENGTH, HEX_*) без словарей инструкций; до start
+    записи только пропускаются. После halt каждые 4 байта -- слово данных, подписанное именем переменной,
+    если оно с неё начинается (иначе -- предыдущей подписью).
+    """
+    addr_to_var = {addr - 4 * len(variables_map): name for name, addr in variables_map.items()}
+    size = len(binary_code)
+    stop = size if stop is None else min(stop, size)
+    halt = opcode_to_binary[Opcode.HALT]
+    mnemonic = None
+    arg = None
+    i = HEX_FIRST
+    while i < stop:
+        byte = binary_code[i]
+        length = RECORD_LENGTH[byte]
+        if not length or not byte:
+            raise KeyError(byte)
+        if length == 4:
+            if i + 4 > size:
+                raise IndexError("Truncated instruction at the end of the image")
+            arg = binary_code[i + 1] << 16 | binary_code[i + 2] << 8 | binary_code[i + 3]
+            if i >= start:
+                yield f"{i:#x} - {HEX_OPCODE[byte]}{arg:06X} - {HEX_MNEMONIC[byte]} ({arg:08X})"
+        elif i >= start:
+            yield f"{i:#x}{HEX_SHORT[byte]}"
+        mnemonic = HEX_MNEMONIC[byte]
+        i += length
+        if byte == halt:
             break
-        address = i
-        if after_halt:
-            word = (
-                    (binary_code[i] << 24)
-                    | (binary_code[i + 1] << 16)
-                    | (binary_code[i + 2] << 8)
-                    | binary_code[i + 3]
-            )
-            # print(address)
-            if address in addr_to_var:
-                mnemonic = addr_to_var[address]
-            i += 4
-        else:
-            mnemonic = binary_to_opcode[binary_code[address]].value
-            # print(address, int(binary_code[address]), has_argument, mnemonic)
-            if binary_to_opcode[binary_code[address]] == Opcode.HALT:
-                after_halt = True
-            if has_argument:
-                word = (
-                        (binary_code[i] << 24)
-                        | (binary_code[i + 1] << 16)
-                        | (binary_code[i + 2] << 8)
-                        | binary_code[i + 3]
-                )
-                arg = (
-                        (binary_code[i + 1] << 16)
-                        | (binary_code[i + 2] << 8)
-                        | binary_code[i + 3]
-                )
-                # print(arg)
-                i += 4
+    while i < stop:
+        if i + 4 > size:
+            raise IndexError("Truncated data word at the end of the image")
+        mnemonic = addr_to_var.get(i, mnemonic)
+        if i >= start:
+            word = int.from_bytes(binary_code[i:i + 4], byteorder="big")
+            if binary_code[i] in ARG_OPCODES:  # как в исходном формате: такое слово -- с последним аргументом
+                yield f"{i:#x} - {word:10X} - {mnemonic} ({arg:08X})"
             else:
-                word = binary_code[i]
-                i += 1
+                yield f"{i:#x} - {word:10X} - {mnemonic}"
+        i += 4
 
-        # Формируем строку в требуемом формате
-        hex_word = f"{word:10X}"  # количество символов в строке
-        if has_argument:
-            line = f"{hex(address)} - {hex_word} - {mnemonic} ({arg:08X})"
-        else:
-            line = f"{hex(address)} - {hex_word} - {mnemonic}"
-        result.append(line)
 
-    return "\n".join(result)
+def write_hex(file, binary_code, variables_map, start=HEX_FIRST, stop=None):
+    """Запись листинга hex_listing в открытый текстовый файл порциями по мере разбора, без строки целиком.
+
+    Содержимое то же, что у binary_to_hex: строки через перевод строки, без перевода в конце.
+    """
+    lines = hex_listing(binary_code, variables_map, start, stop)
+    separator = ""
+    while chunk := list(islice(lines, HEX_CHUNK)):
+        file.write(separator)
+        file.write("\n".join(chunk))
+        separator = "\n"
+
+
+PADDING = ("0", "0", "0")
 
 
 def make_zeros(num, code):
@@ -223,52 +249,154 @@ def make_zeros(num, code):
         code.append("0")
 
 
-def bin_to_opcode(binary_code):
-    # print(binary_code)
-    code = []
-    i = (
-            (binary_code[4] << 24)
-            | (binary_code[5] << 16)
-            | (binary_code[6] << 8)
-            | (binary_code[7])
-    )
-    # print(i)
-    make_zeros(i, code)
-    code_len = i
-    flag_var = False
-    while i < len(binary_code):
-        if binary_code[i] == 0x00:
-            arg = (
-                    (binary_code[i + 1] << 16)
-                    | (binary_code[i + 2] << 8)
-                    | binary_code[i + 3]
-            )
-            if not flag_var:
-                flag_var = True
-            else:
-                make_zeros(3, code)
-            code.append(arg)
+class DecodedImage(namedtuple("DecodedImage", "offsets addresses opcodes args next_pc size code_len first_variable")):
+    """Образ, разобранный целиком: параллельные массивы по записям (инструкциям и переменным) в порядке файла.
 
-            i += 4
+    offsets -- смещение записи в файле ("index" инструкции), addresses -- адрес её ячейки в памяти модели,
+    opcodes -- байт опкода (0 у переменной), args -- аргумент инструкции или значение переменной (24 бита,
+    0 у инструкции без аргумента), next_pc -- адрес следующей записи (у последней -- size).
+    offsets, addresses, args, next_pc -- 64-битные, opcodes -- байты: массивы NumPy, если образ разбирался
+    на нём, иначе array('q') и array('B') (у тех и других есть len, индексы, tolist и буферный протокол).
+    size -- число ячеек образа, code_len -- как второе значение bin_to_opcode,
+    first_variable -- адрес первой переменной или None.
+    """
+
+
+def decode_image(binary_code):
+    """Разбор всего образа (bytes, bytearray, mmap) в параллельные массивы DecodedImage.
+
+    Раскладка та же, что у bin_to_opcode: записи читаются с адреса первой исполняемой инструкции
+    (байты 4..7), после первой переменной адрес ячейки инструкции на 3 меньше смещения в файле.
+    С NumPy большой образ разбирается векторно (границы записей -- decode_starts), без него --
+    одним проходом по байтам с таблицей RECORD_LENGTH.
+    """
+    size = len(binary_code)
+    first = int.from_bytes(binary_code[4:8], byteorder="big")
+    if np is not None and size - first >= BULK_MIN_BYTES:
+        return _decode_numpy(binary_code, first, size)
+    offsets, addresses, opcodes, args = array("q"), array("q"), array("B"), array("q")
+    code_len = first
+    first_variable = None
+    shift = 0
+    i = first
+    while i < size:
+        byte = binary_code[i]
+        length = RECORD_LENGTH[byte]
+        if length == 4:
+            arg = binary_code[i + 1] << 16 | binary_code[i + 2] << 8 | binary_code[i + 3]
+        elif length:
+            arg = 0
         else:
-            opcode = binary_to_opcode[binary_code[i]]
-            has_argument = has_arg(int(str(binary_code[i]), 10))
-            instr = {"index": i, "opcode": opcode}
-            # print(binary_code[i], has_argument)
-            if has_argument:
-                arg = (
-                        (binary_code[i + 1] << 16)
-                        | (binary_code[i + 2] << 8)
-                        | binary_code[i + 3]
-                )
-                instr["arg"] = arg
-                code.append(instr)
-                make_zeros(3, code)
-                i += 4
-                code_len += 4
-            else:
-                code.append(instr)
-                i += 1
-                code_len += 1
+            raise KeyError(byte)
+        if byte:
+            addresses.append(i - shift)
+            code_len += length
+        else:
+            addresses.append(i)
+            if first_variable is None:
+                first_variable = i
+                shift = 3
+        offsets.append(i)
+        opcodes.append(byte)
+        args.append(arg)
+        i += length
+    size = max(size, first) - shift
+    next_pc = addresses[1:]
+    next_pc.append(size)
+    return DecodedImage(offsets, addresses, opcodes, args, next_pc, size, code_len + 1, first_variable)
 
-    return code, code_len + 1
+
+def decode_starts(body):
+    """Смещения начал записей в body (np.uint8, первая запись -- с нуля) без прохода по записям.
+
+    Состояние разбора перед байтом -- сколько байт осталось до начала следующей записи (0..3): в начале
+    записи длины 4 оно становится 3, иначе убывает до 0. Байты делятся на блоки по SCAN_BLOCK; блоки
+    идут «полосами» по 64 в слове uint64, и каждое состояние -- битовая плоскость (бит полосы стоит,
+    если блок в этом состоянии). Первый проход по столбцам блоков даёт выходное состояние каждого блока
+    при каждом из 4 входных, префиксная композиция этих функций -- входное состояние каждого блока,
+    второй проход отмечает байты в состоянии 0 -- начала записей.
+    """
+    n = len(body)
+    lanes = -(-n // (SCAN_BLOCK * 64)) * 64
+    wide = np.zeros(lanes * SCAN_BLOCK, dtype=bool)
+    wide[:n] = WIDE_RECORD[body]
+    # columns[t] -- биты «запись длины 4» байта t всех блоков
+    columns = np.ascontiguousarray(np.packbits(wide.reshape(lanes, SCAN_BLOCK).T, axis=1, bitorder="little"))
+    columns = columns.view(np.uint64)
+    narrow = ~columns
+
+    planes = [np.zeros((4, lanes // 64), dtype=np.uint64) for _ in range(4)]
+    for state in range(4):
+        planes[state][state] = ~np.uint64(0)
+    p0, p1, p2, p3 = planes
+    for column, other in zip(columns, narrow):
+        p0, p1, p2, p3 = (p0 & other) | p1, p2, p3, p0 & column
+    # exits[блок, вход] -- состояние после блока
+    exits = sum(state * np.unpackbits(plane.view(np.uint8), axis=1, bitorder="little")
+                for state, plane in enumerate((p0, p1, p2, p3))).T.astype(np.intp)
+    shift = 1
+    while shift < lanes:
+        exits[shift:] = np.take_along_axis(exits[shift:], exits[:-shift], axis=1)
+        shift *= 2
+    entries = np.zeros(lanes, dtype=np.intp)
+    entries[1:] = exits[:-1, 0]
+
+    p0, p1, p2, p3 = (np.packbits(entries == state, bitorder="little").view(np.uint64) for state in range(4))
+    flags = np.empty((SCAN_BLOCK, lanes // 64), dtype=np.uint64)  # flags[t] -- начала записей в столбце t
+    for t, (column, other) in enumerate(zip(columns, narrow)):
+        flags[t] = p0
+        p0, p1, p2, p3 = (p0 & other) | p1, p2, p3, p0 & column
+    starts = np.unpackbits(flags.view(np.uint8), axis=1, bitorder="little").T.reshape(-1)[:n]
+    return np.flatnonzero(starts)
+
+
+def _decode_numpy(binary_code, first, size):
+    data = np.frombuffer(binary_code, dtype=np.uint8)
+    offsets = decode_starts(data[first:]) + first
+    opcodes = data[offsets]
+    lengths = RECORD_LENGTHS[opcodes]
+    if not lengths.all():
+        raise KeyError(int(opcodes[np.argmin(lengths)]))
+    if offsets[-1] + lengths[-1] > size:
+        raise IndexError("Truncated record at the end of the image")
+    padded = np.zeros(size + 3, dtype=np.uint8)  # аргумент последней записи без аргумента -- нули
+    padded[:size] = data
+    arg_bytes = [padded[offsets + k].astype(np.int64) for k in (1, 2, 3)]
+    args = (arg_bytes[0] << 16 | arg_bytes[1] << 8 | arg_bytes[2]) * (lengths == 4)
+    variables = np.flatnonzero(opcodes == 0)
+    first_variable = int(offsets[variables[0]]) if len(variables) else None
+    addresses = offsets.copy()
+    if first_variable is not None:
+        addresses[(offsets > first_variable) & (opcodes != 0)] -= 3
+    size -= 3 if first_variable is not None else 0
+    next_pc = np.append(addresses[1:], size)
+    code_len = first + int(lengths[opcodes != 0].sum())
+    return DecodedImage(offsets, addresses, opcodes, args, next_pc, size, code_len + 1, first_variable)
+
+
+if np is not None:
+    RECORD_LENGTHS = np.frombuffer(RECORD_LENGTH, dtype=np.uint8).astype(np.int64)
+    WIDE_RECORD = RECORD_LENGTHS == 4
+
+
+def bin_to_opcode(binary_code):
+    """Список ячеек образа и code_len: "0" -- заполнитель, число -- переменная, словарь -- инструкция.
+
+    Строится по массивам decode_image; после инструкции с аргументом и перед каждой переменной, кроме
+    первой, -- три заполнителя.
+    """
+    decoded = decode_image(binary_code)
+    first = int.from_bytes(binary_code[4:8], byteorder="big")
+    code = ["0"] * first
+    append = code.append
+    for offset, opcode, arg in zip(decoded.offsets.tolist(), decoded.opcodes.tolist(), decoded.args.tolist()):
+        if not opcode:
+            if offset != decoded.first_variable:
+                code += PADDING
+            append(arg)
+        elif RECORD_LENGTH[opcode] == 4:
+            append({"index": offset, "opcode": binary_to_opcode[opcode], "arg": arg})
+            code += PADDING
+        else:
+            append({"index": offset, "opcode": binary_to_opcode[opcode]})
+    return code, decoded.code_len
@@ -1,65 +1,99 @@
+import argparse
+import contextlib
 import logging
-import os
 import sys
+from pathlib import Path
 
-from isa import Opcode, bin_to_opcode
+import checkpoint
+from alu import WORD_BITS, alu_operations, binary_opcodes, word_model
+from cache import Cache
+from image import ProgramImage
+from isa import Opcode
+from memory import CELL_PADDING, Memory
+from ports import InputPort, OutputPort, open_stream
+from profiler import Profiler, source_labels
+from stack import Stack
+from symbols import Symbols, sidecar_path
+from tracing import BinaryTraceSink, TeeSink, TraceLevel, TraceSink, make_sink
 
 
 class Datapath:
-    stack_first = None  # Верхняя ячейка стека
-    stack_second = None  # Нижняя ячейка стека
-    input_buffer0 = None  # Буфер входных данных. Инициализируется входными данными конструктора.
-    output_buffer0 = None  # Буфер выходных данных.
+    input_buffer0 = None  # Порт ввода 0 (ports.InputPort). Инициализируется входными данными конструктора.
+    output_buffer0 = None  # Символы, выведенные в порт 2 (без потока у порта).
     data_memory_size = None  # Размер памяти данных.
-    data_memory = None  # Память данных. Инициализируется нулевыми значениями.
+    data_memory = None  # Память (memory.Memory): образ программы и нулевая область данных.
     a = None
     program_memory_size = None
     return_stack = None
 
-    def __init__(self, data_memory_size, input_buffer0, program, code_len):
+    def __init__(self, data_memory_size, input_buffer0, program, code_len, stack_size=1024, return_stack_size=1024,
+                 trace=None, cache=None, ports=None, memory_pages=None, word_bits=None):
+        """input_buffer0 -- список символов ввода или ports.InputPort; ports -- порты, заданные явно
+        ({номер: InputPort или OutputPort}), остальные -- списки в памяти; memory_pages -- размер страницы
+        страничной памяти (memory.Memory, page_size) или None -- плотная память; word_bits -- ширина слова
+        (alu.word_model): с ней результаты операций с переносом и значения, которые кладут lit, @ и in,
+        заворачиваются в слово, стеки и память -- в array('q'), без неё -- списки, значения не ограничены."""
         self.code_len = code_len
+        self.trace = trace if trace is not None else TraceSink()
+        self.cache = cache  # Модель кэша (cache.Cache) или None -- память без задержек
+        self.stall_ticks = 0  # Такты ожидания памяти за текущую инструкцию
         self.program = program
         self.program_counter = 0
         assert data_memory_size > 0, "Data_memory size should be non-zero"
         self.program_memory_size = 0
         self.data_memory_size = data_memory_size
-        self.input_buffer0 = input_buffer0
-        self.input_buffer1 = []
-        self.output_buffer0 = []
-        self.output_buffer1 = []
-        self.data_memory = program + [0 for i in range(data_memory_size)]
-        self.stack = [0, 0]
-        self.stack_first = 0
-        self.stack_second = 0
+        self.ports = {
+            0: input_buffer0 if isinstance(input_buffer0, InputPort) else InputPort(input_buffer0),
+            1: InputPort(),
+            2: OutputPort(),
+            3: OutputPort(),
+            **(ports or {}),
+        }
+        self.input_buffer0 = self.ports[0]
+        self.output_buffer0 = self.ports[2].buffer
+        self.word = word_model(word_bits)
+        self.word_min, self.word_max, self.wrap = self.word.minimum, self.word.maximum, self.word.wrap
+        typecode = None if word_bits is None else "q"
+        # lit, @ и in кладут аргумент (24 бита), слово образа (до 30 бит) или код символа (21 бит): в 32 и 64 бита
+        # они помещаются, в более узкое слово -- заворачиваются, как результаты операций с переносом
+        self.bound = self.wrap if word_bits is not None and word_bits < 32 else None
+        self.data_memory = Memory(len(program) + data_memory_size, program, memory_pages, typecode, self.bound)
+        self.stack = Stack(stack_size, "Data stack", (0, 0), typecode)
         self.a = 0
         self.carry = 0
-        self.return_stack = []
-        self.INT32_MIN = -2 ** 31
-        self.INT32_MAX = 2 ** 31 - 1
-        self.buffers = {
-            0: self.input_buffer0,  # порт 0: ввод
-            1: self.input_buffer1,  # порт 1: ввод
-            2: self.output_buffer0,  # порт 2: вывод
-            3: self.output_buffer1  # порт 3: вывод
-        }
+        self.return_stack = Stack(return_stack_size, "Return stack", typecode=typecode)
         self.alu_result = 0
 
+    @property
+    def stack_first(self):
+        """Верхняя ячейка стека."""
+        return self.stack.first
+
+    @property
+    def stack_second(self):
+        """Нижняя ячейка стека."""
+        return self.stack.second
+
     def write_in_memory(self):
-        addr = self.stack[-2]
-        val = self.stack[-1]
+        self.stack.require(2)
+        addr = self.stack.second
+        val = self.stack.first
         if 0 <= addr < self.data_memory_size:
+            if self.cache is not None:
+                self.stall_ticks += self.cache.access(addr, write=True)
             self.data_memory[addr] = val
-            print(f"Store {val} to address {addr}")
+            self.trace.microstep("Store %s to address %s", val, addr)
         else:
             raise Exception("Store address out of range")
-        self.stack = self.stack[:-2]
+        self.stack.drop(2)
 
     def read_from_memory(self):
-        addr = self.stack[-1]
-        self.stack = self.stack[:-1]
+        addr = self.stack.pop()
         if 0 <= addr < self.data_memory_size:
+            if self.cache is not None:
+                self.stall_ticks += self.cache.access(addr)
             val = self.data_memory[addr]
-            print(f"Fetched {val} from address {addr}")
+            self.trace.microstep("Fetched %s from address %s", val, addr)
         else:
             raise Exception("Fetch address out of range")
         return val
@@ -72,125 +106,83 @@ class Datapath:
 
 
     def stack_to_a(self):
-        self.a = self.stack[-1]
-        self.stack = self.stack[:-1]
+        self.a = self.stack.pop()
 
     def a_to_stack(self):
-        self.stack.append(self.a)
+        self.stack.push(self.a)
 
 
-    def alu(self, operand):
-        value = 0
-        self.stack_first = self.stack[-1]
-        self.stack_second = self.stack[-2]
-        if operand == "+":
-            value = self.stack_first + self.stack_second
-            self.stack = self.stack[:-2]
-            value = self.check_carry(value)
-        if operand == "-":
-            value = self.stack_first - self.stack_second
-            self.stack = self.stack[:-2]
-            value = self.check_carry(value)
-        if operand == "*":
-            value = self.stack_first * self.stack_second
-            self.stack = self.stack[:-2]
-            value = self.check_carry(value)
-        if operand == "/":
-            if self.stack_first == 0:
-                raise Exception("Division by zero")
-            value = self.stack_first // self.stack_second
-            self.stack = self.stack[:-2]
-            value = self.check_carry(value)
-        if operand == "~":
-            value = ~self.stack_first
-            self.stack = self.stack[:-1]
-        if operand == "%":
-            value = self.stack_first % self.stack_second
-            self.stack = self.stack[:-2]
-        if operand == "&":
-            value = self.stack_first & self.stack_second
-            self.stack = self.stack[:-2]
-        if operand == "|":
-            value = self.stack_first | self.stack_second
-            self.stack = self.stack[:-2]
-        if operand == "^":
-            value = self.stack_first ^ self.stack_second
-            self.stack = self.stack[:-2]
-        if operand == "--":
-            value = -self.stack_first
+    def alu(self, opcode):
+        """Операция АЛУ по таблице alu_operations: результат -- в alu_result, операнды снимаются со стека."""
+        operation = alu_operations[opcode]
+        stack = self.stack
+        if operation.arity == 1:
+            value = operation.function(stack.peek())
+            stack.pop()
+        else:
+            stack.require(2)
+            value = operation.function(stack.first, stack.second)
+            stack.pop_pair()
+        if operation.carry:
             value = self.check_carry(value)
-            self.stack = self.stack[:-1]
-        if operand == "==":
-            value = int(self.stack_first == self.stack_second)
-            self.stack = self.stack[:-2]
-        if operand == ">":
-            value = int(self.stack_first > self.stack_second)
-            self.stack = self.stack[:-2]
-        if operand == "<":
-            value = int(self.stack_first < self.stack_second)
-            self.stack = self.stack[:-2]
         self.alu_result = value
 
     def check_carry(self, value):
-        # надо, чтобы привести к 32-битному знаковому числу
-        if value < self.INT32_MIN or value > self.INT32_MAX:
+        # надо, чтобы привести к знаковому слову (alu.WordModel)
+        if value < self.word_min or value > self.word_max:
             self.carry = 1
-            value -= 2 ** 31
+            value = self.wrap(value)
         else:
             self.carry = 0
         return value
 
     def stack_push(self, value):
-        self.stack.append(value)
+        self.stack.push(value)
 
     def stack_pop(self):
-        self.stack = self.stack[:-1]
+        self.stack.pop()
 
     def push_return_stack(self):
-        self.return_stack.append(self.program_counter)
+        self.return_stack.push(self.program_counter)
 
     def pop_return_stack(self):
-        self.a = self.return_stack[-1]
-        self.return_stack = self.return_stack[:-1]
+        self.a = self.return_stack.pop()
 
     def stack_to_pc(self):
         self.program_counter = self.a
 
     def get_key_from_input(self, port):
-        if self.buffers[port]:
-            ch = self.buffers[port].pop(0)
-            self.a = ord(ch)
-            print(f"Read char '{ch}' (code {ord(ch)})")
+        ch = self.ports[port].read()
+        if ch is not None:
+            self.a = ord(ch) if self.bound is None else self.bound(ord(ch))
+            self.trace.microstep("Read char '%s' (code %s)", ch, self.a)
         else:
             self.a = 0
-            print("Input buffer empty")
+            self.trace.microstep("Input buffer empty")
 
     def load_alu_value(self):
-        self.alu_result = self.stack[-1]
-        self.stack = self.stack[:-1]
+        self.alu_result = self.stack.pop()
 
     def send_char_to_output(self, port):
-        if self.stack[-1] < 32:
-            value = str(self.stack[-1])
-        elif self.stack[-1] > 125:
-            value = str(self.stack[-1])
+        char = self.stack.pop()
+        if char < 32:
+            value = str(char)
+        elif char > 125:
+            value = str(char)
         else:
-            value = chr(self.stack[-1])
-        self.buffers[port].append(value)
-        print(f"Output char '{value}'")
-        self.stack = self.stack[:-1]
+            value = chr(char)
+        self.ports[port].write(value)
+        self.trace.microstep("Output char '%s'", value)
 
     def save_to_return_stack(self):
-        self.return_stack.append(self.stack[-1])
-        self.stack = self.stack[:-1]
-        print(self.return_stack)
+        self.return_stack.push(self.stack.pop())
+        self.trace.microstep("%s", self.return_stack)
 
     def return_stack_to_stack(self):
-        self.stack.append(self.return_stack[-1])
-        self.return_stack = self.return_stack[:-1]
+        self.stack.push(self.return_stack.pop())
 
     def save_alu_result(self):
-        self.stack.append(self.alu_result)
+        self.stack.push(self.alu_result)
 
 
 # надо сделать схему с вентилями и дальше в логгинге выполнения каждый команды написать какие вентили под нее я открываю
@@ -204,6 +196,7 @@ class ControlUnit:
     def __init__(self, data_path):
         self.mpc = 0
         self.data_path = data_path
+        self.trace = data_path.trace
         self._tick = 0
         self.step = 0
         self.input_index = 0
@@ -211,6 +204,8 @@ class ControlUnit:
         self.rep_swap_dup = False
         self.exit_out = ""
         self.next_command = False
+        self.current = None  # Последняя исполненная инструкция и её адрес (для трассировки)
+        self.current_address = None
 
     def tick(self):
         """Продвинуть модельное время процессора вперёд на один такт."""
@@ -222,29 +217,41 @@ class ControlUnit:
     def new_input_index(self):
         self.input_index += 1
 
+    def report_halt(self):
+        """Вывести итоговое состояние процессора после останова."""
+        print(f"Tick: {self._tick}, "
+              f"PC: {self.data_path.program_counter}, "
+              f"Stack: [{self.data_path.stack.first}, {self.data_path.stack.second}], "
+              f"Input: {self.data_path.input_buffer0}, "
+              f"Output: {self.data_path.output_buffer0}, "
+              f"a: {self.data_path.a}, "
+              f"b: {self.data_path.return_stack}, "
+              f"dump: {self.data_path.data_memory.cells(self.data_path.code_len, self.data_path.code_len + 50)}, ")
+        if self.data_path.cache is not None:
+            print(self.data_path.cache)
+
+    def run(self, limit):
+        """Исполнять инструкции, пока модельное время меньше limit."""
+        while self._tick < limit:
+            self.process_next_command()
+            self.trace.instruction(self)
+
     def process_next_command(self):
         if self.halted:
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
-            print(f"Tick: {self._tick}, "
-                  f"PC: {self.data_path.program_counter}, "
-                  f"Stack: [{self.data_path.stack[-1]}, {self.data_path.stack[-2]}], "
-                  f"Input: {self.data_path.input_buffer0}, "
-                  f"Output: {self.data_path.output_buffer0}, "
-                  f"a: {self.data_path.a}, "
-                  f"b: {self.data_path.return_stack}, "
-                  f"dump: {self.data_path.data_memory[self.data_path.code_len:self.data_path.code_len + 50]}, ")
+            self.report_halt()
             raise StopIteration()
 
         # if self.data_path.program_counter >= self.data_path.program_memory_size:
         #    raise StopIteration()
 
-        instr = self.data_path.data_memory[self.data_path.program_counter]
-        if instr == "0":
-            while instr == "0":
-                self.data_path.program_counter += 1
-                instr = self.data_path.data_memory[self.data_path.program_counter]
+        # заполнители "0" ссылаются на следующую инструкцию -- PC сразу переходит на неё
+        address, instr = self.data_path.data_memory.fetch(self.data_path.program_counter)
+        self.data_path.program_counter = address
         #print(instr)
+        self.current = instr
+        self.current_address = self.data_path.program_counter
+        if self.data_path.cache is not None:
+            self.data_path.stall_ticks += self.data_path.cache.access(self.current_address)
         opcode = instr["opcode"]
         # print(opcode)
         self.mpc = mapping.get(opcode, [])
@@ -264,111 +271,115 @@ class ControlUnit:
             self.next_command = False
             self.data_path.program_counter += 1
 
+        # ожидание памяти (промахи кэша) добавляется к стоимости инструкции
+        if self.data_path.stall_ticks:
+            self._tick += self.data_path.stall_ticks
+            self.data_path.stall_ticks = 0
+
     def micro_push(self, instr):
-        print(f"[tick {self._tick}] PUSH")
+        self.trace.microstep("[tick %s] PUSH", self._tick)
         self.data_path.stack_push()
 
     # --- Микрокоманды для каждой инструкции ---
     # DROP: удаляет верхний элемент стека (stack_first)
     def micro_drop(self, instr):
-        print(f"[tick {self._tick}] DROP")
+        self.trace.microstep("[tick %s] DROP", self._tick)
         self.data_path.stack_pop()
 
     # DUP: дублирует верхний элемент стека
     def micro_dup(self, instr):
-        print(f"[tick {self._tick}] DUP")
-        self.data_path.a = self.data_path.stack[-1]
-        self.data_path.stack = self.data_path.stack[:-1]
+        self.trace.microstep("[tick %s] DUP", self._tick)
+        self.data_path.a = self.data_path.stack.pop()
         self.mpc += 1
         #self.rep_swap_dup = True
 
     # SWAP: меняет местами верхние два элемента стека
     def micro_swap(self, instr):
-        print(f"[tick {self._tick}] SWAP")
+        self.trace.microstep("[tick %s] SWAP", self._tick)
         self.mpc += 1
         #self.rep_swap_dup = True
 
     # ADD
     def micro_add(self, instr):
-        print(f"[tick {self._tick}] ADD")
-        self.data_path.alu("+")
+        self.trace.microstep("[tick %s] ADD", self._tick)
+        self.data_path.alu(Opcode.ADD)
         self.mpc += 1
 
     # SUB
     def micro_sub(self, instr):
-        print(f"[tick {self._tick}] SUB")
-        self.data_path.alu("-")
+        self.trace.microstep("[tick %s] SUB", self._tick)
+        self.data_path.alu(Opcode.SUB)
         self.mpc += 1
 
     # MUL
     def micro_mul(self, instr):
-        print(f"[tick {self._tick}] MUL")
-        self.data_path.alu("*")
+        self.trace.microstep("[tick %s] MUL", self._tick)
+        self.data_path.alu(Opcode.MUL)
         self.mpc += 1
 
     # DIV
     def micro_div(self, instr):
-        print(f"[tick {self._tick}] DIV")
-        self.data_path.alu("/")
+        self.trace.microstep("[tick %s] DIV", self._tick)
+        self.data_path.alu(Opcode.DIV)
         self.mpc += 1
 
     # MOD
     def micro_mod(self, instr):
-        print(f"[tick {self._tick}] MOD")
-        self.data_path.alu("%")
+        self.trace.microstep("[tick %s] MOD", self._tick)
+        self.data_path.alu(Opcode.MOD)
         self.mpc += 1
 
     # NEGATE
     def micro_negate(self, instr):
-        print(f"[tick {self._tick}] NEGATE")
-        self.data_path.alu("--")
+        self.trace.microstep("[tick %s] NEGATE", self._tick)
+        self.data_path.alu(Opcode.NEGATE)
         self.mpc += 1
 
     # EQUAL (=)
     def micro_equal(self, instr):
-        print(f"[tick {self._tick}] EQUAL")
-        self.data_path.alu("==")
+        self.trace.microstep("[tick %s] EQUAL", self._tick)
+        self.data_path.alu(Opcode.EQUAL)
         self.mpc += 1
 
     # LESS (<)
     def micro_less(self, instr):
-        print(f"[tick {self._tick}] LESS")
-        self.data_path.alu("<")
+        self.trace.microstep("[tick %s] LESS", self._tick)
+        self.data_path.alu(Opcode.LESS)
         self.mpc += 1
 
     # GREATER (>)
     def micro_greater(self, instr):
-        print(f"[tick {self._tick}] GREATER")
-        self.data_path.alu(">")
+        self.trace.microstep("[tick %s] GREATER", self._tick)
+        self.data_path.alu(Opcode.GREATER)
         self.mpc += 1
 
     # AND
     def micro_and(self, instr):
-        print(f"[tick {self._tick}] AND")
-        self.data_path.alu("&")
+        self.trace.microstep("[tick %s] AND", self._tick)
+        self.data_path.alu(Opcode.AND)
         self.mpc += 1
 
     # OR
     def micro_or(self, instr):
-        print(f"[tick {self._tick}] OR")
-        self.data_path.alu("|")
+        self.trace.microstep("[tick %s] OR", self._tick)
+        self.data_path.alu(Opcode.OR)
         self.mpc += 1
 
     # XOR
     def micro_xor(self, instr):
-        print(f"[tick {self._tick}] XOR")
-        self.data_path.alu("^")
+        self.trace.microstep("[tick %s] XOR", self._tick)
+        self.data_path.alu(Opcode.XOR)
         self.mpc += 1
 
     # INVERT
     def micro_invert(self, instr):
-        print(f"[tick {self._tick}] INVERT")
-        self.data_path.alu("~")
+        self.trace.microstep("[tick %s] INVERT", self._tick)
+        self.data_path.alu(Opcode.INVERT)
         self.mpc += 1
 
     # IF (условный переход, реализуем как простой переход, если acc != 0)
     def micro_if_1(self, instr):
-        print(f"[tick {self._tick}] IF - проверка условия")
+        self.trace.microstep("[tick %s] IF - проверка условия", self._tick)
         self.data_path.load_alu_value()
         self.mpc += 1
         #print("tos:", self.data_path.tos)
@@ -377,26 +388,26 @@ class ControlUnit:
         addr = instr["arg"]
         if self.data_path.flag_zero():
             self.data_path.program_counter = addr - 1
-            print(f"[tick {self._tick}] IF - переход на {addr}")
+            self.trace.microstep("[tick %s] IF - переход на %s", self._tick, addr)
         else:
-            print(f"[tick {self._tick}] IF - переход не требуется (не ноль)")
+            self.trace.microstep("[tick %s] IF - переход не требуется (не ноль)", self._tick)
 
     # STORE - записать в память по адресу в stack_second значение из stack_first
     def micro_store(self, instr):
-        print(f"[tick {self._tick}] STORE")
+        self.trace.microstep("[tick %s] STORE", self._tick)
         self.data_path.write_in_memory()
 
     # FETCH - загрузить в стек значение из памяти по адресу stack_first
     def micro_fetch(self, instr):
-        print(f"[tick {self._tick}] FETCH")
+        self.trace.microstep("[tick %s] FETCH", self._tick)
         self.data_path.a = self.data_path.read_from_memory()
         self.mpc += 1
 
     # KEY - получить символ из входного буфера
     def micro_key(self, instr):
-        print(f"[tick {self._tick}] KEY")
+        self.trace.microstep("[tick %s] KEY", self._tick)
         port = instr["arg"]
-        if port in self.data_path.buffers and (port == 0 or port == 1):
+        if port == 0 or port == 1:
             self.data_path.get_key_from_input(port)
         else:
             raise ValueError(f"Неизвестный порт для чтения: {port}")
@@ -404,47 +415,47 @@ class ControlUnit:
 
     # HALT
     def micro_halt(self, instr):
-        print(f"[tick {self._tick}] HALT")
+        self.trace.microstep("[tick %s] HALT", self._tick)
         self.halted = True
 
     # LIT - загрузить литерал из инструкции
     def micro_lit_1(self, instr):
-        print(f"[tick {self._tick}] LIT - подготовка")
+        self.trace.microstep("[tick %s] LIT - подготовка", self._tick)
         self.mpc += 1
 
     def micro_lit_2(self, instr):
-        print(f"[tick {self._tick}] LIT - загрузка значения {instr['arg']}")
+        self.trace.microstep("[tick %s] LIT - загрузка значения %s", self._tick, instr["arg"])
         self.data_path.stack_push(instr["arg"])
 
     # EMIT - выводить символ из stack_first
     def micro_emit(self, instr):
-        print(f"[tick {self._tick}] EMIT")
+        self.trace.microstep("[tick %s] EMIT", self._tick)
         port = instr["arg"]
-        if port in self.data_path.buffers and (port == 2 or port == 3):
+        if port == 2 or port == 3:
             self.data_path.send_char_to_output(port)
         else:
             raise ValueError(f"Неизвестный порт для записи: {port}")
 
     def save_comeback_adr(self, instr):
-        print(f"[tick {self._tick}] COMEBACK ADR")
+        self.trace.microstep("[tick %s] COMEBACK ADR", self._tick)
         self.data_path.push_return_stack()
         self.mpc += 1
 
     # JUMP - перейти на адрес, заданный в аргументе инструкции
     def micro_jump(self, instr):
-        print(f"[tick {self._tick}] JUMP")
+        self.trace.microstep("[tick %s] JUMP", self._tick)
         target = instr.get("arg", 0)
-        print(f"Jump to {target}")
+        self.trace.microstep("Jump to %s", target)
         self.data_path.program_counter = target
 
 
     def micro_stack_to_a(self, instr):
-        print(f"[tick {self._tick}] FIRST_STACK -> A")
+        self.trace.microstep("[tick %s] FIRST_STACK -> A", self._tick)
         self.data_path.stack_to_a()
         self.mpc += 1
 
     def micro_a_to_stack(self, instr):
-        print(f"[tick {self._tick}] A -> STACK")
+        self.trace.microstep("[tick %s] A -> STACK", self._tick)
         self.data_path.a_to_stack()
         self.mpc += 1
 
@@ -455,7 +466,7 @@ class ControlUnit:
         self.data_path.stack_to_pc()
 
     def micro_carry(self, instr):
-        print(f"[tick {self._tick}] CARRY")
+        self.trace.microstep("[tick %s] CARRY", self._tick)
         self.data_path.stack_push(self.data_path.carry)
 
     def micro_stack_2_ret_stack(self, instr):
@@ -474,33 +485,76 @@ class ControlUnit:
         self.data_path.save_alu_result()
         self.mpc += 1
 
+    def brief(self):
+        """Краткое состояние для трассировки уровня INSTRUCTION."""
+        return (f"Tick: {self._tick}, "
+                f"PC: {self.data_path.program_counter}, "
+                f"Stack: [{self.data_path.stack.first}, {self.data_path.stack.second}], "
+                f"a: {self.data_path.a}")
+
     def __str__(self):
         return (f"Tick: {self._tick}, "
                 f"PC: {self.data_path.program_counter}, "
-                f"Stack: [{self.data_path.stack[-1]}, {self.data_path.stack[-2]}], "
+                f"Stack: [{self.data_path.stack.first}, {self.data_path.stack.second}], "
                 f"Input: {self.data_path.input_buffer0}, "
                 f"Output: {self.data_path.output_buffer0}, "
                 f"a: {self.data_path.a}, "
                 f"b: {self.data_path.return_stack}, "
-                f"dump: {self.data_path.data_memory[self.data_path.code_len - 1:self.data_path.code_len + 50]}, ")
-
-
-def simulation(code, code_len, input_tokens, data_memory_size, limit):
-    data_path = Datapath(data_memory_size, input_tokens, code, code_len)
-    control_unit = ControlUnit(data_path)
-
-    logging.debug("%s", control_unit)
+                f"dump: {self.data_path.data_memory.cells(self.data_path.code_len - 1, self.data_path.code_len + 50)}, ")
+
+
+def simulation(code, code_len, input_tokens, data_memory_size, limit, engine="mc", trace=TraceLevel.NONE, cache=None,
+               checkpoint_path=None, checkpoint_every=None, resume=None, ports=None, profiler=None,
+               memory_pages=None, memory_dump=None, word_bits=None, stack_size=1024, return_stack_size=1024):
+    """Запуск модели. code -- список ячеек (isa.bin_to_opcode) или образ image.ProgramImage,
+    input_tokens -- список символов ввода или ports.InputPort, ports -- прочие порты (см. Datapath),
+    profiler -- profiler.Profiler: получает каждую инструкцию вместе с trace (движки -- как с трассировкой),
+    engine -- "mc" (микропрограммное исполнение) или "predecoded" (таблицы обработчиков),
+    trace -- уровень трассировки (TraceLevel) или готовый TraceSink, cache -- модель кэша (cache.Cache).
+    memory_pages -- размер страницы страничной памяти (см. Datapath), memory_dump -- файл, в который после
+    останова пишутся изменённые страницы памяти (Memory.dump), word_bits -- ширина слова (см. Datapath).
+    stack_size, return_stack_size -- ёмкость стека данных и стека возвратов: переполнение прерывает
+    исполнение исключением stack.StackOverflowError.
+
+    checkpoint_path -- файл контрольной точки: пишется каждые checkpoint_every тактов (на первой границе
+    инструкции после кратного такта) и при превышении limit. resume -- продолжить с контрольной точки
+    (ввод -- из неё; порт, читавший поток, продолжает тот же поток из input_tokens или ports)."""
+    sink = trace if isinstance(trace, TraceSink) else make_sink(trace)
+    if profiler is not None:
+        sink = profiler if sink.level == TraceLevel.NONE else TeeSink(sink, profiler)
+    data_path = Datapath(data_memory_size, input_tokens, code, code_len, stack_size, return_stack_size, trace=sink,
+                         cache=cache, ports=ports, memory_pages=memory_pages, word_bits=word_bits)
+    saved = checkpoint.read(resume) if resume is not None else None
+    if saved is not None:
+        checkpoint.restore_datapath(saved, data_path)
+    control_unit = ENGINES[engine](data_path)
+    if saved is not None:
+        checkpoint.restore_control_unit(saved, control_unit)
+
+    sink.instruction(control_unit)
     try:
-        while control_unit.get_tick() < limit:
-            control_unit.process_next_command()
-            logging.debug("%s", control_unit)
+        if checkpoint_path is not None and checkpoint_every:
+            while control_unit.get_tick() < limit:
+                control_unit.run(min(limit, (control_unit.get_tick() // checkpoint_every + 1) * checkpoint_every))
+                checkpoint.write(checkpoint_path, control_unit)
+        else:
+            control_unit.run(limit)
     except EOFError:
         logging.warning("Input buffer is empty!")
     except StopIteration:
         pass
+    finally:
+        sink.close()
+        data_path.ports[2].flush()
+        data_path.ports[3].flush()
 
     if control_unit.get_tick() >= limit:
         logging.warning("Tick limit exceeded!")
+        if checkpoint_path is not None and not checkpoint_every:
+            checkpoint.write(checkpoint_path, control_unit)
+    if memory_dump is not None:
+        with open(memory_dump, "w", encoding="utf-8") as file:
+            data_path.data_memory.dump(file)
 
     return "".join(data_path.output_buffer0), control_unit.get_tick()
 
@@ -607,38 +661,1164 @@ mapping = {
     Opcode.HALT: 67
 }
 
+# Микрокоманды, на которых заканчивается микропрограмма инструкции (не меняют mpc)
+final_microcode = {
+    ControlUnit.micro_next_command,
+    ControlUnit.micro_if_2,
+    ControlUnit.micro_store,
+    ControlUnit.micro_lit_2,
+    ControlUnit.micro_jump,
+    ControlUnit.micro_ret,
+    ControlUnit.micro_drop,
+    ControlUnit.micro_emit,
+    ControlUnit.micro_carry,
+    ControlUnit.micro_halt,
+}
+
+
+def microprogram_ticks(start):
+    """Число тактов микропрограммы, начинающейся с адреса start в mp."""
+    ticks = 1
+    while mp[start] not in final_microcode:
+        start += 1
+        ticks += 1
+    return ticks
+
+
+# Стоимость каждой инструкции в тактах -- столько же, сколько шагов делает микропрограммный автомат
+instruction_ticks = {opcode: microprogram_ticks(start) for opcode, start in mapping.items()}
+
+
+class PredecodedControlUnit(ControlUnit):
+    """Исполнение по декодированному образу.
+
+    Для каждого адреса образа при первом исполнении строится обработчик инструкции и её стоимость
+    в тактах (decode), дальше исполнение -- вызовы из таблицы. Ячейки-заполнители "0" получают обработчик
+    следующей инструкции, поэтому пропуск заполнителей не требует цикла. Счетчик тактов, вывод и память
+    совпадают с микропрограммным исполнением.
+    """
+
+    def __init__(self, data_path):
+        super().__init__(data_path)
+        self.handlers = []
+        self.costs = []
+        self.predecode()
+
+    def predecode(self):
+        """Пустые таблицы: None -- адрес ещё не декодирован (стоимость 0, чтобы не считать такты дважды)."""
+        size = len(self.data_path.data_memory.instructions)
+        self.handlers = [None] * size
+        self.costs = [0] * size
+        # адрес, по которому выбирается инструкция (для кэша): заполнитель -> следующая инструкция
+        self.fetch_addresses = list(range(size)) if self.data_path.cache is not None else None
+
+    def decode(self, addr):
+        """Обработчик и стоимость для адреса образа addr."""
+        entry = self.data_path.data_memory.entry(addr)
+        if entry is None:
+            handler, cost, target = self.fetch_data, 0, addr
+        else:
+            target, instr = entry
+            if target == addr:
+                opcode = instr["opcode"]
+                handler = handler_builders[opcode](self, addr, instr.get("arg"))
+                cost = instruction_ticks[opcode]
+            else:
+                handler = self.handlers[target] or self.decode(target)
+                cost = self.costs[target]
+        self.handlers[addr] = handler
+        self.costs[addr] = cost
+        if self.fetch_addresses is not None:
+            self.fetch_addresses[addr] = target
+        return handler
+
+    def invalidate(self, addr):
+        """Запись поверх кода или заполнителя: ячейка и предшествующие ей заполнители больше не исполняются.
+
+        Возвращает первый адрес, который перестал исполняться.
+        """
+        first = self.data_path.data_memory.overwrite(addr)
+        for address in range(first, min(addr + 1, len(self.handlers))):
+            self.handlers[address] = self.fetch_data
+            self.costs[address] = 0
+        return first
+
+    def fetch_data(self):
+        raise Exception("Instruction fetch from data cell")
+
+    def check_carry(self, value):
+        data_path = self.data_path
+        if value < data_path.word_min or value > data_path.word_max:
+            data_path.carry = 1
+            return data_path.wrap(value)
+        data_path.carry = 0
+        return value
+
+    # --- Построители обработчиков: (адрес, аргумент) -> функция, возвращающая следующий PC ---
+    def build_lit(self, pc, arg):
+        push = self.data_path.stack.push
+        next_pc = pc + 1
+
+        def lit():
+            push(arg)
+            return next_pc
+
+        return lit
+
+    def build_fetch(self, pc, arg):
+        data_path = self.data_path
+        stack = data_path.stack
+        words = data_path.data_memory.words
+        next_pc = pc + 1
+
+        if data_path.cache is not None:
+            access = data_path.cache.access
+
+            def cached_fetch():
+                addr = stack.peek()
+                if not 0 <= addr < data_path.data_memory_size:
+                    raise Exception("Fetch address out of range")
+                data_path.stall_ticks += access(addr)
+                data_path.a = stack.first = words[addr]
+                return next_pc
+
+            return cached_fetch
+
+        def fetch():
+            addr = stack.peek()
+            if not 0 <= addr < data_path.data_memory_size:
+                raise Exception("Fetch address out of range")
+            data_path.a = stack.first = words[addr]
+            return next_pc
+
+        return fetch
+
+    def build_store(self, pc, arg):
+        data_path = self.data_path
+        pop_pair = data_path.stack.pop_pair
+        words = data_path.data_memory.words
+        kinds = data_path.data_memory.kinds
+        next_pc = pc + 1
+
+        if data_path.cache is not None:
+            access = data_path.cache.access
+
+            def cached_store():
+                value, addr = pop_pair()
+                if not 0 <= addr < data_path.data_memory_size:
+                    raise Exception("Store address out of range")
+                data_path.stall_ticks += access(addr, True)
+                words[addr] = value
+                if kinds[addr]:
+                    self.invalidate(addr)
+                return next_pc
+
+            return cached_store
+
+        def store():
+            value, addr = pop_pair()
+            if not 0 <= addr < data_path.data_memory_size:
+                raise Exception("Store address out of range")
+            words[addr] = value
+            if kinds[addr]:
+                self.invalidate(addr)
+            return next_pc
+
+        return store
+
+    @staticmethod
+    def build_alu(operation):
+        """Обработчик операции АЛУ по её описанию (alu.AluOperation)."""
+        function = operation.function
+
+        def build(self, pc, arg):
+            stack = self.data_path.stack
+            check_carry = self.check_carry
+            next_pc = pc + 1
+
+            if operation.arity == 1:
+                if operation.carry:
+                    def unary_with_carry():
+                        stack.first = check_carry(function(stack.peek()))
+                        return next_pc
+
+                    return unary_with_carry
+
+                def unary():
+                    stack.first = function(stack.peek())
+                    return next_pc
+
+                return unary
+
+            reduce = stack.reduce
+            if operation.carry:
+                def with_carry(first, second):
+                    return check_carry(function(first, second))
+
+                def binary_with_carry():
+                    reduce(with_carry)
+                    return next_pc
+
+                return binary_with_carry
+
+            def binary():
+                reduce(function)
+                return next_pc
+
+            return binary
+
+        return build
+
+    def build_dup(self, pc, arg):
+        data_path = self.data_path
+        stack = data_path.stack
+        push = stack.push
+        next_pc = pc + 1
+
+        def dup():
+            data_path.a = stack.peek()
+            push(data_path.a)
+            return next_pc
+
+        return dup
+
+    def build_swap(self, pc, arg):
+        data_path = self.data_path
+        stack = data_path.stack
+        next_pc = pc + 1
+
+        def swap():
+            stack.swap()
+            data_path.a = stack.first
+            return next_pc
+
+        return swap
+
+    def build_drop(self, pc, arg):
+        pop = self.data_path.stack.pop
+        next_pc = pc + 1
+
+        def drop():
+            pop()
+            return next_pc
+
+        return drop
+
+    def build_if(self, pc, arg):
+        pop = self.data_path.stack.pop
+        next_pc = pc + 1
+
+        def branch():
+            if pop() == 0:
+                return arg
+            return next_pc
+
+        return branch
+
+    def build_jump(self, pc, arg):
+        def jump():
+            return arg
+
+        return jump
+
+    def build_call(self, pc, arg):
+        return_stack = self.data_path.return_stack
+
+        def call():
+            return_stack.push(pc)
+            return arg
+
+        return call
+
+    def build_ret(self, pc, arg):
+        data_path = self.data_path
+        return_stack = data_path.return_stack
+
+        def ret():
+            data_path.a = return_stack.pop()
+            return data_path.a + 1
+
+        return ret
+
+    def build_carry(self, pc, arg):
+        data_path = self.data_path
+        push = data_path.stack.push
+        next_pc = pc + 1
+
+        def carry():
+            push(data_path.carry)
+            return next_pc
+
+        return carry
+
+    def build_in(self, pc, arg):
+        data_path = self.data_path
+        push = data_path.stack.push
+        next_pc = pc + 1
+
+        if arg not in (0, 1):
+            def unknown():
+                raise ValueError(f"Неизвестный порт для чтения: {arg}")
+
+            return unknown
+        read = data_path.ports[arg].read
+        bound = data_path.bound
+
+        if bound is not None:
+            def bounded_key():
+                char = read()
+                data_path.a = 0 if char is None else bound(ord(char))
+                push(data_path.a)
+                return next_pc
+
+            return bounded_key
+
+        def key():
+            char = read()
+            data_path.a = 0 if char is None else ord(char)
+            push(data_path.a)
+            return next_pc
+
+        return key
+
+    def build_out(self, pc, arg):
+        data_path = self.data_path
+        pop = data_path.stack.pop
+        next_pc = pc + 1
+
+        if arg not in (2, 3):
+            def unknown():
+                raise ValueError(f"Неизвестный порт для записи: {arg}")
+
+            return unknown
+        write = data_path.ports[arg].write
+
+        def emit():
+            value = pop()
+            write(str(value) if value < 32 or value > 125 else chr(value))
+            return next_pc
+
+        return emit
+
+    def build_halt(self, pc, arg):
+        def halt():
+            self.halted = True
+            self.data_path.program_counter = pc
+            raise StopIteration()
+
+        return halt
+
+    def run(self, limit):
+        """Без трассировки и кэша -- цикл без лишних проверок. Микрошагов у этого движка нет,
+        поэтому на уровнях выше INSTRUCTION пишется только состояние после инструкций."""
+        handlers = self.handlers
+        costs = self.costs
+        data_path = self.data_path
+        pc = data_path.program_counter
+        tick = self._tick
+        traced = self.trace.level != TraceLevel.NONE
+        cache = data_path.cache
+        try:
+            if self.halted:
+                pass
+            elif not traced and cache is None:
+                while True:
+                    try:
+                        while tick < limit:
+                            tick += costs[pc]
+                            pc = handlers[pc]()
+                        break
+                    except TypeError:
+                        # вызов None -- адрес ещё не декодирован
+                        if handlers[pc] is not None:
+                            raise
+                        self.decode(pc)
+            else:
+                memory = data_path.data_memory
+                while tick < limit:
+                    if traced:
+                        self.current_address, self.current = memory.fetch(pc)
+                    if pc < len(handlers) and handlers[pc] is None:
+                        self.decode(pc)
+                    if cache is not None:
+                        tick += cache.access(self.fetch_addresses[pc])
+                    tick += costs[pc]
+                    pc = handlers[pc]()
+                    tick += data_path.stall_ticks
+                    data_path.stall_ticks = 0
+                    if traced:
+                        data_path.program_counter = pc
+                        self._tick = tick
+                        self.trace.instruction(self)
+        except IndexError:
+            if pc < len(handlers):
+                raise
+            raise Exception("Instruction fetch from data cell") from None
+        except StopIteration:
+            pc = data_path.program_counter
+            if traced:
+                self._tick = tick
+                self.trace.instruction(self)
+        finally:
+            self.data_path.program_counter = pc
+            self._tick = tick
+        if self.halted and tick < limit:
+            self.report_halt()
+            raise StopIteration()
+
+
+# Построители обработчиков для каждого опкода
+handler_builders = {
+    Opcode.LIT: PredecodedControlUnit.build_lit,
+    Opcode.FETCH: PredecodedControlUnit.build_fetch,
+    Opcode.STORE: PredecodedControlUnit.build_store,
+    Opcode.DUP: PredecodedControlUnit.build_dup,
+    Opcode.SWAP: PredecodedControlUnit.build_swap,
+    Opcode.DROP: PredecodedControlUnit.build_drop,
+    Opcode.IF: PredecodedControlUnit.build_if,
+    Opcode.JUMP: PredecodedControlUnit.build_jump,
+    Opcode.CALL: PredecodedControlUnit.build_call,
+    Opcode.RET: PredecodedControlUnit.build_ret,
+    Opcode.CARRY: PredecodedControlUnit.build_carry,
+    Opcode.IN: PredecodedControlUnit.build_in,
+    Opcode.OUT: PredecodedControlUnit.build_out,
+    Opcode.HALT: PredecodedControlUnit.build_halt,
+    **{opcode: PredecodedControlUnit.build_alu(operation) for opcode, operation in alu_operations.items()},
+}
+
+class FusedControlUnit(PredecodedControlUnit):
+    """Предекодированное исполнение со слиянием частых последовательностей инструкций (суперинструкции).
+
+    При первом исполнении последовательность, совпавшая с шаблоном из fusion_patterns, получает один обработчик
+    по адресу первой инструкции, его стоимость -- сумма тактов входящих инструкций. Обработчики
+    остальных инструкций последовательности не меняются, переход в её середину исполняется как обычно.
+    Слияние действует только без трассировки и кэша: там нужны состояние и выборка на каждой инструкции.
+    """
+
+    def __init__(self, data_path):
+        self.fused = {}  # адрес первой инструкции -> адрес после последней
+        self.fusion = data_path.trace.level == TraceLevel.NONE and data_path.cache is None
+        super().__init__(data_path)
+
+    def predecode(self):
+        super().predecode()
+        self.fused_handlers = list(self.handlers)
+        self.fused_costs = list(self.costs)
+
+    def decode_fused(self, addr):
+        """Обработчик для addr с учётом слияний: последовательность сопоставляется с шаблонами
+        при первом исполнении её первой инструкции."""
+        entry = self.data_path.data_memory.entry(addr)
+        if entry is not None and entry[0] != addr:
+            target = entry[0]
+            handler = self.fused_handlers[target] or self.decode_fused(target)
+            cost = self.fused_costs[target]
+        else:
+            handler = self.handlers[addr] or self.decode(addr)
+            cost = self.costs[addr]
+            if entry is not None:
+                sequence = self.sequence_at(addr, max_fusion_length)
+                opcodes = [instr["opcode"] for _, instr in sequence]
+                for pattern, builder in fusion_patterns:
+                    if len(pattern) <= len(opcodes) and all(
+                            opcode in allowed for opcode, allowed in zip(opcodes, pattern)):
+                        fused = sequence[:len(pattern)]
+                        next_pc = fused[-1][0] + 1
+                        handler = builder(self, [instr for _, instr in fused], next_pc)
+                        cost = sum(instruction_ticks[instr["opcode"]] for _, instr in fused)
+                        self.fused[addr] = next_pc
+                        break
+        self.fused_handlers[addr] = handler
+        self.fused_costs[addr] = cost
+        return handler
+
+    def sequence_at(self, addr, count):
+        """До count инструкций подряд начиная с addr: [(адрес, инструкция)]."""
+        memory = self.data_path.data_memory
+        sequence = []
+        while len(sequence) < count and addr < len(memory.instructions) and memory.entry(addr) is not None:
+            address, instr = memory.entry(addr)
+            sequence.append((address, instr))
+            addr = address + 1
+        return sequence
+
+    def invalidate(self, addr):
+        """Кроме самой ячейки -- слияния, которые её захватывают: они и ссылающиеся на них заполнители
+        декодируются заново при следующем исполнении."""
+        first = super().invalidate(addr)
+        for address in range(first, min(addr + 1, len(self.handlers))):
+            self.fused_handlers[address] = self.fetch_data
+            self.fused_costs[address] = 0
+        kinds = self.data_path.data_memory.kinds
+        for start in [start for start, end in self.fused.items() if start <= addr < end]:
+            del self.fused[start]
+            self.fused_handlers[start] = None
+            self.fused_costs[start] = 0
+            while start > 0 and kinds[start - 1] == CELL_PADDING:
+                start -= 1
+                self.fused_handlers[start] = None
+                self.fused_costs[start] = 0
+        return first
+
+    def run(self, limit):
+        """Слияния исполняются, пока до limit остаётся больше самой дорогой последовательности,
+        хвост -- по одной инструкции, чтобы останов по лимиту был на той же инструкции, что и без слияний."""
+        guard = limit - max_fused_cost
+        if self.fusion and not self.halted and self._tick < guard:
+            handlers = self.fused_handlers
+            costs = self.fused_costs
+            data_path = self.data_path
+            pc = data_path.program_counter
+            tick = self._tick
+            try:
+                while True:
+                    try:
+                        while tick < guard:
+                            tick += costs[pc]
+                            pc = handlers[pc]()
+                        break
+                    except TypeError:
+                        if handlers[pc] is not None:
+                            raise
+                        self.decode_fused(pc)
+            except IndexError:
+                if pc < len(handlers):
+                    raise
+                raise Exception("Instruction fetch from data cell") from None
+            except StopIteration:
+                pc = data_path.program_counter
+            finally:
+                data_path.program_counter = pc
+                self._tick = tick
+        super().run(limit)
+
+    # --- Построители слияний: (инструкции последовательности, следующий PC) -> обработчик ---
+    def fuse_lit_lit(self, instrs, next_pc):
+        push = self.data_path.stack.push
+        first, second = instrs[0]["arg"], instrs[1]["arg"]
+
+        def lit_lit():
+            push(first)
+            push(second)
+            return next_pc
+
+        return lit_lit
+
+    def fuse_lit_fetch(self, instrs, next_pc):
+        data_path = self.data_path
+        push = data_path.stack.push
+        words = data_path.data_memory.words
+        addr = instrs[0]["arg"]
+        in_range = 0 <= addr < data_path.data_memory_size
+
+        def lit_fetch():
+            if not in_range:
+                raise Exception("Fetch address out of range")
+            data_path.a = words[addr]
+            push(data_path.a)
+            return next_pc
+
+        return lit_fetch
+
+    def binary_operation(self, opcode):
+        operation = alu_operations[opcode]
+        if not operation.carry:
+            return operation.function
+        function = operation.function
+        check_carry = self.check_carry
+        return lambda first, second: check_carry(function(first, second))
+
+    def fuse_lit_binary(self, instrs, next_pc):
+        stack = self.data_path.stack
+        operation = self.binary_operation(instrs[1]["opcode"])
+        value = instrs[0]["arg"]
+
+        def lit_binary():
+            stack.first = operation(value, stack.peek())
+            return next_pc
+
+        return lit_binary
+
+    def fuse_lit_swap_binary(self, instrs, next_pc):
+        data_path = self.data_path
+        stack = data_path.stack
+        operation = self.binary_operation(instrs[2]["opcode"])
+        value = instrs[0]["arg"]
+
+        def lit_swap_binary():
+            data_path.a = stack.peek()
+            stack.first = operation(data_path.a, value)
+            return next_pc
+
+        return lit_swap_binary
+
+    def fuse_lit_fetch_binary(self, instrs, next_pc):
+        data_path = self.data_path
+        stack = data_path.stack
+        words = data_path.data_memory.words
+        operation = self.binary_operation(instrs[2]["opcode"])
+        addr = instrs[0]["arg"]
+        in_range = 0 <= addr < data_path.data_memory_size
+
+        def lit_fetch_binary():
+            if not in_range:
+                raise Exception("Fetch address out of range")
+            second = stack.peek()
+            data_path.a = words[addr]
+            stack.first = operation(data_path.a, second)
+            return next_pc
+
+        return lit_fetch_binary
+
+    def fuse_lit_swap_store(self, instrs, next_pc):
+        data_path = self.data_path
+        pop = data_path.stack.pop
+        words = data_path.data_memory.words
+        kinds = data_path.data_memory.kinds
+        addr = instrs[0]["arg"]
+        in_range = 0 <= addr < data_path.data_memory_size
+
+        def lit_swap_store():
+            data_path.a = value = pop()
+            if not in_range:
+                raise Exception("Store address out of range")
+            words[addr] = value
+            if kinds[addr]:
+                self.invalidate(addr)
+            return next_pc
+
+        return lit_swap_store
+
+    def fuse_swap_store(self, instrs, next_pc):
+        data_path = self.data_path
+        pop_pair = data_path.stack.pop_pair
+        words = data_path.data_memory.words
+        kinds = data_path.data_memory.kinds
+
+        def swap_store():
+            addr, data_path.a = pop_pair()
+            if not 0 <= addr < data_path.data_memory_size:
+                raise Exception("Store address out of range")
+            words[addr] = data_path.a
+            if kinds[addr]:
+                self.invalidate(addr)
+            return next_pc
+
+        return swap_store
+
+    def fuse_increment(self, instrs, next_pc):
+        """dup @ lit N + ! -- прибавить N к ячейке по адресу на вершине стека."""
+        data_path = self.data_path
+        pop = data_path.stack.pop
+        words = data_path.data_memory.words
+        kinds = data_path.data_memory.kinds
+        check_carry = self.check_carry
+        step = instrs[2]["arg"]
+
+        def increment():
+            addr = pop()
+            if not 0 <= addr < data_path.data_memory_size:
+                raise Exception("Fetch address out of range")
+            data_path.a = words[addr]
+            words[addr] = check_carry(step + data_path.a)
+            if kinds[addr]:
+                self.invalidate(addr)
+            return next_pc
+
+        return increment
+
+
+BINARY = binary_opcodes
+# Шаблоны слияния (по убыванию длины): для каждой позиции -- допустимые опкоды
+fusion_patterns = [
+    (({Opcode.DUP}, {Opcode.FETCH}, {Opcode.LIT}, {Opcode.ADD}, {Opcode.STORE}), FusedControlUnit.fuse_increment),
+    (({Opcode.LIT}, {Opcode.FETCH}, BINARY), FusedControlUnit.fuse_lit_fetch_binary),
+    (({Opcode.LIT}, {Opcode.SWAP}, {Opcode.STORE}), FusedControlUnit.fuse_lit_swap_store),
+    (({Opcode.LIT}, {Opcode.SWAP}, BINARY), FusedControlUnit.fuse_lit_swap_binary),
+    (({Opcode.LIT}, {Opcode.FETCH}), FusedControlUnit.fuse_lit_fetch),
+    (({Opcode.LIT}, BINARY), FusedControlUnit.fuse_lit_binary),
+    (({Opcode.LIT}, {Opcode.LIT}), FusedControlUnit.fuse_lit_lit),
+    (({Opcode.SWAP}, {Opcode.STORE}), FusedControlUnit.fuse_swap_store),
+]
+max_fusion_length = max(len(pattern) for pattern, _ in fusion_patterns)
+# Верхняя граница стоимости слияния: слияния находятся во время исполнения, запас до лимита нужен заранее
+max_fused_cost = max(sum(max(instruction_ticks[opcode] for opcode in allowed) for allowed in pattern)
+                     for pattern, _ in fusion_patterns)
+
+
+# Инструкции, которыми заканчивается базовый блок
+block_terminators = frozenset({Opcode.JUMP, Opcode.CALL, Opcode.IF, Opcode.RET, Opcode.HALT})
+# Операции АЛУ, которые в блоке записываются выражением (остальные -- вызовом функции из alu_operations)
+jit_expressions = {
+    Opcode.ADD: "{0} + {1}",
+    Opcode.SUB: "{0} - {1}",
+    Opcode.MUL: "{0} * {1}",
+    Opcode.MOD: "{0} % {1}",
+    Opcode.NEGATE: "-{0}",
+    Opcode.EQUAL: "int({0} == {1})",
+    Opcode.LESS: "int({0} < {1})",
+    Opcode.GREATER: "int({0} > {1})",
+    Opcode.AND: "{0} & {1}",
+    Opcode.OR: "{0} | {1}",
+    Opcode.XOR: "{0} ^ {1}",
+    Opcode.INVERT: "~{0}",
+}
+jit_threshold = 16  # исполнений блока до компиляции
+max_block_length = 64  # инструкций в блоке
+max_block_cost = max_block_length * max(instruction_ticks.values())
+
+
+class BlockCompiler:
+    """Исходный текст функции базового блока (JitControlUnit).
+
+    Значения стека внутри блока -- локальные переменные (символический стек: имена и константы lit, снизу
+    вверх). Со стека данных снимается только то, чего блок не положил сам, остаток кладётся обратно
+    на выходе; a и флаг переноса тоже пишутся в Datapath на выходе."""
+
+    def __init__(self, data_path, sequence):
+        self.data_path = data_path
+        self.sequence = sequence
+        self.lines = []
+        self.stack = []
+        self.temps = 0
+        self.a = None  # выражение со значением регистра a, None -- блок его не менял
+        self.carry = False  # флаг переноса уже в локальной carry
+
+    def line(self, text):
+        self.lines.append(f"    {text}")
+
+    def temp(self, expression):
+        name = f"t{self.temps}"
+        self.temps += 1
+        self.line(f"{name} = {expression}")
+        return name
+
+    def need(self, count):
+        """Снять со стека данных значения, которых не хватает символическому стеку."""
+        while len(self.stack) < count:
+            self.stack.insert(0, self.temp("pop()"))
+
+    def pop(self):
+        self.need(1)
+        return self.stack.pop()
+
+    def exit_lines(self):
+        lines = [f"push({value})" for value in self.stack]
+        if self.a is not None:
+            lines.append(f"data_path.a = {self.a}")
+        if self.carry:
+            lines.append("data_path.carry = carry")
+        return lines
+
+    def leave(self, *lines):
+        for text in self.exit_lines() + list(lines):
+            self.line(text)
+
+    def check_range(self, addr, message):
+        if isinstance(addr, int):
+            if not 0 <= addr < self.data_path.data_memory_size:
+                self.line(f"raise Exception({message!r})")
+        else:
+            self.line(f"if not 0 <= {addr} < {self.data_path.data_memory_size}:")
+            self.line(f"    raise Exception({message!r})")
+
+    def source(self, start):
+        remaining = sum(instruction_ticks[instr["opcode"]] for _, instr in self.sequence)
+        for pc, instr in self.sequence:
+            opcode, arg = instr["opcode"], instr.get("arg")
+            remaining -= instruction_ticks[opcode]
+            if opcode in alu_operations:
+                self.emit_alu(opcode)
+            else:
+                block_emitters[opcode](self, pc, arg, remaining)
+        if opcode not in block_terminators:
+            self.leave(f"return {pc + 1}")
+        return "\n".join([f"def block_{start}():", *self.lines])
+
+    def emit_alu(self, opcode):
+        operation = alu_operations[opcode]
+        operands = [self.pop() for _ in range(operation.arity)]  # вершина -- первым операндом
+        if opcode in jit_expressions:
+            value = self.temp(jit_expressions[opcode].format(*operands))
+        else:
+            value = self.temp(f"alu_{opcode.name.lower()}({', '.join(map(str, operands))})")
+        if operation.carry:
+            self.line(f"if {value} < {self.data_path.word_min} or {value} > {self.data_path.word_max}:")
+            self.line("    carry = 1")
+            self.line(f"    {value} = wrap({value})")
+            self.line("else:")
+            self.line("    carry = 0")
+            self.carry = True
+        self.stack.append(value)
+
+    def emit_lit(self, pc, arg, remaining):
+        self.stack.append(arg)
+
+    def emit_fetch(self, pc, arg, remaining):
+        self.need(1)
+        self.check_range(self.stack[-1], "Fetch address out of range")
+        self.a = self.stack[-1] = self.temp(f"words[{self.stack[-1]}]")
+
+    def emit_store(self, pc, arg, remaining):
+        value, addr = self.pop(), self.pop()
+        self.check_range(addr, "Store address out of range")
+        if isinstance(addr, int) and not 0 <= addr < self.data_path.data_memory_size:
+            return
+        self.line(f"words[{addr}] = {value}")
+        # запись в код: ячейка больше не исполняется, блок заканчивается на этой инструкции
+        if not isinstance(addr, int) or self.data_path.data_memory.kinds[addr]:
+            self.line(f"if kinds[{addr}]:")
+            for text in [*self.exit_lines(), f"invalidate({addr})", f"unit.refund += {remaining}",
+                         f"return {pc + 1}"]:
+                self.line(f"    {text}")
+
+    def emit_dup(self, pc, arg, remaining):
+        self.need(1)
+        self.a = self.stack[-1]
+        self.stack.append(self.a)
+
+    def emit_swap(self, pc, arg, remaining):
+        self.need(2)
+        self.stack[-1], self.stack[-2] = self.stack[-2], self.stack[-1]
+        self.a = self.stack[-1]
+
+    def emit_drop(self, pc, arg, remaining):
+        self.pop()
+
+    def emit_carry(self, pc, arg, remaining):
+        self.stack.append(self.temp("carry" if self.carry else "data_path.carry"))
+
+    def emit_in(self, pc, arg, remaining):
+        char = self.temp(f"read{arg}()")
+        self.line(f"{char} = 0 if {char} is None else ord({char})")
+        if self.data_path.bound is not None:
+            self.line(f"{char} = wrap({char})")
+        self.a = char
+        self.stack.append(char)
+
+    def emit_out(self, pc, arg, remaining):
+        value = self.pop()
+        if isinstance(value, int):
+            self.line(f"write{arg}({str(value) if value < 32 or value > 125 else chr(value)!r})")
+        else:
+            self.line(f"write{arg}(str({value}) if {value} < 32 or {value} > 125 else chr({value}))")
+
+    def emit_if(self, pc, arg, remaining):
+        condition = self.pop()
+        if isinstance(condition, int):
+            self.leave(f"return {arg if condition == 0 else pc + 1}")
+        else:
+            self.leave(f"return {arg} if {condition} == 0 else {pc + 1}")
+
+    def emit_jump(self, pc, arg, remaining):
+        self.leave(f"return {arg}")
+
+    def emit_call(self, pc, arg, remaining):
+        self.leave(f"return_stack.push({pc})", f"return {arg}")
+
+    def emit_ret(self, pc, arg, remaining):
+        self.a = None
+        self.leave("data_path.a = address = return_stack.pop()", "return address + 1")
+
+    def emit_halt(self, pc, arg, remaining):
+        self.leave("unit.halted = True", f"data_path.program_counter = {pc}", "raise StopIteration()")
+
+
+block_emitters = {
+    Opcode.LIT: BlockCompiler.emit_lit,
+    Opcode.FETCH: BlockCompiler.emit_fetch,
+    Opcode.STORE: BlockCompiler.emit_store,
+    Opcode.DUP: BlockCompiler.emit_dup,
+    Opcode.SWAP: BlockCompiler.emit_swap,
+    Opcode.DROP: BlockCompiler.emit_drop,
+    Opcode.IF: BlockCompiler.emit_if,
+    Opcode.JUMP: BlockCompiler.emit_jump,
+    Opcode.CALL: BlockCompiler.emit_call,
+    Opcode.RET: BlockCompiler.emit_ret,
+    Opcode.CARRY: BlockCompiler.emit_carry,
+    Opcode.IN: BlockCompiler.emit_in,
+    Opcode.OUT: BlockCompiler.emit_out,
+    Opcode.HALT: BlockCompiler.emit_halt,
+}
+
+
+class JitControlUnit(FusedControlUnit):
+    """fused с компиляцией горячих базовых блоков в функции Python.
+
+    Базовый блок -- инструкции подряд от адреса, на который пришло управление, до перехода, вызова, if,
+    ret или halt включительно (не длиннее max_block_length). Первые threshold исполнений блок идёт
+    обработчиками predecoded, затем его текст (BlockCompiler) компилируется compile() в одну функцию:
+    значения стека внутри блока -- локальные переменные, такты всего блока начисляются одним сложением.
+    Запись в код (! в ячейку инструкции или заполнителя) сбрасывает блоки, которые её захватывают,
+    а скомпилированный блок заканчивается на этой записи (неисполненные такты возвращаются).
+    Как и слияния -- только без трассировки и кэша; при ошибке внутри блока такты и стек могут
+    отличаться от исполнения по одной инструкции.
+    """
+
+    threshold = jit_threshold
+
+    def __init__(self, data_path):
+        self.blocks = {}  # адрес начала блока -> адрес после последней инструкции
+        self.namespace = None
+        self.refund = 0  # такты, начисленные за инструкции после записи в код (блок вышел раньше)
+        super().__init__(data_path)
+
+    def predecode(self):
+        super().predecode()
+        self.block_handlers = list(self.handlers)
+        self.block_costs = list(self.costs)
+
+    def block_at(self, addr):
+        """Инструкции блока с адреса addr: [(адрес, инструкция)], пусто -- блок не строится."""
+        block = []
+        for address, instr in self.sequence_at(addr, max_block_length):
+            opcode, port = instr["opcode"], instr.get("arg")
+            if opcode is Opcode.IN and port not in (0, 1) or opcode is Opcode.OUT and port not in (2, 3):
+                break
+            block.append((address, instr))
+            if opcode in block_terminators:
+                break
+        return block
+
+    def decode_block(self, addr):
+        entry = self.data_path.data_memory.entry(addr)
+        if entry is not None and entry[0] != addr:
+            target = entry[0]
+            handler = self.block_handlers[target] or self.decode_block(target)
+            cost = self.block_costs[target]
+        else:
+            block = self.block_at(addr) if entry is not None else []
+            if block:
+                handler = self.profile_block(addr, block)
+                cost = sum(instruction_ticks[instr["opcode"]] for _, instr in block)
+                self.blocks[addr] = block[-1][0] + 1
+            else:
+                # ячейка данных или порт, которого нет, -- обработчик predecoded
+                handler = self.handlers[addr] or self.decode(addr)
+                cost = self.costs[addr]
+        self.block_handlers[addr] = handler
+        self.block_costs[addr] = cost
+        return handler
+
+    def profile_block(self, start, block):
+        """Обработчик холодного блока: исполняет инструкции обработчиками predecoded и считает запуски,
+        на запуске после threshold-го компилирует блок и ставит его в таблицу.
+
+        Исполнение идёт по PC, который возвращают обработчики; запись в код блока (блок сброшен)
+        заканчивает его, как в скомпилированном блоке: такты оставшихся инструкций возвращаются."""
+        handlers = self.handlers
+        decode = self.decode
+        blocks = self.blocks
+        remaining = sum(instruction_ticks[instr["opcode"]] for _, instr in block)
+        tails = []  # такты инструкций после каждой инструкции блока
+        for _, instr in block:
+            remaining -= instruction_ticks[instr["opcode"]]
+            tails.append(remaining)
+        runs = 0
+        compiled = None
+
+        def cold():
+            nonlocal runs, compiled
+            if compiled is None:
+                runs += 1
+                if runs <= self.threshold:
+                    pc = start
+                    for tail in tails:
+                        pc = (handlers[pc] or decode(pc))()
+                        if start not in blocks:
+                            self.refund += tail
+                            break
+                    return pc
+                compiled = self.compile_block(start, block)
+                self.block_handlers[start] = compiled
+            return compiled()
+
+        return cold
+
+    def compile_block(self, start, block):
+        if self.namespace is None:
+            data_path = self.data_path
+            stack = data_path.stack
+            self.namespace = {
+                "unit": self,
+                "data_path": data_path,
+                "push": stack.push,
+                "pop": stack.pop,
+                "return_stack": data_path.return_stack,
+                "words": data_path.data_memory.words,
+                "kinds": data_path.data_memory.kinds,
+                "invalidate": self.invalidate,
+                "wrap": data_path.wrap,
+                **{f"read{port}": data_path.ports[port].read for port in (0, 1)},
+                **{f"write{port}": data_path.ports[port].write for port in (2, 3)},
+                **{f"alu_{opcode.name.lower()}": operation.function for opcode, operation in alu_operations.items()},
+            }
+        source = BlockCompiler(self.data_path, block).source(start)
+        exec(compile(source, f"<block {start}>", "exec"), self.namespace)
+        return self.namespace.pop(f"block_{start}")
+
+    def invalidate(self, addr):
+        first = super().invalidate(addr)
+        for address in range(first, min(addr + 1, len(self.handlers))):
+            self.block_handlers[address] = self.fetch_data
+            self.block_costs[address] = 0
+        kinds = self.data_path.data_memory.kinds
+        for start in [start for start, end in self.blocks.items() if start <= addr < end]:
+            del self.blocks[start]
+            self.block_handlers[start] = None
+            self.block_costs[start] = 0
+            while start > 0 and kinds[start - 1] == CELL_PADDING:
+                start -= 1
+                self.block_handlers[start] = None
+                self.block_costs[start] = 0
+        return first
+
+    def run(self, limit):
+        """Блоки исполняются, пока до limit остаётся больше самого дорогого блока, дальше -- как fused.
+        Такты за неисполненную часть блоков (refund) вычитаются на выходе: до этого цикл лишь раньше
+        отдаёт исполнение fused."""
+        guard = limit - max_block_cost
+        if self.fusion and not self.halted and self._tick < guard:
+            handlers = self.block_handlers
+            costs = self.block_costs
+            data_path = self.data_path
+            pc = data_path.program_counter
+            tick = self._tick
+            try:
+                while True:
+                    try:
+                        while tick < guard:
+                            tick += costs[pc]
+                            pc = handlers[pc]()
+                        break
+                    except TypeError:
+                        if handlers[pc] is not None:
+                            raise
+                        self.decode_block(pc)
+            except IndexError:
+                if pc < len(handlers):
+                    raise
+                raise Exception("Instruction fetch from data cell") from None
+            except StopIteration:
+                pc = data_path.program_counter
+            finally:
+                data_path.program_counter = pc
+                self._tick = tick - self.refund
+                self.refund = 0
+        super().run(limit)
+
+
+ENGINES = {
+    "mc": ControlUnit,
+    "predecoded": PredecodedControlUnit,
+    "fused": FusedControlUnit,
+    "jit": JitControlUnit,
+}
+
 
-def main(code, file_input, out):
-    if out:
-        sys.stdout = open(os.devnull, "w")
-        sys.stderr = open(os.devnull, "w")
-        logging.getLogger().setLevel(logging.CRITICAL + 1)
-    with open(code, "rb") as file:
-        text_code = file.read()
-    binary_code = bytearray(text_code)
-    code, code_len = bin_to_opcode(binary_code)
-    print(code)
-    print(code_len, code[code_len - 1:])
-    with open(file_input, encoding="utf-8") as file:
-        input_text = file.read()
-        input_tokens = list(input_text)
-
-    output, ticks = simulation(code, code_len, input_tokens, data_memory_size=3000, limit=200000000)
+def main(code, file_input, out, engine="mc", trace=None, cache=None, data_memory_size=3000, limit=200000000,
+         checkpoint_path=None, checkpoint_every=None, resume=None, port1=None, port3=None, stream_output=False,
+         profile=None, profile_source=None, memory_pages=None, memory_dump=None, word_bits=None, stack_size=1024,
+         return_stack_size=1024):
+    """out -- тихий режим (без трассировки), trace -- явный уровень трассировки или TraceSink,
+    data_memory_size -- число ячеек данных после образа программы; контрольные точки, memory_pages,
+    memory_dump, word_bits, stack_size и return_stack_size -- см. simulation.
+
+    Ввод (порт 0) читается из file_input потоком. port1, port3 -- источник порта 1 и приёмник порта 3
+    (см. ports.open_stream), stream_output -- порт 2 пишется в stdout по мере вывода, а не в конце.
+    profile -- префикс файлов профиля (profiler.Profiler.write); метки -- из файла символов рядом с code
+    (symbols.sidecar_path) или трансляцией исходника profile_source."""
+    if trace is None:
+        trace = TraceLevel.NONE if out else TraceLevel.FULL
+    image = ProgramImage.load(code)
+    if not isinstance(trace, TraceSink) and trace != TraceLevel.NONE:
+        cells = image.cells()
+        print(cells)
+        print(image.code_len, cells[image.code_len - 1:])
+
+    with contextlib.ExitStack() as streams:
+        def attach(spec, mode):
+            stream, owned = open_stream(spec, mode)
+            return streams.enter_context(stream) if owned else stream
+
+        ports = {}
+        if port1 is not None:
+            ports[1] = InputPort(stream=attach(port1, "r"))
+        if port3 is not None:
+            ports[3] = OutputPort(attach(port3, "w"))
+        if stream_output:
+            ports[2] = OutputPort(sys.stdout)
+        profiler = None
+        if profile is not None:
+            symbols = Symbols.load(sidecar_path(code)) if Path(sidecar_path(code)).exists() else None
+            profiler = Profiler(source_labels(profile_source) if profile_source is not None else None, symbols)
+        output, ticks = simulation(image, image.code_len, InputPort(stream=attach(file_input, "r")),
+                                   data_memory_size=data_memory_size, limit=limit, engine=engine, trace=trace,
+                                   cache=cache, checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every,
+                                   resume=resume, ports=ports, profiler=profiler, memory_pages=memory_pages,
+                                   memory_dump=memory_dump, word_bits=word_bits, stack_size=stack_size,
+                                   return_stack_size=return_stack_size)
+    if profiler is not None:
+        profiler.write(profile)
     print(output)
     print("ticks:", ticks)
 
 
-original_stdout = sys.stdout
-original_stderr = sys.stderr
 if __name__ == "__main__":
-    quiet = "--quiet" in sys.argv
-    if quiet:
-        sys.argv.remove("--quiet")
-        assert len(sys.argv) == 3, "Usage: machine.py <code_file> <input_file>"
-        _, code_file, input_file = sys.argv
-        main(code_file, input_file, True)
+    parser = argparse.ArgumentParser(description="Модель стекового процессора.")
+    parser.add_argument("code_file")
+    parser.add_argument("input_file")
+    parser.add_argument("--quiet", action="store_true", help="не выводить журнал исполнения (то же, что --trace none)")
+    parser.add_argument("--engine", choices=ENGINES, default="mc", help="способ исполнения инструкций")
+    parser.add_argument("--trace", choices=[level.name.lower() for level in TraceLevel],
+                        help="уровень трассировки (по умолчанию full, с --quiet -- none)")
+    parser.add_argument("--memory-size", type=int, default=3000, help="число ячеек памяти данных после программы")
+    parser.add_argument("--memory-pages", type=int, metavar="PAGE_SIZE",
+                        help="страничная память: ячеек в странице (степень двойки), память -- по затронутым страницам")
+    parser.add_argument("--memory-dump", help="записать изменённые страницы памяти после останова (JSON lines)")
+    parser.add_argument("--word-bits", type=int, choices=WORD_BITS,
+                        help="ширина слова: перенос и заворачивание в дополнительном коде (по умолчанию -- "
+                             "прежние 32-битные границы без заворачивания)")
+    parser.add_argument("--stack-size", type=int, default=1024, help="ёмкость стека данных")
+    parser.add_argument("--return-stack-size", type=int, default=1024, help="ёмкость стека возвратов")
+    parser.add_argument("--trace-file", help="записать двоичную трассировку в файл (смотреть через trace_dump.py)")
+    parser.add_argument("--limit", type=int, default=200000000, help="предел модельного времени в тактах")
+    port_options = parser.add_argument_group("порты (файл, - для stdin/stdout или tcp:HOST:PORT)")
+    port_options.add_argument("--port1", help="источник порта ввода 1")
+    port_options.add_argument("--port3", help="приёмник порта вывода 3")
+    port_options.add_argument("--stream-output", action="store_true", help="писать порт 2 в stdout по мере вывода")
+    profile_options = parser.add_argument_group("профилирование")
+    profile_options.add_argument("--profile", metavar="PREFIX",
+                                 help="записать профиль: PREFIX.txt (таблица) и PREFIX.folded (для flamegraph)")
+    profile_options.add_argument("--profile-source",
+                                 help="исходник программы -- метки для профиля (по умолчанию -- из CODE_FILE.sym)")
+    checkpoint_options = parser.add_argument_group("контрольные точки")
+    checkpoint_options.add_argument("--checkpoint", help="файл контрольной точки (пишется при превышении --limit)")
+    checkpoint_options.add_argument("--checkpoint-every", type=int, help="писать контрольную точку каждые N тактов")
+    checkpoint_options.add_argument("--resume", help="продолжить исполнение с контрольной точки")
+    cache_options = parser.add_argument_group("кэш (размеры в ячейках памяти, степени двойки)")
+    cache_options.add_argument("--cache", action="store_true", help="включить модель кэша")
+    cache_options.add_argument("--cache-size", type=int, default=64)
+    cache_options.add_argument("--cache-line", type=int, default=4)
+    cache_options.add_argument("--cache-ways", type=int, default=2, help="ассоциативность")
+    cache_options.add_argument("--cache-replacement", choices=["lru", "fifo"], default="lru")
+    cache_options.add_argument("--cache-write", choices=["back", "through"], default="back")
+    cache_options.add_argument("--cache-miss-ticks", type=int, default=10, help="штраф за промах")
+    cache_options.add_argument("--cache-write-ticks", type=int, default=10, help="штраф за запись строки в память")
+    args = parser.parse_args()
+    if args.trace_file:
+        trace = BinaryTraceSink(args.trace_file)
+    elif args.trace:
+        trace = TraceLevel[args.trace.upper()]
     else:
+        trace = TraceLevel.NONE if args.quiet else TraceLevel.FULL
+    if not isinstance(trace, TraceSink) and trace != TraceLevel.NONE:
         logging.getLogger().setLevel(logging.DEBUG)
-        assert len(sys.argv) == 3, "Usage: machine.py <code_file> <input_file>"
-        _, code_file, input_file = sys.argv
-        main(code_file, input_file, False)
+    cache = None
+    if args.cache:
+        cache = Cache(args.cache_size, args.cache_line, args.cache_ways, args.cache_replacement, args.cache_write,
+                      args.cache_miss_ticks, args.cache_write_ticks)
+    main(args.code_file, args.input_file, args.quiet, args.engine, trace, cache, args.memory_size, args.limit,
+         args.checkpoint, args.checkpoint_every, args.resume, args.port1, args.port3, args.stream_output,
+         args.profile, args.profile_source, args.memory_pages, args.memory_dump, args.word_bits, args.stack_size,
+         args.return_stack_size)
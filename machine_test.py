@@ -0,0 +1,237 @@
+import contextlib
+import io
+import os
+import tempfile
+
+import pytest
+import yaml
+
+import machine
+import translator
+from cache import Cache
+from isa import bin_to_opcode
+from stack import StackOverflowError
+from tracing import TraceLevel, TraceSink
+
+GOLDEN = ["hello_world", "hello_user_name0", "hello_user_name1", "cat", "sort", "carry_check", "prob"]
+
+
+class RecordingSink(TraceSink):
+    """Запоминает краткое состояние после каждой инструкции."""
+
+    level = TraceLevel.INSTRUCTION
+
+    def __init__(self):
+        self.states = []
+
+    def instruction(self, control_unit):
+        self.states.append(control_unit.brief())
+
+
+def translate(golden):
+    """Транслирует программу из golden-файла, возвращает (code, code_len)."""
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        source = os.path.join(tmpdirname, "in_code")
+        target = os.path.join(tmpdirname, "target.bin")
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(golden["in_code"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            translator.main(source, target)
+        with open(target, "rb") as file:
+            return bin_to_opcode(bytearray(file.read()))
+
+
+def run_engine(golden, engine, trace=None, cache=None, limit=200000000, **options):
+    """Исполняет программу из golden-файла заданным движком; options -- прочие параметры Datapath."""
+    code, code_len = translate(golden)
+    data_path = machine.Datapath(3000, list(golden["in_stdin"]), code, code_len, trace=trace, cache=cache,
+                                 **options)
+    control_unit = machine.ENGINES[engine](data_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            control_unit.run(limit)
+        except (EOFError, StopIteration):
+            pass
+    return data_path, control_unit
+
+
+def load_golden(name):
+    with open(os.path.join("golden", name + ".yml"), encoding="utf-8") as file:
+        return yaml.safe_load(file)
+
+
+def assert_same_state(fast_path, fast_unit, reference_path, reference_unit):
+    assert fast_unit.get_tick() == reference_unit.get_tick()
+    assert fast_unit.halted == reference_unit.halted
+    assert fast_path.output_buffer0 == reference_path.output_buffer0
+    assert fast_path.data_memory == reference_path.data_memory
+    assert fast_path.stack == reference_path.stack
+    assert fast_path.return_stack == reference_path.return_stack
+    assert (fast_path.a, fast_path.carry, fast_path.program_counter) == \
+           (reference_path.a, reference_path.carry, reference_path.program_counter)
+
+
+@pytest.mark.parametrize("engine", ["predecoded", "fused", "jit"])
+@pytest.mark.parametrize("name", GOLDEN)
+def test_fast_engines_match_microcode(name, engine):
+    golden = load_golden(name)
+    assert_same_state(*run_engine(golden, engine), *run_engine(golden, "mc"))
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+@pytest.mark.parametrize("name", ["sort", "carry_check"])
+def test_paged_memory_matches_dense(name, engine):
+    golden = load_golden(name)
+    paged_path, paged_unit = run_engine(golden, engine, memory_pages=16)
+    assert paged_path.data_memory.paged
+    assert_same_state(paged_path, paged_unit, *run_engine(golden, "mc"))
+
+
+WIDE_STORE = """0x0 VARIABLE x
+_start:
+    lit 0x7FFFFF dup * dup * dup *
+    lit x swap !
+    lit x @
+    halt"""
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+def test_unbounded_words_are_stored(engine):
+    # без ширины слова значения не ограничены: в память пишется число шире 64 бит
+    golden = {"in_code": WIDE_STORE, "in_stdin": ""}
+    data_path, control_unit = run_engine(golden, engine)
+    assert control_unit.halted
+    assert data_path.a > 2 ** 63
+    assert_same_state(data_path, control_unit, *run_engine(golden, "mc"))
+
+
+def test_fusion_keeps_tick_limit_boundary():
+    golden = load_golden("sort")
+    fused_unit = run_engine(golden, "fused")[1]
+    assert fused_unit.fused
+    for limit in range(1, 400, 7):
+        assert_same_state(*run_engine(golden, "fused", limit=limit), *run_engine(golden, "predecoded", limit=limit))
+
+
+def test_fusion_survives_store_into_code():
+    # memory_save: `in 0 lit 10 swap !` пишет в заполнитель инструкции `in`, затем `lit 10 @` читает его
+    with open(os.path.join("examples", "memory_save"), encoding="utf-8") as file:
+        golden = {"in_code": file.read(), "in_stdin": "A"}
+    fused_path, fused_unit = run_engine(golden, "fused")
+    assert fused_path.data_memory[10] == ord("A")
+    assert fused_path.a == ord("A")
+    assert_same_state(fused_path, fused_unit, *run_engine(golden, "mc"))
+
+
+# work вызывается 40 раз (блок компилируется), затем цикл spoil записывает нули поверх всех ячеек work
+SELF_MODIFYING = """_start:
+    lit 40
+again:
+    call work
+    lit 1 swap -
+    dup
+    if wipe
+    jump again
+work:
+    lit 3 lit 4 *
+    drop
+    ret
+wipe:
+    lit 11
+spoil:
+    lit 1 swap -
+    dup lit work +
+    lit 0
+    !
+    dup
+    if done
+    jump spoil
+done:
+    halt"""
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+def test_store_into_later_padding_stops_execution(engine):
+    # `lit 0 !` пишет в заполнитель `lit 6` (адрес 19) -- `lit 6` больше не переходит к halt
+    golden = {"in_code": "_start:\n    lit 19 lit 0 !\n    lit 5 lit 6\n    halt", "in_stdin": ""}
+    with pytest.raises(Exception, match="Instruction fetch from data cell"):
+        run_engine(golden, engine)
+
+
+@pytest.mark.parametrize("name", ["sort", "prob", "carry_check"])
+def test_jit_keeps_tick_limit_boundary(name, monkeypatch):
+    monkeypatch.setattr(machine.JitControlUnit, "threshold", 1)
+    golden = load_golden(name)
+    for limit in range(machine.max_block_cost, 2500, 41):
+        assert_same_state(*run_engine(golden, "jit", limit=limit), *run_engine(golden, "predecoded", limit=limit))
+
+
+@pytest.mark.parametrize("threshold", [1, machine.jit_threshold])
+def test_jit_invalidates_blocks_on_store_into_code(threshold, monkeypatch):
+    monkeypatch.setattr(machine.JitControlUnit, "threshold", threshold)
+    golden = {"in_code": SELF_MODIFYING, "in_stdin": ""}
+    jit_path, jit_unit = run_engine(golden, "jit")
+    assert jit_unit.halted
+    # блок work сброшен: оставшиеся блоки не захватывают перезаписанных ячеек
+    kinds = jit_path.data_memory.kinds
+    assert jit_unit.blocks
+    assert all(kinds[address] for start, end in jit_unit.blocks.items() for address in range(start, end))
+    assert_same_state(jit_path, jit_unit, *run_engine(golden, "mc"))
+
+
+@pytest.mark.parametrize("name", ["hello_user_name0", "sort"])
+def test_instruction_trace_matches_between_engines(name):
+    golden = load_golden(name)
+    reference, fast = RecordingSink(), RecordingSink()
+    run_engine(golden, "mc", reference)
+    run_engine(golden, "predecoded", fast)
+    assert fast.states == reference.states
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"size": 16, "line_size": 2, "associativity": 1, "write_policy": "through"},
+    {"size": 32, "line_size": 4, "associativity": 4, "replacement": "fifo"},
+])
+@pytest.mark.parametrize("name", ["hello_user_name0", "sort", "prob"])
+def test_cache_accounting_matches_between_engines(name, options):
+    golden = load_golden(name)
+    reference_cache, fast_cache = Cache(**options), Cache(**options)
+    reference_path, reference_unit = run_engine(golden, "mc", cache=reference_cache)
+    fast_path, fast_unit = run_engine(golden, "predecoded", cache=fast_cache)
+    _, plain_unit = run_engine(golden, "predecoded")
+
+    assert fast_cache.stats() == reference_cache.stats()
+    assert fast_unit.get_tick() == reference_unit.get_tick()
+    assert fast_path.output_buffer0 == reference_path.output_buffer0
+    assert reference_cache.misses > 0
+    assert reference_unit.get_tick() > plain_unit.get_tick()
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+def test_trace_none_formats_nothing(engine, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("trace output at level NONE")
+
+    golden = load_golden("hello_world")
+    code, code_len = translate(golden)
+    monkeypatch.setattr(machine.ControlUnit, "__str__", fail)
+    monkeypatch.setattr(machine.ControlUnit, "brief", fail)
+    monkeypatch.setattr("builtins.print", fail)
+    # останавливаемся до HALT: итоговое состояние печатается всегда
+    output, ticks = machine.simulation(code, code_len, list(golden["in_stdin"]), 3000, 600, engine, TraceLevel.NONE)
+    assert output == "Hello, world"
+
+
+DEEP_STACK = """_start:
+    lit 1
+    jump _start"""
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+def test_stack_size_is_configurable(engine):
+    code, code_len = translate({"in_code": DEEP_STACK, "in_stdin": ""})
+    with pytest.raises(StackOverflowError, match="capacity 1024"):
+        machine.simulation(code, code_len, [], 3000, 20000, engine)
+    _, ticks = machine.simulation(code, code_len, [], 3000, 20000, engine, stack_size=10000)
+    assert ticks >= 20000
@@ -0,0 +1,260 @@
+import json
+from array import array
+
+from isa import Opcode, opcode_to_binary
+
+# Вид ячейки образа
+CELL_DATA = 0  # число
+CELL_PADDING = 1  # заполнитель "0" после инструкции с аргументом (и между переменными)
+CELL_INSTRUCTION = 2
+
+UNDECODED = object()  # ячейка образа, которую ещё не выбирали (см. Memory.entry)
+PAGE_SIZE = 1024  # ячеек в странице страничной памяти по умолчанию
+
+
+class PagedArray:
+    """Массив фиксированной длины из страниц array(typecode): память -- по затронутым страницам.
+
+    Страница выделяется при первой записи ненулевого значения, чтение невыделенной страницы -- 0.
+    dirty -- номера страниц, изменённых после clear_dirty. typecode=None -- страницы-списки (любые целые).
+    """
+
+    def __init__(self, typecode, size, page_size=PAGE_SIZE):
+        if page_size <= 0 or page_size & (page_size - 1):
+            raise ValueError("Page size should be a power of two")
+        self.typecode = typecode
+        self.size = size
+        self.page_size = page_size
+        self.shift = page_size.bit_length() - 1
+        self.mask = page_size - 1
+        self.pages = {}
+        self.dirty = set()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, address):
+        page = self.pages.get(address >> self.shift)
+        if page is not None:
+            return page[address & self.mask]
+        if not 0 <= address < self.size:
+            raise IndexError("Memory address out of range")
+        return 0
+
+    def __setitem__(self, address, value):
+        number = address >> self.shift
+        page = self.pages.get(number)
+        if page is None:
+            if not 0 <= address < self.size:
+                raise IndexError("Memory address out of range")
+            if not value:
+                return
+            page = self.pages[number] = self.blank(number)
+        page[address & self.mask] = value
+        self.dirty.add(number)
+
+    def __eq__(self, other):
+        if self.typecode is None:
+            return len(self) == len(other) and self.tolist() == list(other)
+        return len(self) == len(other) and self.tobytes() == bytes(other)
+
+    def __bytes__(self):
+        return self.tobytes()
+
+    def blank(self, number):
+        """Нулевая страница (последняя -- до конца массива)."""
+        size = min(self.page_size, self.size - (number << self.shift))
+        return [0] * size if self.typecode is None else array(self.typecode, [0]) * size
+
+    def page(self, number):
+        page = self.pages.get(number)
+        return page if page is not None else self.blank(number)
+
+    def assign(self, start, values):
+        """Записать values подряд с адреса start, по страницам."""
+        position = 0
+        while position < len(values):
+            address = start + position
+            number, offset = address >> self.shift, address & self.mask
+            page = self.pages.get(number)
+            if page is None:
+                page = self.pages[number] = self.blank(number)
+            chunk = values[position:position + len(page) - offset]
+            page[offset:offset + len(chunk)] = list(chunk) if self.typecode is None else array(self.typecode, chunk)
+            self.dirty.add(number)
+            position += len(chunk)
+
+    def clear_dirty(self):
+        self.dirty.clear()
+
+    def tobytes(self):
+        return b"".join(self.page(number).tobytes() for number in range(-(-self.size >> self.shift)))
+
+    def tolist(self):
+        return [value for number in range(-(-self.size >> self.shift)) for value in self.page(number)]
+
+
+class Memory:
+    """Память модели: слова в типизированном массиве и таблица декодированных инструкций.
+
+    words -- значения ячеек: список (typecode=None, значения не ограничены -- прежняя модель слова без
+    заворачивания) или array(typecode) при заданной ширине слова; ячейка с инструкцией хранит её машинное слово
+    (опкод << 24 | аргумент), заполнитель -- 0. kinds -- вид каждой ячейки.
+    instructions -- таблица только для области образа программы: адрес -> (адрес инструкции, инструкция).
+    Заполнитель ссылается на следующую инструкцию, поэтому выборка -- одно обращение к таблице.
+    Ячейки данных в таблице -- None.
+
+    program -- список ячеек (как у isa.bin_to_opcode) или image.ProgramImage. Образ копируется срезами
+    без разбора ячеек, таблица instructions заполняется при первой выборке каждого адреса.
+
+    wrap -- приведение к слову модели (alu.WordModel.wrap) для слова уже образа: слова образа и аргументы lit
+    заворачиваются при загрузке, поэтому @ и lit кладут значения, которые помещаются в слово.
+
+    page_size -- страничная память: words и kinds -- PagedArray, память модели растёт с числом затронутых
+    страниц, а не с size. Изменённые после загрузки образа страницы (dirty_pages) -- всё, что нужно
+    контрольной точке и дампу памяти. Плотная память (page_size=None) -- одна страница на всю память.
+    """
+
+    def __init__(self, size, program=(), page_size=None, typecode=None, wrap=None):
+        if size < len(program):
+            raise ValueError("Memory size should hold the program")
+        self.size = size
+        self.paged = page_size is not None
+        if self.paged:
+            self.words = PagedArray(typecode, size, page_size)
+            self.kinds = PagedArray("B", size, page_size)
+            self.page_size = page_size
+        else:
+            self.words = [0] * size if typecode is None else array(typecode, [0]) * size
+            self.kinds = bytearray(size)
+            self.page_size = size
+        self.image = None
+        self.wrap = wrap
+        if not isinstance(program, (list, tuple)):
+            self.image = program
+            words = program.words
+            if wrap is not None:
+                words = [wrap(word) for word in words] if typecode is None else array(typecode, map(wrap, words))
+            self.load(0, words, program.kinds)
+            self.instructions = [UNDECODED] * len(program)
+            self.clear_dirty()
+            return
+        self.instructions = [None] * len(program)
+        for address, cell in enumerate(program):
+            if isinstance(cell, dict):
+                word = opcode_to_binary[cell["opcode"]] << 24 | cell.get("arg", 0)
+                self.words[address] = word if wrap is None else wrap(word)
+                self.kinds[address] = CELL_INSTRUCTION
+                self.instructions[address] = (address, self.bounded(cell))
+            elif cell == "0":
+                self.kinds[address] = CELL_PADDING
+            else:
+                self.words[address] = cell if wrap is None else wrap(cell)
+        for address in range(len(program) - 2, -1, -1):
+            if self.kinds[address] == CELL_PADDING:
+                self.instructions[address] = self.instructions[address + 1]
+        self.clear_dirty()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, address):
+        return self.words[address]
+
+    def __setitem__(self, address, value):
+        self.words[address] = value
+        if self.kinds[address]:
+            self.overwrite(address)
+
+    def __eq__(self, other):
+        if not isinstance(other, Memory):
+            return NotImplemented
+        return self.words == other.words and self.kinds == other.kinds
+
+    def entry(self, address):
+        """Элемент таблицы instructions для адреса образа: (адрес, инструкция) или None."""
+        entry = self.instructions[address]
+        if entry is UNDECODED:
+            # заполнитель ссылается на следующую ячейку не-заполнитель; перезаписанные ячейки уже None
+            target = address
+            while target < len(self.instructions) and self.kinds[target] == CELL_PADDING:
+                target += 1
+            if target < len(self.instructions) and self.kinds[target] == CELL_INSTRUCTION:
+                entry = (target, self.bounded(self.image.instruction(target)))
+            else:
+                entry = None
+            self.instructions[address] = entry
+        return entry
+
+    def bounded(self, instruction):
+        """Инструкция образа; у lit при заданном wrap -- аргумент, приведённый к слову."""
+        if self.wrap is None or instruction["opcode"] is not Opcode.LIT:
+            return instruction
+        return {**instruction, "arg": self.wrap(instruction["arg"])}
+
+    def fetch(self, address):
+        """Инструкция, исполняемая с адреса address (заполнители пропускаются): (адрес, инструкция)."""
+        entry = self.entry(address) if address < len(self.instructions) else None
+        if entry is None:
+            raise Exception("Instruction fetch from data cell")
+        return entry
+
+    def overwrite(self, address):
+        """Запись поверх кода: ячейка и предшествующие ей заполнители больше не исполняются.
+
+        Возвращает первый адрес, который перестал исполняться.
+        """
+        self.kinds[address] = CELL_DATA
+        if address >= len(self.instructions):
+            return address
+        self.instructions[address] = None
+        while address > 0 and self.kinds[address - 1] == CELL_PADDING and self.instructions[address - 1] is not None:
+            address -= 1
+            self.instructions[address] = None
+        return address
+
+    def clear_dirty(self):
+        if self.paged:
+            self.words.clear_dirty()
+            self.kinds.clear_dirty()
+
+    def dirty_pages(self):
+        """Номера страниц, изменённых после загрузки образа; у плотной памяти -- всегда [0]."""
+        if not self.paged:
+            return [0]
+        return sorted(self.words.dirty | self.kinds.dirty)
+
+    def page(self, number):
+        """(слова, виды) страницы: слова -- как words (список или array), виды -- байты."""
+        if not self.paged:
+            return self.words, bytes(self.kinds)
+        return self.words.page(number), bytes(self.kinds.page(number))
+
+    def load(self, start, words, kinds):
+        """Записать ячейки подряд с адреса start, без учёта таблицы инструкций (см. overwrite)."""
+        if self.paged:
+            self.words.assign(start, words)
+            self.kinds.assign(start, kinds)
+        else:
+            self.words[start:start + len(words)] = words
+            self.kinds[start:start + len(kinds)] = kinds
+
+    def dump(self, file):
+        """Изменённые страницы в файл, по строке JSON на страницу: {"start": адрес, "words": [...]}."""
+        for number in self.dirty_pages():
+            words, _ = self.page(number)
+            file.write(json.dumps({"start": number * self.page_size, "words": list(words)}) + "\n")
+
+    def cells(self, start, stop):
+        """Ячейки [start, stop) в прежнем виде: число, заполнитель "0" или словарь инструкции."""
+        stop = min(stop, self.size)
+        result = []
+        for address in range(start, stop):
+            kind = self.kinds[address]
+            if kind == CELL_DATA:
+                result.append(self.words[address])
+            elif kind == CELL_PADDING:
+                result.append("0")
+            else:
+                result.append(self.entry(address)[1])
+        return result
@@ -0,0 +1,92 @@
+import pytest
+
+from isa import Opcode
+from memory import CELL_DATA, CELL_INSTRUCTION, CELL_PADDING, Memory, PagedArray
+
+LIT = {"index": 0, "opcode": Opcode.LIT, "arg": 7}
+DUP = {"index": 4, "opcode": Opcode.DUP}
+HALT = {"index": 5, "opcode": Opcode.HALT}
+PROGRAM = [LIT, "0", "0", "0", DUP, HALT, 42, "0", "0", "0", 5]
+
+
+def test_padding_fetches_next_instruction():
+    memory = Memory(len(PROGRAM) + 10, PROGRAM)
+    assert memory.fetch(0) == (0, LIT)
+    assert memory.fetch(2) == (4, DUP)
+    assert memory.fetch(5) == (5, HALT)
+    assert memory[0] == 0x15 << 24 | 7
+    assert memory[1] == 0
+    assert memory[6] == 42
+    assert memory.cells(0, len(PROGRAM) + 1) == [*PROGRAM, 0]
+
+
+@pytest.mark.parametrize("address", [6, 8, len(PROGRAM) + 3])
+def test_data_cells_are_not_executed(address):
+    memory = Memory(len(PROGRAM) + 10, PROGRAM)
+    with pytest.raises(Exception, match="Instruction fetch from data cell"):
+        memory.fetch(address)
+
+
+def test_store_over_code_invalidates_preceding_padding():
+    memory = Memory(len(PROGRAM), PROGRAM)
+    memory[4] = 13
+    assert memory.kinds[4] == CELL_DATA
+    for address in (1, 2, 3, 4):
+        with pytest.raises(Exception, match="data cell"):
+            memory.fetch(address)
+    assert memory.fetch(0) == (0, LIT)
+    assert memory.cells(0, 6) == [LIT, "0", "0", "0", 13, HALT]
+
+
+def test_store_into_padding():
+    memory = Memory(len(PROGRAM), PROGRAM)
+    memory[2] = 1
+    assert list(memory.kinds[:5]) == [CELL_INSTRUCTION, CELL_PADDING, CELL_DATA, CELL_PADDING, CELL_INSTRUCTION]
+    assert memory.fetch(3) == (4, DUP)
+    with pytest.raises(Exception, match="data cell"):
+        memory.fetch(1)
+    memory[8] = 9
+    assert memory.cells(6, 11) == [42, "0", 9, "0", 5]
+
+
+def test_large_data_area():
+    memory = Memory(len(PROGRAM) + 1_000_000, PROGRAM)
+    memory[len(memory) - 1] = -1
+    assert memory[len(memory) - 1] == -1
+    assert len(memory.instructions) == len(PROGRAM)
+
+
+
+@pytest.mark.parametrize("typecode", [None, "q"])
+def test_paged_memory_matches_dense(typecode):
+    paged = Memory(len(PROGRAM) + 20, PROGRAM, page_size=4, typecode=typecode)
+    dense = Memory(len(PROGRAM) + 20, PROGRAM, typecode=typecode)
+    assert paged == dense
+    assert paged.dirty_pages() == []
+    for memory in (paged, dense):
+        memory[4] = 13
+        memory[2] = 1
+        memory[len(memory) - 1] = -1 if typecode else 2 ** 100
+    assert paged == dense
+    assert paged.cells(0, len(paged)) == dense.cells(0, len(dense))
+    with pytest.raises(Exception, match="data cell"):
+        paged.fetch(3)
+    assert paged.dirty_pages() == [0, 1, 7]
+
+
+def test_paged_memory_allocates_touched_pages():
+    memory = Memory(len(PROGRAM) + 10 ** 12, PROGRAM, page_size=1024)
+    memory[10 ** 11] = 5
+    memory[10 ** 11 + 1] = 0
+    memory[2 * 10 ** 11] = 0  # нулевая запись не выделяет страницу
+    assert memory[10 ** 11] == 5
+    assert memory[3 * 10 ** 11] == 0
+    assert sorted(memory.words.pages) == [0, 10 ** 11 // 1024]
+    assert memory.dirty_pages() == [10 ** 11 // 1024]
+    with pytest.raises(IndexError):
+        memory[len(memory)] = 1
+
+
+def test_paged_array_rejects_bad_page_size():
+    with pytest.raises(ValueError, match="power of two"):
+        PagedArray("q", 100, 12)
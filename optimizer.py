@@ -0,0 +1,224 @@
+"""Оконный (peephole) оптимизатор кода после translate_stage_2, до to_bytes.
+
+Заменяемые шаблоны:
+    swap swap, dup drop, lit 0 +  -- убираются;
+    lit a lit b <op>              -- lit (результат), если операнды и результат меньше 2^15 (иначе с 16-битным
+                                     словом lit и + - * / завернули бы значения иначе, чем свёртка);
+    jump на следующую инструкцию  -- убирается;
+    call X ret                    -- jump X (хвостовой вызов), ret убирается, если на него нет переходов.
+Шаблон не захватывает инструкции, на которые есть переходы или метки (кроме первой). Замены, которые
+меняют флаг переноса (lit 0 +, свёртка операций с переносом), делаются, только если в программе нет c.
+Удаление не должно менять наблюдаемое состояние:
+    swap swap, dup drop -- стек не меньше двух значений (их кладут инструкции того же линейного участка:
+                           иначе снятая пара могла бы дать ошибку пустого стека) и следующая инструкция
+                           переписывает регистр a (пара оставляет в a вершину стека);
+    lit 0 +              -- слагаемое -- результат =, <, >, c или lit меньше 2^15: оно помещается в слово
+                           любой ширины, поэтому + не заворачивает его (ни в прежней модели, ни с --word-bits).
+Замены повторяются, пока что-то меняется; затем адреса пересчитываются, и в аргументах переходов,
+ссылках на метки и переменные, таблицах меток и переменных подставляются новые.
+"""
+import bisect
+from collections import Counter
+
+from alu import alu_operations, binary_opcodes
+from isa import Opcode
+
+BRANCH_OPCODES = frozenset({Opcode.IF, Opcode.JUMP, Opcode.CALL})
+# (снимает, кладёт) -- действие инструкции на стек данных; у переходов и halt его нет
+STACK_EFFECTS = {
+    Opcode.LIT: (0, 1),
+    Opcode.FETCH: (1, 1),
+    Opcode.STORE: (2, 0),
+    Opcode.DUP: (1, 2),
+    Opcode.SWAP: (2, 2),
+    Opcode.DROP: (1, 0),
+    Opcode.CARRY: (0, 1),
+    Opcode.IN: (0, 1),
+    Opcode.OUT: (1, 0),
+    **{opcode: (operation.arity, 1) for opcode, operation in alu_operations.items()},
+}
+A_WRITERS = frozenset({Opcode.DUP, Opcode.SWAP, Opcode.FETCH, Opcode.IN, Opcode.RET})  # пишут регистр a
+SMALL_VALUES = frozenset({Opcode.EQUAL, Opcode.LESS, Opcode.GREATER, Opcode.CARRY})  # кладут 0 или 1
+SMALL_LIMIT = 1 << 15  # помещается в 16-битное слово
+HEADER_SIZE = 8  # заголовок образа: 4 байта нулей и адрес первой исполняемой инструкции
+
+
+def size(instruction):
+    return 4 if "arg" in instruction else 1
+
+
+def is_constant(instruction, opcode, translator):
+    """Инструкция opcode с числовым аргументом, а не адресом метки или переменной."""
+    return (instruction["opcode"] is opcode and instruction["address"] not in translator.label_operands
+            and instruction["address"] not in translator.variable_operands)
+
+
+def code_targets(instructions, translator):
+    """Адреса (первого прохода), на которые может прийти управление не по порядку."""
+    targets = set(translator.functions_map.values())
+    for instruction in instructions:
+        if instruction["opcode"] in BRANCH_OPCODES or instruction["address"] in translator.label_operands:
+            targets.add(instruction["arg"])
+    return targets
+
+
+def depth_at_least(preceding, current, targets, count):
+    """Перед current на стеке точно не меньше count значений: их кладут инструкции preceding того же
+    линейного участка (по ходу исполнения, без переходов между ними)."""
+    if current["address"] in targets:
+        return False
+    for instruction in reversed(preceding):
+        effect = STACK_EFFECTS.get(instruction["opcode"])
+        if effect is None:
+            return False
+        pops, pushes = effect
+        count = pops + max(0, count - pushes)
+        if count == 0:
+            return True
+        if instruction["address"] in targets:
+            return False
+    return False
+
+
+def small_value(instruction, translator):
+    """Инструкция кладёт значение, которое помещается в слово любой ширины."""
+    return instruction["opcode"] in SMALL_VALUES or (
+        is_constant(instruction, Opcode.LIT, translator) and instruction["arg"] < SMALL_LIMIT)
+
+
+def fold(first, second, operator, carry_free):
+    """Значение lit a lit b <op> или None, если свернуть нельзя."""
+    operation = alu_operations[operator]
+    if operation.carry and not carry_free:
+        return None
+    # с 16-битным словом lit заворачивает аргумент, а + - * / -- результат: свёртка совпадает с исполнением,
+    # только если и операнды, и результат помещаются в слово
+    if not (first < SMALL_LIMIT and second < SMALL_LIMIT):
+        return None
+    try:
+        value = operation.function(second, first)  # АЛУ берёт вершину стека первым операндом
+    except Exception:  # деление на ноль остаётся до исполнения
+        return None
+    return value if 0 <= value < SMALL_LIMIT else None
+
+
+class Peephole:
+    def __init__(self, translator):
+        self.translator = translator
+        self.stats = Counter()
+
+    def rewrite(self, instructions, targets, carry_free):
+        """Один проход по коду; возвращает новый список инструкций."""
+        translator = self.translator
+        addresses = [instruction["address"] for instruction in instructions]
+        result = []
+        position = 0
+        while position < len(instructions):
+            current = instructions[position]
+            following = instructions[position + 1:position + 3]
+            free = [instruction["address"] not in targets for instruction in following]
+            opcodes = [current["opcode"]] + [instruction["opcode"] for instruction in following]
+            pair = tuple(opcodes[:2]) if len(opcodes) > 1 and free[0] else None
+
+            if (pair in ((Opcode.SWAP, Opcode.SWAP), (Opcode.DUP, Opcode.DROP)) and len(opcodes) == 3
+                    and opcodes[2] in A_WRITERS and depth_at_least(result, current, targets, 2)):
+                self.stats[f"{pair[0]} {pair[1]}"] += 1
+                position += 2
+                continue
+            if (pair == (Opcode.LIT, Opcode.ADD) and carry_free and current["arg"] == 0
+                    and is_constant(current, Opcode.LIT, translator) and current["address"] not in targets
+                    and result and small_value(result[-1], translator)):
+                self.stats["lit 0 +"] += 1
+                position += 2
+                continue
+            if (pair == (Opcode.LIT, Opcode.LIT) and len(opcodes) == 3 and free[1] and opcodes[2] in binary_opcodes
+                    and is_constant(current, Opcode.LIT, translator)
+                    and is_constant(following[0], Opcode.LIT, translator)):
+                value = fold(current["arg"], following[0]["arg"], opcodes[2], carry_free)
+                if value is not None:
+                    self.stats["lit a lit b op"] += 1
+                    result.append({**current, "arg": value})
+                    position += 3
+                    continue
+            if current["opcode"] is Opcode.JUMP and position + 1 < len(instructions):
+                # куда придёт управление: первая оставшаяся инструкция не раньше адреса перехода
+                landing = bisect.bisect_left(addresses, current["arg"])
+                if landing == position + 1:
+                    self.stats["jump next"] += 1
+                    position += 1
+                    continue
+            if current["opcode"] is Opcode.CALL and len(opcodes) > 1 and opcodes[1] is Opcode.RET:
+                self.stats["call ret"] += 1
+                result.append({**current, "opcode": Opcode.JUMP})
+                position += 2 if free[0] else 1
+                continue
+            result.append(current)
+            position += 1
+        return result
+
+    def run(self, code):
+        translator = self.translator
+        instructions = [instruction for instruction in code if "opcode" in instruction]
+        cells = [cell for cell in code if "opcode" not in cell]
+        if not instructions:
+            return code
+        targets = code_targets(instructions, translator)
+        carry_free = all(instruction["opcode"] is not Opcode.CARRY for instruction in instructions)
+        while True:
+            rewritten = self.rewrite(instructions, targets, carry_free)
+            if rewritten == instructions:
+                break
+            instructions = rewritten
+        return self.relocate(code, instructions, cells)
+
+    def relocate(self, code, instructions, cells):
+        """Новые адреса -- байтовые смещения в образе (to_bytes пишет инструкции подряд после заголовка),
+        переменные -- сразу после кода."""
+        translator = self.translator
+        last = code[len(code) - len(cells) - 1]
+        old_end = last["address"] + size(last)
+        old_addresses = [instruction["address"] for instruction in instructions]
+        new_addresses = []
+        address = HEADER_SIZE
+        for instruction in instructions:
+            new_addresses.append(address)
+            address += size(instruction)
+        new_end = address
+
+        def code_address(old):
+            position = bisect.bisect_left(old_addresses, old)
+            return new_addresses[position] if position < len(new_addresses) else old - old_end + new_end
+
+        shift = cells[0]["address"] - (new_addresses[-1] + 1) if cells else 0  # place_variables: после кода
+        label_operands = set()
+        variable_operands = set()
+        relocated = []
+        for instruction, address in zip(instructions, new_addresses):
+            old = instruction["address"]
+            instruction = {**instruction, "address": address}
+            if instruction["opcode"] in BRANCH_OPCODES or old in translator.label_operands:
+                instruction["arg"] = code_address(instruction["arg"])
+                label_operands.add(address)
+            elif old in translator.variable_operands:
+                instruction["arg"] -= shift
+                variable_operands.add(address)
+            relocated.append(instruction)
+        relocated.extend({**cell, "address": cell["address"] - shift} for cell in cells)
+
+        translator.functions_map = {name: code_address(old) for name, old in translator.functions_map.items()}
+        translator.variables_map = {name: old - shift for name, old in translator.variables_map.items()}
+        translator.label_operands = label_operands
+        translator.variable_operands = variable_operands
+        translator.last_address = new_addresses[-1]
+        translator.code_end = new_end
+        translator.source_map = [(instruction["address"], instruction["term"].line + 1, instruction["term"].pos)
+                                 for instruction in relocated if "opcode" in instruction]
+        return relocated
+
+
+def optimize(code, translator):
+    """Оптимизация кода после translator.translate_stage_2: возвращает (код, Counter замен по шаблонам).
+
+    Таблицы меток и переменных транслятора обновляются под новые адреса."""
+    peephole = Peephole(translator)
+    return peephole.run(code), peephole.stats
@@ -0,0 +1,187 @@
+import contextlib
+import io
+import os
+import re
+
+import pytest
+
+import machine
+import translator
+from image import ProgramImage
+from isa import Opcode
+from machine_test import load_golden
+from optimizer import optimize
+from translation_cache import TranslationCache
+
+PATTERNS = """0x5 VARIABLE counter
+_start:
+    jump main
+print:
+    lit 48 +
+    out 2
+    call newline
+    ret
+newline:
+    lit 10
+    out 2
+    ret
+main:
+    lit 1
+    lit counter
+    swap swap
+    dup drop
+    @
+    dup =
+    lit 0 +
+    lit 2 lit 3 *
+    +
+    call print
+    jump next
+next:
+    lit 49 lit 9 %
+    +
+    dup
+    out 2
+    halt"""
+
+
+def optimized(text):
+    translator_ = translator.Translator()
+    code = translator_.translate_stage_2(translator_.translate_stage_1(text))
+    code, stats = optimize(code, translator_)
+    return code, stats, translator_
+
+
+def run(tmp_path, text, optimize_code, engine="mc", stdin="", word_bits=None):
+    source = tmp_path / "source"
+    source.write_text(text, encoding="utf-8")
+    target = str(tmp_path / f"target{int(optimize_code)}.bin")
+    with contextlib.redirect_stdout(io.StringIO()) as listing:
+        translator.main(str(source), target, optimize=optimize_code)
+    image = ProgramImage.load(target)
+    with contextlib.redirect_stdout(io.StringIO()) as report:
+        output, ticks = machine.simulation(image, image.code_len, list(stdin), 3000, 200000000, engine,
+                                           word_bits=word_bits)
+    # стек, порты и регистры после останова; такт, PC и адреса кода у оптимизированной программы другие
+    state = re.search(r"Stack: .*, b: [^,]*", report.getvalue()).group()
+    return output, ticks, listing.getvalue(), state
+
+
+@pytest.mark.parametrize("engine", ["mc", "fused"])
+def test_patterns_are_rewritten(tmp_path, engine):
+    output, ticks, _, state = run(tmp_path, PATTERNS, False, engine)
+    optimized_output, optimized_ticks, listing, optimized_state = run(tmp_path, PATTERNS, True, engine)
+    assert optimized_output == output
+    assert optimized_state == state
+    assert optimized_ticks < ticks
+    assert listing.rstrip().endswith("optimized: saved instr: 13 (call ret: 1, dup drop: 1, jump next: 2, "
+                                     "lit 0 +: 1, lit a lit b op: 2, swap swap: 1)")
+
+
+def test_targets_and_variables_are_relocated():
+    code, _, translator_ = optimized(PATTERNS)
+    by_address = {instruction["address"]: instruction for instruction in code}
+    # хвостовой вызов newline стал переходом на следующую инструкцию и исчез: print перетекает в newline
+    assert [by_address[address].get("opcode") for address in sorted(by_address)][:6] == [
+        Opcode.JUMP, Opcode.LIT, Opcode.ADD, Opcode.OUT, Opcode.LIT, Opcode.OUT]
+    for instruction in code:
+        if instruction.get("opcode") in (Opcode.JUMP, Opcode.CALL, Opcode.IF):
+            assert "opcode" in by_address[instruction["arg"]]
+    counter = translator_.variables_map["counter"]
+    assert by_address[counter] == {"address": counter, "arg": 5}
+    assert translator_.last_address + 1 == counter
+    assert by_address[translator_.functions_map["main"]]["arg"] == 1
+
+
+def test_labels_stop_rewrites():
+    text = """_start:
+    lit 1 lit 2
+    swap
+again:
+    swap
+    dup
+    if again
+    halt"""
+    code, stats, _ = optimized(text)
+    assert not stats
+    assert [instruction["opcode"] for instruction in code].count(Opcode.SWAP) == 2
+
+
+def test_carry_flag_blocks_rewrites_that_change_it():
+    text = """_start:
+    lit 5
+    lit 0 +
+    lit 6 lit 3 and
+    lit 6 lit 3 +
+    c
+    halt"""
+    _, stats, _ = optimized(text)
+    assert stats == {"lit a lit b op": 1}  # and флаг не меняет
+
+
+def test_rewrites_keep_observable_state():
+    text = """_start:
+    swap swap
+    dup
+    lit 1
+    dup drop
+    out 2
+    lit 0x7FFFFF lit 0x7FFFFF *
+    lit 0 +
+    halt"""
+    # у _start глубина стека неизвестна; после dup drop регистр a никто не переписывает;
+    # произведение может не помещаться в слово, и + 0 его завернёт
+    _, stats, _ = optimized(text)
+    assert not stats
+
+
+def test_small_values_and_known_depth_allow_rewrites():
+    text = """_start:
+    lit 7 lit 8
+    swap swap
+    swap
+    =
+    lit 0 +
+    lit 9
+    dup drop
+    dup
+    halt"""
+    _, stats, _ = optimized(text)
+    assert stats == {"swap swap": 1, "lit 0 +": 1, "dup drop": 1}
+
+
+@pytest.mark.parametrize("word_bits", [None, 16])
+def test_folding_keeps_output_with_narrow_words(tmp_path, word_bits):
+    # 200 * 200 не помещается в 16-битное слово: без свёртки произведение заворачивается
+    text = """_start:
+    lit 200 lit 200 *
+    lit 30000 +
+    out 2
+    lit 2 lit 3 *
+    out 2
+    halt"""
+    output, _, _, state = run(tmp_path, text, False, word_bits=word_bits)
+    optimized_output, _, listing, optimized_state = run(tmp_path, text, True, word_bits=word_bits)
+    assert optimized_output == output
+    assert optimized_state == state
+    assert listing.rstrip().endswith("(lit a lit b op: 1)")
+
+
+@pytest.mark.parametrize("name", ["sort", "prob", "hello_user_name0", "cat"])
+def test_golden_programs_keep_output(tmp_path, name):
+    golden = load_golden(name)
+    output, ticks, _, _ = run(tmp_path, golden["in_code"], False, "predecoded", golden["in_stdin"])
+    optimized_output, optimized_ticks, _, _ = run(tmp_path, golden["in_code"], True, "predecoded",
+                                                  golden["in_stdin"])
+    assert optimized_output == output
+    assert optimized_ticks <= ticks
+
+
+def test_cache_keeps_optimized_translations_apart(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache"))
+    source = os.path.join("examples", "sort")
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.main(source, str(tmp_path / "plain.bin"), cache)
+        translator.main(source, str(tmp_path / "optimized.bin"), cache, optimize=True)
+    assert cache.misses == 2
+    assert (tmp_path / "plain.bin").read_bytes() != (tmp_path / "optimized.bin").read_bytes()
@@ -0,0 +1,141 @@
+"""Порты ввода-вывода модели: 0 и 1 -- ввод, 2 и 3 -- вывод.
+
+Порт ввода берёт символы из списка или из текстового потока (файл, канал, stdin, сокет). Поток читается
+блоками: сколько уже пришло, но не больше CHUNK_SIZE байт (read1 двоичного буфера потока и потоковый
+декодер), поэтому ввод из канала или сокета доходит до программы сразу, не дожидаясь полного блока.
+Выборка символа -- O(1), память не зависит от длины ввода. Порт вывода копит символы в списке buffer
+или сразу пишет их в поток.
+
+В журнале порт выглядит как список: ввод -- ещё не прочитанные символы текущего блока, вывод -- buffer.
+"""
+import codecs
+import io
+import os
+import socket
+import sys
+
+CHUNK_SIZE = 1 << 16
+
+
+class InputPort:
+    def __init__(self, tokens=(), stream=None, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunk = list(tokens)
+        self.position = 0
+        self.raw = None  # двоичный буфер потока (read1), None -- поток читается как текст
+        self.decoder = None
+        self.offset = 0  # байт, прочитанных из двоичного буфера
+        if stream is None:
+            return
+        buffer = getattr(stream, "buffer", None)
+        if hasattr(buffer, "read1"):
+            self.raw = buffer
+            self.offset = buffer.tell() if buffer.seekable() else 0
+            # как у текстового режима: декодирование по кускам и перевод \r\n в \n
+            self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(stream.encoding)(), True)
+        # файл -- первый блок сразу (он виден в журнале с первой строки); из канала и сокета -- при первом
+        # чтении: программа может сначала писать, а собеседник -- ждать её вывода
+        if stream.seekable():
+            self.fill()
+
+    def fill(self):
+        """Следующий блок потока: то, что уже пришло, не больше chunk_size. False -- поток кончился."""
+        self.position = 0
+        if self.stream is None:
+            self.chunk = ""
+        elif self.raw is None:
+            self.chunk = self.stream.read(self.chunk_size)
+        else:
+            self.chunk = ""
+            while not self.chunk:
+                data = self.raw.read1(self.chunk_size)
+                self.offset += len(data)
+                self.chunk = self.decoder.decode(data, final=not data)
+                if not data:
+                    break
+        return bool(self.chunk)
+
+    def read(self):
+        """Следующий символ или None, если ввод кончился."""
+        if self.position >= len(self.chunk) and not self.fill():
+            return None
+        char = self.chunk[self.position]
+        self.position += 1
+        return char
+
+    def pending(self):
+        """Прочитанные из потока, но ещё не выбранные символы."""
+        return list(self.chunk[self.position:])
+
+    def state(self):
+        """Состояние для контрольной точки. Без потока -- оставшиеся символы; с потоком -- не выбранные
+        символы текущего блока и позиция в потоке (поток не дочитывается, но должен поддерживать seek)."""
+        if self.stream is None:
+            return self.pending()
+        if not self.stream.seekable():
+            raise ValueError("Cannot checkpoint input from a non-seekable stream")
+        if self.raw is None:
+            return {"pending": self.pending(), "position": self.stream.tell(), "decoder": None}
+        buffered, flag = self.decoder.getstate()
+        return {"pending": self.pending(), "position": self.offset, "decoder": [buffered.decode("latin-1"), flag]}
+
+    def restore(self, values):
+        """Ввод -- ровно values (список символов) или, для state() порта с потоком, продолжение того же
+        потока с сохранённой позиции."""
+        self.position = 0
+        if not isinstance(values, dict):
+            self.stream = None
+            self.chunk = list(values)
+            return
+        if self.stream is None:
+            raise ValueError("Checkpoint input port needs its stream to resume")
+        if self.raw is None:
+            self.stream.seek(values["position"])
+        else:
+            self.raw.seek(values["position"])
+            self.offset = values["position"]
+            buffered, flag = values["decoder"]
+            self.decoder.setstate((buffered.encode("latin-1"), flag))
+        self.chunk = list(values["pending"])
+
+    def __repr__(self):
+        return repr(self.pending())
+
+
+class OutputPort:
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.buffer = []
+        # без потока символы копятся в buffer, с потоком -- уходят в его буфер
+        self.write = self.buffer.append if stream is None else stream.write
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def state(self):
+        return list(self.buffer)
+
+    def restore(self, values):
+        self.buffer[:] = values
+
+    def __repr__(self):
+        return repr(self.buffer)
+
+
+def open_stream(spec, mode):
+    """Поток для порта по описанию: "-" -- stdin/stdout, "tcp:HOST:PORT" -- TCP-соединение, иначе путь к файлу.
+
+    mode -- "r" или "w". Возвращает (поток, нужно ли его закрыть).
+    """
+    spec = os.fspath(spec)
+    if spec == "-":
+        return (sys.stdin if mode == "r" else sys.stdout), False
+    if spec.startswith("tcp:"):
+        host, _, port = spec[len("tcp:"):].rpartition(":")
+        connection = socket.create_connection((host, int(port)))
+        stream = connection.makefile(mode, encoding="utf-8")
+        connection.close()  # файл держит свою ссылку на сокет
+        return stream, True
+    return open(spec, mode, encoding="utf-8"), True  # закрывает вызывающий
@@ -0,0 +1,160 @@
+import contextlib
+import io
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import checkpoint
+import machine
+import translator
+from image import ProgramImage
+from ports import InputPort, OutputPort
+
+# копирует порт 1 в порт 3 до конца ввода
+PORT_CAT = """_start:
+loop:
+    in 1
+    dup
+    if end
+    out 3
+    jump loop
+end:
+    halt"""
+
+
+def build(directory, source_text):
+    source = os.path.join(directory, "source")
+    target = os.path.join(directory, "target.bin")
+    with open(source, "w", encoding="utf-8") as file:
+        file.write(source_text)
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.main(source, target)
+    return target
+
+
+def run_main(*args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        machine.main(*args, **kwargs)
+    return stdout.getvalue()
+
+
+def test_input_port_reads_stream_in_chunks():
+    port = InputPort(stream=io.StringIO("hello, world"), chunk_size=5)
+    assert repr(port) == "['h', 'e', 'l', 'l', 'o']"
+    assert "".join(iter(port.read, None)) == "hello, world"
+    assert port.read() is None
+
+
+def test_ports_attached_to_files(tmp_path):
+    binary = build(tmp_path, PORT_CAT)
+    text = "".join(chr(32 + number % 90) for number in range(200_000))
+    (tmp_path / "port1.txt").write_text(text, encoding="utf-8")
+    (tmp_path / "stdin.txt").write_text("", encoding="utf-8")
+    run_main(binary, tmp_path / "stdin.txt", True, "predecoded",
+             port1=str(tmp_path / "port1.txt"), port3=str(tmp_path / "port3.txt"))
+    assert (tmp_path / "port3.txt").read_text(encoding="utf-8") == text
+
+
+def test_port_attached_to_socket(tmp_path):
+    binary = build(tmp_path, PORT_CAT)
+    (tmp_path / "stdin.txt").write_text("", encoding="utf-8")
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        received = []
+
+        def serve():
+            connection, _ = server.accept()
+            with connection:
+                connection.sendall(b"over tcp")
+                connection.shutdown(socket.SHUT_WR)
+                while data := connection.recv(4096):
+                    received.append(data)
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        address = f"tcp:127.0.0.1:{server.getsockname()[1]}"
+        run_main(binary, tmp_path / "stdin.txt", True, "fused", port1=address, port3=str(tmp_path / "port3.txt"))
+        thread.join()
+    assert (tmp_path / "port3.txt").read_text(encoding="utf-8") == "over tcp"
+
+
+def test_stream_output_matches_buffered_output(tmp_path):
+    with open(os.path.join("examples", "cat"), encoding="utf-8") as file:
+        binary = build(tmp_path, file.read())
+    (tmp_path / "stdin.txt").write_text("5Hello", encoding="utf-8")
+    buffered = run_main(binary, tmp_path / "stdin.txt", True, "mc")
+    streamed = run_main(binary, tmp_path / "stdin.txt", True, "mc", stream_output=True)
+    # вывод уходит в stdout до отчёта об останове, в самом отчёте порт 2 пуст
+    assert streamed == "Hello" + buffered.replace("Output: ['H', 'e', 'l', 'l', 'o']", "Output: []").replace(
+        "\nHello\n", "\n\n")
+
+
+def test_checkpoint_records_stream_position(tmp_path):
+    binary = build(tmp_path, PORT_CAT)
+    path = tmp_path / "state.ckpt"
+    image = ProgramImage.load(binary)
+    ports = {1: InputPort(stream=io.StringIO("checkpointed input"), chunk_size=4), 3: OutputPort()}
+    with contextlib.redirect_stdout(io.StringIO()):
+        machine.simulation(image, image.code_len, [], 3000, 60, "predecoded", checkpoint_path=path, ports=ports)
+    written = "".join(ports[3].buffer)
+    assert 0 < len(written) < len("checkpointed input")
+    # в точке -- позиция в потоке и остаток текущего блока, а не весь непрочитанный ввод
+    saved = checkpoint.read(path).state["buffers"]["1"]
+    assert len(saved["pending"]) <= 4
+    assert "checkpointed input"[:saved["position"]].endswith("".join(saved["pending"]))
+
+    ports = {1: InputPort(stream=io.StringIO("checkpointed input"), chunk_size=4), 3: OutputPort()}
+    with contextlib.redirect_stdout(io.StringIO()):
+        machine.simulation(image, image.code_len, [], 3000, 200000000, "mc", resume=path, ports=ports)
+    assert "".join(ports[3].buffer) == "checkpointed input"
+
+
+def test_checkpoint_rejects_non_seekable_input():
+    read_end, write_end = os.pipe()
+    os.close(write_end)
+    with open(read_end, encoding="utf-8") as stream:
+        with pytest.raises(ValueError, match="non-seekable"):
+            InputPort(stream=stream).state()
+
+
+def test_stream_decoding_resumes_inside_a_character():
+    text = "при\r\nвет, мир"
+    port = InputPort(stream=io.TextIOWrapper(io.BytesIO(text.encode("utf-8")), encoding="utf-8"), chunk_size=3)
+    assert port.read() == "п"
+    saved = port.state()  # блок из 3 байт кончился на середине "р"
+    assert saved["decoder"][0]
+
+    resumed = InputPort(stream=io.TextIOWrapper(io.BytesIO(text.encode("utf-8")), encoding="utf-8"), chunk_size=3)
+    resumed.restore(saved)
+    assert "".join(iter(resumed.read, None)) == "ри\nвет, мир"
+
+
+def test_pipe_input_reaches_program_before_eof(tmp_path):
+    binary = build(tmp_path, PORT_CAT)
+    image = ProgramImage.load(binary)
+    read_end, write_end = os.pipe()
+    output = OutputPort()
+    answered = threading.Event()
+
+    def talk():
+        with open(write_end, "w", encoding="utf-8") as writer:
+            writer.write("ping")
+            writer.flush()
+            # канал открыт: ответ должен прийти до конца ввода
+            deadline = time.monotonic() + 5
+            while "".join(output.buffer) != "ping" and time.monotonic() < deadline:
+                time.sleep(0.01)
+            if "".join(output.buffer) == "ping":
+                answered.set()
+            writer.write(" pong")
+
+    thread = threading.Thread(target=talk)
+    thread.start()
+    with open(read_end, encoding="utf-8") as stream, contextlib.redirect_stdout(io.StringIO()):
+        machine.simulation(image, image.code_len, [], 3000, 200000000, "predecoded",
+                           ports={1: InputPort(stream=stream), 3: output})
+    thread.join()
+    assert answered.is_set()
+    assert "".join(output.buffer) == "ping pong"
@@ -0,0 +1,151 @@
+"""Профилировщик программ модели: такты и инструкции по адресам, меткам и вызовам.
+
+Profiler -- приёмник трассировки уровня INSTRUCTION (tracing.TraceSink): после каждой инструкции
+разница модельного времени приписывается адресу исполненной инструкции. Счёт точный, без выборок;
+без профилировщика движки исполняются как обычно, с ним -- как с трассировкой уровня INSTRUCTION
+(fused -- без слияний).
+
+Свод по меткам: такты адреса идут метке, в которую он попадает (ближайшая метка не выше адреса, из
+functions_map транслятора). Вызовы отслеживаются по call/ret, как стек возвратов: у подпрограммы
+(метки -- цели call) -- число вызовов, полное время (от call до ret, с вложенными вызовами) и
+собственное время (пока она на вершине стека вызовов). Собственное время корня -- всё, что исполнено
+вне подпрограмм.
+"""
+import bisect
+from collections import defaultdict
+
+from isa import Opcode
+from tracing import TraceLevel, TraceSink
+from translator import Translator
+
+ROOT = -1  # адрес корневого кадра стека вызовов
+
+
+class Profiler(TraceSink):
+    level = TraceLevel.INSTRUCTION
+
+    def __init__(self, labels=None, symbols=None):
+        """labels -- {метка: адрес} (Translator.functions_map), по умолчанию -- из symbols;
+        symbols -- symbols.Symbols: у самых дорогих адресов показывается место в исходнике."""
+        if labels is None and symbols is not None:
+            labels = symbols.label_map()
+        self.symbols = symbols
+        self.labels = sorted((address, name) for name, address in (labels or {}).items())
+        self.label_addresses = [address for address, _ in self.labels]
+        self.ticks = defaultdict(int)  # адрес инструкции -> такты
+        self.counts = defaultdict(int)  # адрес инструкции -> исполнений
+        self.opcodes = {}  # адрес инструкции -> опкод
+        self.calls = defaultdict(int)  # адрес подпрограммы -> вызовов
+        self.inclusive = defaultdict(int)
+        self.exclusive = defaultdict(int)
+        self.stacks = defaultdict(int)  # (стек вызовов -- кортеж адресов, адрес инструкции) -> такты
+        self.frames = [(ROOT, 0)]  # (адрес подпрограммы, такт входа)
+        self.stack = (ROOT,)
+        self.active = defaultdict(int, {ROOT: 1})  # кадров подпрограммы в стеке (рекурсия)
+        self.last_tick = 0
+
+    def instruction(self, control_unit):
+        tick = control_unit.get_tick()
+        current = control_unit.current
+        delta = tick - self.last_tick
+        self.last_tick = tick
+        if current is None:
+            return
+        address = control_unit.current_address
+        self.ticks[address] += delta
+        self.counts[address] += 1
+        self.opcodes[address] = current["opcode"]
+        self.stacks[self.stack, address] += delta
+        self.exclusive[self.stack[-1]] += delta
+        if current["opcode"] is Opcode.CALL:
+            target = current["arg"]
+            self.calls[target] += 1
+            self.frames.append((target, tick))
+            self.stack = (*self.stack, target)
+            self.active[target] += 1
+        elif current["opcode"] is Opcode.RET and len(self.frames) > 1:
+            self.leave(tick)
+
+    def leave(self, tick):
+        target, start = self.frames.pop()
+        self.stack = self.stack[:-1]
+        self.active[target] -= 1
+        if not self.active[target]:  # у рекурсии полное время считается по внешнему кадру
+            self.inclusive[target] += tick - start
+
+    def close(self):
+        """Незавершённые кадры (останов внутри подпрограммы) закрываются на последнем такте."""
+        while len(self.frames) > 1:
+            self.leave(self.last_tick)
+        self.inclusive[ROOT] = self.last_tick - self.frames[0][1]
+
+    def label_of(self, address):
+        """Метка, в которую попадает адрес, или None."""
+        position = bisect.bisect_right(self.label_addresses, address) - 1
+        return self.labels[position][1] if position >= 0 else None
+
+    def name(self, address):
+        """Имя адреса: метка+смещение или сам адрес; корень -- <program>."""
+        if address == ROOT:
+            return "<program>"
+        label = self.label_of(address)
+        if label is None:
+            return str(address)
+        offset = address - self.label_addresses[bisect.bisect_right(self.label_addresses, address) - 1]
+        return f"{label}+{offset}" if offset else label
+
+    def by_label(self):
+        """{метка: (инструкций, тактов)}; адреса до первой метки -- под именем <unlabeled>."""
+        result = defaultdict(lambda: [0, 0])
+        for address, ticks in self.ticks.items():
+            row = result[self.label_of(address) or "<unlabeled>"]
+            row[0] += self.counts[address]
+            row[1] += ticks
+        return {label: tuple(row) for label, row in result.items()}
+
+    def table(self, top=20):
+        """Плоская таблица: метки по тактам, подпрограммы с вызовами и временем, самые дорогие адреса."""
+        total = sum(self.ticks.values()) or 1
+        lines = [f"{'label':<24}{'instructions':>14}{'ticks':>14}{'%':>8}"]
+        for label, (count, ticks) in sorted(self.by_label().items(), key=lambda item: -item[1][1]):
+            lines.append(f"{label:<24}{count:>14}{ticks:>14}{100 * ticks / total:>8.2f}")
+        lines += ["", f"{'routine':<24}{'calls':>10}{'inclusive':>14}{'exclusive':>14}{'%excl':>8}"]
+        for address in sorted(self.inclusive, key=lambda address: -self.inclusive[address]):
+            lines.append(f"{self.name(address):<24}{self.calls[address]:>10}{self.inclusive[address]:>14}"
+                         f"{self.exclusive[address]:>14}{100 * self.exclusive[address] / total:>8.2f}")
+        lines += ["", f"{'pc':>8}  {'where':<24}{'opcode':<10}{'count':>12}{'ticks':>14}  source"]
+        hottest = sorted(self.ticks, key=lambda address: -self.ticks[address])[:top]
+        for address in hottest:
+            source = self.symbols.source_at(address) if self.symbols is not None else None
+            lines.append(f"{address:>8}  {self.name(address):<24}{self.opcodes[address].name.lower():<10}"
+                         f"{self.counts[address]:>12}{self.ticks[address]:>14}"
+                         f"  {'' if source is None else f'{source[0]}:{source[1]}'}".rstrip())
+        return "\n".join(lines) + "\n"
+
+    def collapsed(self):
+        """Стеки в свёрнутом формате flamegraph.pl / speedscope: "корень;вызов;...;метка такты".
+
+        Последний кадр -- метка, в которую попадает инструкция (если это не сама подпрограмма на вершине)."""
+        folded = defaultdict(int)
+        for (stack, address), ticks in self.stacks.items():
+            frames = [self.name(routine) for routine in stack]
+            label = self.label_of(address)
+            if label is not None and label != frames[-1]:
+                frames.append(label)
+            folded[";".join(frames)] += ticks
+        return "".join(f"{frames} {ticks}\n" for frames, ticks in sorted(folded.items()) if ticks)
+
+    def write(self, prefix):
+        """prefix.txt -- таблица, prefix.folded -- свёрнутые стеки."""
+        with open(f"{prefix}.txt", "w", encoding="utf-8") as file:
+            file.write(self.table())
+        with open(f"{prefix}.folded", "w", encoding="utf-8") as file:
+            file.write(self.collapsed())
+
+
+def source_labels(path):
+    """Метки программы -- повторной трансляцией исходника."""
+    translator = Translator()
+    with open(path, encoding="utf-8") as file:
+        translator.translate(file)
+    return translator.functions_map
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import machine
+import translator
+from machine_test import load_golden, translate
+from profiler import Profiler, source_labels
+from tracing import TraceLevel
+
+SORT_LABELS = source_labels(os.path.join("examples", "sort"))
+
+
+def profile(golden, engine, labels=SORT_LABELS, trace=TraceLevel.NONE):
+    code, code_len = translate(golden)
+    profiler = Profiler(labels)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, ticks = machine.simulation(code, code_len, list(golden["in_stdin"]), 3000, 200000000, engine,
+                                      trace=trace, profiler=profiler)
+    return profiler, ticks
+
+
+@pytest.mark.parametrize("engine", ["mc", "predecoded", "fused"])
+def test_profile_accounts_for_every_tick(engine):
+    golden = load_golden("sort")
+    profiler, ticks = profile(golden, engine)
+    assert sum(profiler.ticks.values()) == ticks
+    assert sum(count for count, _ in profiler.by_label().values()) == sum(profiler.counts.values())
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in profiler.collapsed().splitlines()) == ticks
+    assert profiler.inclusive[-1] == ticks
+    assert sum(profiler.exclusive.values()) == ticks
+
+    reference, _ = profile(golden, "mc")
+    assert profiler.ticks == reference.ticks
+    assert profiler.calls == reference.calls
+
+
+def test_calls_and_nested_time():
+    profiler, _ = profile(load_golden("sort"), "predecoded")
+    calls = {profiler.name(address): count for address, count in profiler.calls.items()}
+    executed_calls = sum(count for address, count in profiler.counts.items() if profiler.opcodes[address].name == "CALL")
+    assert sum(calls.values()) == executed_calls
+    assert set(calls) == {"rep", "get_addr", "get_nums"}
+    for address in profiler.calls:
+        assert profiler.inclusive[address] >= profiler.exclusive[address] > 0
+    # get_addr вызывается и из get_nums: полное время get_nums включает его
+    assert "<program>;get_nums;get_addr" in profiler.collapsed()
+
+
+def test_profile_together_with_trace():
+    golden = load_golden("hello_user_name0")
+    traced, _ = profile(golden, "predecoded", labels=None, trace=TraceLevel.INSTRUCTION)
+    plain, _ = profile(golden, "predecoded", labels=None)
+    assert traced.ticks == plain.ticks
+    assert set(traced.by_label()) == {"<unlabeled>"}
+
+
+def test_main_writes_table_and_folded_stacks(tmp_path):
+    golden = load_golden("sort")
+    source = str(tmp_path / "sort.src")
+    (tmp_path / "sort.src").write_text(golden["in_code"], encoding="utf-8")
+    binary = str(tmp_path / "sort.bin")
+    (tmp_path / "input.txt").write_text(golden["in_stdin"], encoding="utf-8")
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.main(source, binary)
+        machine.main(binary, tmp_path / "input.txt", True, "fused", profile=str(tmp_path / "sort"),
+                     profile_source=source)
+    table = (tmp_path / "sort.txt").read_text(encoding="utf-8")
+    assert table.startswith("label")
+    assert "get_nums" in table
+    folded = (tmp_path / "sort.folded").read_text(encoding="utf-8")
+    assert folded == profile(golden, "mc", labels=source_labels(source))[0].collapsed()
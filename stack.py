@@ -0,0 +1,118 @@
+from array import array
+
+
+class StackOverflowError(Exception):
+    """Запись в заполненный стек."""
+
+
+class StackUnderflowError(Exception):
+    """Чтение из пустого стека."""
+
+
+class Stack:
+    """Стек фиксированной ёмкости с регистрами вершины.
+
+    Две верхние ячейки хранятся в регистрах first и second (как stack_first/stack_second
+    в схеме процессора), остальные -- в заранее выделенном массиве cells. Элемент с номером
+    i (снизу) лежит в cells[i], пока не поднимется в регистры. Каждая операция стоит O(1)
+    независимо от глубины: массив не копируется и не перевыделяется.
+    """
+
+    def __init__(self, capacity, name="stack", initial=(), typecode=None):
+        """typecode -- ячейки в array(typecode) фиксированной ширины, None -- в списке (любые целые)."""
+        assert capacity >= 2, "Stack capacity should be at least 2"
+        self.capacity = capacity
+        self.name = name
+        # Последние две ячейки массива никогда не заняты элементами из памяти (их не больше capacity - 2),
+        # поэтому обращения cells[-1] и cells[-2] на малой глубине обходятся без проверок.
+        self.cells = [0] * capacity if typecode is None else array(typecode, [0]) * capacity
+        self.depth = 0
+        self.first = 0  # Верхняя ячейка стека
+        self.second = 0  # Ячейка под вершиной
+        for value in initial:
+            self.push(value)
+
+    def push(self, value):
+        depth = self.depth
+        if depth == self.capacity:
+            raise StackOverflowError(f"{self.name} overflow (capacity {self.capacity})")
+        self.cells[depth - 2] = self.second
+        self.second = self.first
+        self.first = value
+        self.depth = depth + 1
+
+    def pop(self):
+        depth = self.depth
+        if depth == 0:
+            raise StackUnderflowError(f"{self.name} underflow")
+        value = self.first
+        self.first = self.second
+        self.second = self.cells[depth - 3]
+        self.depth = depth - 1
+        return value
+
+    def pop_pair(self):
+        """Снять два верхних элемента, вернуть (first, second)."""
+        depth = self.depth
+        if depth < 2:
+            raise StackUnderflowError(f"{self.name} underflow")
+        pair = self.first, self.second
+        cells = self.cells
+        self.first = cells[depth - 3]
+        self.second = cells[depth - 4]
+        self.depth = depth - 2
+        return pair
+
+    def reduce(self, operation):
+        """Заменить два верхних элемента на operation(first, second) -- как pop, pop, push, но за один шаг."""
+        depth = self.depth
+        if depth < 2:
+            raise StackUnderflowError(f"{self.name} underflow")
+        self.first = operation(self.first, self.second)
+        self.second = self.cells[depth - 3]
+        self.depth = depth - 1
+
+    def require(self, count):
+        """Проверить, что в стеке есть count элементов (перед чтением регистров first/second)."""
+        if self.depth < count:
+            raise StackUnderflowError(f"{self.name} underflow")
+
+    def peek(self):
+        """Значение на вершине без снятия."""
+        if self.depth == 0:
+            raise StackUnderflowError(f"{self.name} underflow")
+        return self.first
+
+    def drop(self, count=1):
+        self.require(count)
+        for _ in range(count):
+            self.pop()
+
+    def swap(self):
+        if self.depth < 2:
+            raise StackUnderflowError(f"{self.name} underflow")
+        self.first, self.second = self.second, self.first
+
+    def __len__(self):
+        return self.depth
+
+    def __iter__(self):
+        """Элементы снизу вверх."""
+        depth = self.depth
+        yield from self.cells[:max(depth - 2, 0)]
+        if depth >= 2:
+            yield self.second
+        if depth >= 1:
+            yield self.first
+
+    def __eq__(self, other):
+        if isinstance(other, Stack):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __str__(self):
+        return str(list(self))
+
+    __repr__ = __str__
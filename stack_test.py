@@ -0,0 +1,47 @@
+import pytest
+
+from stack import Stack, StackOverflowError, StackUnderflowError
+
+
+def test_push_pop_order():
+    stack = Stack(8)
+    for value in range(8):
+        stack.push(value)
+    assert list(stack) == list(range(8))
+    assert (stack.first, stack.second) == (7, 6)
+    assert [stack.pop() for _ in range(8)] == list(range(7, -1, -1))
+    assert len(stack) == 0
+
+
+def test_registers_and_str():
+    stack = Stack(4, initial=(0, 0))
+    stack.push(5)
+    stack.swap()
+    assert (stack.first, stack.second) == (0, 5)
+    stack.reduce(lambda first, second: first - second)
+    assert str(stack) == "[0, -5]"
+    assert stack.pop_pair() == (-5, 0)
+    assert str(stack) == "[]"
+
+
+def test_overflow():
+    stack = Stack(3, "Data stack")
+    for value in range(3):
+        stack.push(value)
+    with pytest.raises(StackOverflowError, match="Data stack overflow"):
+        stack.push(3)
+
+
+@pytest.mark.parametrize("operation", [
+    lambda stack: stack.pop(),
+    lambda stack: stack.peek(),
+    lambda stack: stack.swap(),
+    lambda stack: stack.pop_pair(),
+    lambda stack: stack.reduce(max),
+    lambda stack: stack.drop(2),
+])
+def test_underflow(operation):
+    stack = Stack(4, initial=(1,))
+    stack.pop()
+    with pytest.raises(StackUnderflowError):
+        operation(stack)
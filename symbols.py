@@ -0,0 +1,103 @@
+"""Файл символов транслятора (<target>.sym): адреса меток, переменных и исходных строк инструкций.
+
+Формат -- JSON по столбцам, отсортированным по адресу:
+    {"version": 1,
+     "labels": {"address": [...], "name": [...]},
+     "variables": {"address": [...], "size": [...], "name": [...]},   # size -- в адресах (байтах образа)
+     "source": {"address": [...], "line": [...], "word": [...]},      # строка с 1, номер слова в строке с 1
+     "code_end": N}                                                     # адрес после последней инструкции
+Поиск по адресу -- бинарный (bisect), без повторной трансляции.
+"""
+import bisect
+import json
+
+VERSION = 1
+
+
+def sidecar_path(binary):
+    return f"{binary}.sym"
+
+
+class Symbols:
+    def __init__(self, labels=(), variables=(), source=(), code_end=0):
+        """labels -- (адрес, имя), variables -- (адрес, размер, имя), source -- (адрес, строка, слово)."""
+        self.code_end = code_end
+        self.labels = sorted(labels)
+        self.variables = sorted(variables)
+        self.source = sorted(source)
+        self.label_addresses = [address for address, _ in self.labels]
+        self.variable_addresses = [address for address, _, _ in self.variables]
+        self.source_addresses = [address for address, _, _ in self.source]
+
+    @classmethod
+    def from_translator(cls, translator):
+        """Символы после Translator.translate."""
+        return cls(((address, name) for name, address in translator.functions_map.items()),
+                   ((address, translator.variable_sizes[name], name)
+                    for name, address in translator.variables_map.items()),
+                   translator.source_map, translator.code_end)
+
+    def write(self, path):
+        columns = {
+            "version": VERSION,
+            "labels": {"address": self.label_addresses, "name": [name for _, name in self.labels]},
+            "variables": {"address": self.variable_addresses,
+                          "size": [size for _, size, _ in self.variables],
+                          "name": [name for _, _, name in self.variables]},
+            "source": {"address": self.source_addresses,
+                       "line": [line for _, line, _ in self.source],
+                       "word": [word for _, _, word in self.source]},
+            "code_end": self.code_end,
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(columns, file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as file:
+            columns = json.load(file)
+        if columns.get("version") != VERSION:
+            raise ValueError(f"Unsupported symbol file version: {columns.get('version')}")
+        labels, variables, source = columns["labels"], columns["variables"], columns["source"]
+        return cls(zip(labels["address"], labels["name"]),
+                   zip(variables["address"], variables["size"], variables["name"]),
+                   zip(source["address"], source["line"], source["word"]), columns["code_end"])
+
+    def label_map(self):
+        """{метка: адрес}, как Translator.functions_map."""
+        return {name: address for address, name in self.labels}
+
+    def label_at(self, address):
+        """(метка, смещение) -- ближайшая метка не выше адреса, или None."""
+        position = bisect.bisect_right(self.label_addresses, address) - 1
+        if position < 0:
+            return None
+        return self.labels[position][1], address - self.label_addresses[position]
+
+    def variable_at(self, address):
+        """(переменная, смещение), если адрес внутри переменной, иначе None."""
+        position = bisect.bisect_right(self.variable_addresses, address) - 1
+        if position < 0:
+            return None
+        start, size, name = self.variables[position]
+        return (name, address - start) if address < start + size else None
+
+    def source_at(self, address):
+        """(строка, слово) инструкции, которой принадлежит адрес (с заполнителями), или None."""
+        position = bisect.bisect_right(self.source_addresses, address) - 1
+        if position < 0:
+            return None
+        start, line, word = self.source[position]
+        end = self.source_addresses[position + 1] if position + 1 < len(self.source) else self.code_end
+        return (line, word) if address < end else None
+
+    def describe(self, address):
+        """Адрес для человека: "метка+смещение (строка:слово)" или "переменная+смещение"."""
+        variable = self.variable_at(address)
+        if variable is not None:
+            name, offset = variable
+            return f"{name}+{offset}" if offset else name
+        label = self.label_at(address)
+        text = str(address) if label is None else (f"{label[0]}+{label[1]}" if label[1] else label[0])
+        source = self.source_at(address)
+        return text if source is None else f"{text} ({source[0]}:{source[1]})"
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import machine
+import trace_dump
+import translator
+from image import ProgramImage
+from symbols import Symbols, sidecar_path
+from tracing import BinaryTraceSink
+
+OPCODE_TO_WORD = {opcode: word for word, opcode in translator.WORD_TO_OPCODE.items()}
+
+
+def build(tmp_path, name):
+    target = str(tmp_path / f"{name}.bin")
+    with contextlib.redirect_stdout(io.StringIO()):
+        translated = translator.translate_file(os.path.join("examples", name), target)
+    return target, translated
+
+
+@pytest.mark.parametrize("name", ["sort", "hello_user_name", "prob1", "memory_save"])
+def test_sidecar_maps_addresses_to_source(tmp_path, name):
+    target, translated = build(tmp_path, name)
+    symbols = Symbols.load(sidecar_path(target))
+    assert symbols.label_map() == translated.functions_map
+    with open(os.path.join("examples", name), encoding="utf-8") as file:
+        lines = file.read().split("\n")
+
+    image = ProgramImage.load(target)
+    for address, cell in enumerate(image.cells()[:symbols.code_end]):
+        if not isinstance(cell, dict):
+            continue
+        line, word = symbols.source_at(address)
+        text = lines[line - 1].split()[word - 1]
+        # переход и условие -- по ключевому слову, инструкция с числом -- по самому числу
+        if "arg" not in cell or cell["opcode"].name in ("IF", "JUMP", "CALL"):
+            assert text == OPCODE_TO_WORD[cell["opcode"]]
+        # заполнители после инструкции с аргументом -- та же строка
+        if "arg" in cell:
+            assert symbols.source_at(address + 3) == (line, word)
+
+
+def test_variables_and_labels_are_resolved(tmp_path):
+    target, translated = build(tmp_path, "hello_user_name")
+    symbols = Symbols.load(sidecar_path(target))
+    what = translated.variables_map["what"]
+    assert symbols.variable_at(what) == ("what", 0)
+    assert symbols.describe(what + 8) == "what+8"
+    assert symbols.variable_at(symbols.code_end - 1) is None
+
+    start = translated.functions_map["_start"]
+    line, word = symbols.source_at(start)
+    assert symbols.describe(start) == f"_start ({line}:{word})"
+    assert symbols.label_at(start + 1) == ("_start", 1)
+    assert symbols.label_at(0) is None
+
+
+def test_profiler_and_trace_dump_use_sidecar(tmp_path):
+    target, _ = build(tmp_path, "cat")
+    (tmp_path / "input.txt").write_text("3abc", encoding="utf-8")
+    with contextlib.redirect_stdout(io.StringIO()):
+        machine.main(target, tmp_path / "input.txt", True, "predecoded", profile=str(tmp_path / "cat"))
+    table = (tmp_path / "cat.txt").read_text(encoding="utf-8")
+    assert "rep" in table
+    assert table.rstrip().split("\n")[-1].split()[-1].count(":") == 1  # место в исходнике у адреса
+
+    image = ProgramImage.load(target)
+    path = str(tmp_path / "trace.bin")
+    with BinaryTraceSink(path) as sink, contextlib.redirect_stdout(io.StringIO()):
+        machine.simulation(image, image.code_len, list("3abc"), 3000, 200000000, "predecoded", sink)
+    symbols = Symbols.load(sidecar_path(target))
+    plain = list(trace_dump.render(path, brief=True))
+    annotated = list(trace_dump.render(path, brief=True, symbols=symbols))
+    assert annotated[0] == plain[0]
+    assert annotated[1].startswith(plain[1] + " [_start")
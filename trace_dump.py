@@ -0,0 +1,192 @@
+import argparse
+import json
+import struct
+
+from isa import Opcode
+from symbols import Symbols
+from tracing import (
+    NO_OPCODE,
+    RECORD_INPUT,
+    RECORD_INSTRUCTION,
+    RECORD_WRITE,
+    TRACE_MAGIC,
+    TRACE_OPCODES,
+    TRACE_RECORD,
+    TRACE_VERSION,
+    VALUE_INT,
+    VALUE_PADDING,
+)
+
+
+class Cell:
+    """Ячейка, которую нельзя восстановить из записи (инструкция в памяти или на стеке)."""
+
+    def __init__(self, text="<cell>"):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    __repr__ = __str__
+
+
+def decode_value(kind, value):
+    if kind == VALUE_INT:
+        return value
+    if kind == VALUE_PADDING:
+        return "0"
+    return Cell()
+
+
+def decode_cell(cell):
+    if isinstance(cell, dict):
+        return Cell(cell["repr"])
+    return cell
+
+
+def output_char(value):
+    """Символ, который OUT кладёт в буфер вывода (как Datapath.send_char_to_output)."""
+    if value < 32 or value > 125:
+        return str(value)
+    return chr(value)
+
+
+def read_trace(file, chunk_records=4096):
+    """Заголовок и генератор записей. Файл читается кусками, память не зависит от длины трассы."""
+    if file.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+        raise ValueError("Not a binary trace file")
+    (header_size,) = struct.unpack("<I", file.read(4))
+    header = json.loads(file.read(header_size).decode("utf-8"))
+    if header["version"] != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace version: {header['version']}")
+
+    def records():
+        while True:
+            chunk = file.read(TRACE_RECORD.size * chunk_records)
+            if not chunk:
+                return
+            if len(chunk) % TRACE_RECORD.size:
+                raise ValueError("Truncated trace record")
+            yield from TRACE_RECORD.iter_unpack(chunk)
+
+    return header, records()
+
+
+def read_input(path):
+    """Весь ввод порта 0: символы из заголовка и из записей RECORD_INPUT (отдельный проход по файлу)."""
+    with open(path, "rb") as file:
+        header, records = read_trace(file)
+        chars = list(header["input"])
+        for tag, _, count, _, _, _, _, *codes in records:
+            if tag == RECORD_INPUT:
+                chars.extend(chr(code) for code in codes[:count])
+    return chars
+
+
+class TraceState:
+    """Буферы, стек возвратов и дамп памяти, восстановленные по записям трассы."""
+
+    def __init__(self, header, input_chars=None):
+        self.input = header["input"] if input_chars is None else input_chars
+        self.input_position = 0
+        self.output = []
+        self.return_stack = []
+        self.dump_start = header["dump_start"]
+        self.dump = [decode_cell(cell) for cell in header["dump"]]
+        self.previous_first = 0  # TOS до текущей инструкции -- значение для OUT
+
+    def write(self, address, value):
+        if 0 <= address - self.dump_start < len(self.dump):
+            self.dump[address - self.dump_start] = value
+
+    def execute(self, opcode, address, arg):
+        if opcode is Opcode.IN:
+            if arg == 0 and self.input_position < len(self.input):
+                self.input_position += 1
+        elif opcode is Opcode.OUT:
+            if arg == 2:
+                self.output.append(output_char(self.previous_first))
+        elif opcode is Opcode.CALL:
+            self.return_stack.append(address)
+        elif opcode is Opcode.RET:
+            self.return_stack.pop()
+
+
+def render(path, brief=False, ticks=None, addresses=None, writes=False, symbols=None):
+    """Строки трассы в текстовом формате ControlUnit.__str__ (или brief()).
+
+    symbols -- symbols.Symbols: к строке добавляется место исполненной инструкции (к записи -- имя ячейки).
+
+    ticks и addresses -- полуинтервалы (начало, конец), None -- без ограничения; addresses фильтрует
+    по адресу исполненной инструкции. Состояние восстанавливается с начала трассы даже для
+    отфильтрованных записей.
+    """
+    tick_start, tick_end = ticks or (0, None)
+    address_start, address_end = addresses or (0, None)
+    input_chars = None if brief else read_input(path)  # краткий формат ввод не показывает
+    with open(path, "rb") as file:
+        header, records = read_trace(file)
+        state = TraceState(header, input_chars)
+        for tag, opcode_number, kinds, pc, address, arg, tick, first, second, a in records:
+            if tick_end is not None and tick >= tick_end:
+                return
+            in_range = tick >= tick_start and address >= address_start and (address_end is None or address < address_end)
+            if tag == RECORD_WRITE:
+                value = decode_value(kinds & 3, first)
+                state.write(pc, value)
+                if writes and in_range:
+                    where = f" [{symbols.describe(pc)}]" if symbols is not None else ""
+                    yield f"Tick: {tick}, Store {value} to address {pc}{where}"
+                continue
+            if tag == RECORD_INPUT:
+                continue
+            if tag != RECORD_INSTRUCTION:
+                raise ValueError(f"Unknown trace record: {tag}")
+
+            first = decode_value(kinds & 3, first)
+            second = decode_value(kinds >> 2 & 3, second)
+            a = decode_value(kinds >> 4 & 3, a)
+            if opcode_number == NO_OPCODE:
+                # начальное состояние не относится ни к одному адресу
+                in_range = in_range and addresses is None
+            else:
+                state.execute(TRACE_OPCODES[opcode_number], address, arg)
+            state.previous_first = first
+
+            if not in_range:
+                continue
+            where = f" [{symbols.describe(address)}]" if symbols is not None and opcode_number != NO_OPCODE else ""
+            if brief:
+                yield f"Tick: {tick}, PC: {pc}, Stack: [{first}, {second}], a: {a}{where}"
+            else:
+                yield (f"Tick: {tick}, "
+                       f"PC: {pc}, "
+                       f"Stack: [{first}, {second}], "
+                       f"Input: {state.input[state.input_position:]}, "
+                       f"Output: {state.output}, "
+                       f"a: {a}, "
+                       f"b: {state.return_stack}, "
+                       f"dump: {state.dump}, {where}")
+
+
+def parse_range(text):
+    """'START:END' -> (START, END); любую границу можно опустить."""
+    start, _, end = text.partition(":")
+    return int(start) if start else 0, int(end) if end else None
+
+
+def main(path, brief=False, ticks=None, addresses=None, writes=False, symbols=None):
+    for line in render(path, brief, ticks, addresses, writes, Symbols.load(symbols) if symbols else None):
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Просмотр двоичной трассировки machine.py --trace-file.")
+    parser.add_argument("trace_file")
+    parser.add_argument("--brief", action="store_true", help="краткий формат (как --trace instruction)")
+    parser.add_argument("--ticks", type=parse_range, help="диапазон тактов START:END")
+    parser.add_argument("--addresses", type=parse_range, help="диапазон адресов инструкций START:END")
+    parser.add_argument("--writes", action="store_true", help="показывать записи в память")
+    parser.add_argument("--symbols", help="файл символов транслятора (PROGRAM.bin.sym): метки и строки исходника")
+    args = parser.parse_args()
+    main(args.trace_file, args.brief, args.ticks, args.addresses, args.writes, args.symbols)
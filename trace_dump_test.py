@@ -0,0 +1,61 @@
+import io
+import os
+import re
+
+import pytest
+
+import machine
+import trace_dump
+from machine_test import load_golden, translate
+from ports import InputPort
+from tracing import BinaryTraceSink
+
+
+def write_trace(golden, engine, path, input_tokens=None):
+    code, code_len = translate(golden)
+    if input_tokens is None:
+        input_tokens = list(golden["in_stdin"])
+    with BinaryTraceSink(path) as sink:
+        machine.simulation(code, code_len, input_tokens, 3000, 200000000, engine, sink)
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+@pytest.mark.parametrize("name", ["hello_user_name0", "cat", "sort", "carry_check"])
+def test_binary_trace_renders_golden_log(name, engine, tmp_path):
+    golden = load_golden(name)
+    path = os.path.join(tmp_path, "trace.bin")
+    write_trace(golden, engine, path)
+
+    expected = re.findall(r"^DEBUG +root:machine\.py:\d+ (.*)$", golden["out_log"], re.MULTILINE)
+    assert list(trace_dump.render(path)) == expected
+
+
+@pytest.mark.parametrize("engine", ["mc", "jit"])
+def test_stream_input_is_recorded_past_the_first_chunk(engine, tmp_path):
+    golden = load_golden("cat")
+    path = os.path.join(tmp_path, "trace.bin")
+    # блок меньше ввода: в заголовок попадает только первый, остальные -- записями ввода
+    write_trace(golden, engine, path, InputPort(stream=io.StringIO(golden["in_stdin"]), chunk_size=4))
+    assert len(golden["in_stdin"]) > 4
+    assert trace_dump.read_input(path) == list(golden["in_stdin"])
+
+    expected = re.findall(r"^DEBUG +root:machine\.py:\d+ (.*)$", golden["out_log"], re.MULTILINE)
+    assert list(trace_dump.render(path)) == expected
+
+
+def test_range_filters(tmp_path):
+    golden = load_golden("sort")
+    path = os.path.join(tmp_path, "trace.bin")
+    write_trace(golden, "predecoded", path)
+    everything = list(trace_dump.render(path, brief=True))
+
+    window = list(trace_dump.render(path, brief=True, ticks=(100, 200)))
+    ticks = [int(re.match(r"Tick: (\d+)", line).group(1)) for line in window]
+    assert window == everything[everything.index(window[0]):everything.index(window[-1]) + 1]
+    assert min(ticks) >= 100
+    assert max(ticks) < 200
+
+    writes = list(trace_dump.render(path, ticks=(0, 100), addresses=(0, 40), writes=True))
+    assert writes
+    assert all(line.startswith("Tick: ") for line in writes)
+    assert any("Store" in line for line in writes)
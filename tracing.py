@@ -0,0 +1,209 @@
+import enum
+import json
+import logging
+import struct
+import sys
+
+from isa import Opcode
+
+
+class TraceLevel(enum.IntEnum):
+    """Подробность трассировки. Каждый следующий уровень включает предыдущие."""
+
+    NONE = 0  # только результат
+    INSTRUCTION = 1  # краткое состояние после каждой инструкции
+    MICROSTEP = 2  # + строка на каждую микрокоманду и событие тракта данных
+    FULL = 3  # + полное состояние (буферы, стек возвратов, дамп памяти) вместо краткого
+
+
+class TraceSink:
+    """Приёмник трассировки. Базовый класс ничего не записывает (уровень NONE).
+
+    Сообщения передаются как шаблон и аргументы (как в logging), строка собирается только внутри приёмника,
+    поэтому на уровне NONE модель не форматирует ни одной строки.
+    """
+
+    level = TraceLevel.NONE
+
+    def microstep(self, message, *args):
+        """Микрокоманда или событие тракта данных."""
+
+    def instruction(self, control_unit):
+        """Состояние процессора после инструкции."""
+
+    def close(self):
+        """Дописать буферы. Вызывается один раз после останова модели."""
+
+
+class TextTraceSink(TraceSink):
+    """Текстовая трассировка: микрошаги в stdout, состояние после инструкции -- в logging.debug."""
+
+    def __init__(self, level, stream=None):
+        self.level = TraceLevel(level)
+        self.stream = stream  # None -- текущий sys.stdout (учитывает redirect_stdout)
+        # Каналы ниже выбранного уровня заменяются пустыми, чтобы не проверять уровень на каждом вызове
+        if self.level < TraceLevel.MICROSTEP:
+            self.microstep = super().microstep
+        if self.level < TraceLevel.INSTRUCTION:
+            self.instruction = super().instruction
+
+    def microstep(self, message, *args):
+        print(message % args if args else message, file=self.stream or sys.stdout)
+
+    def instruction(self, control_unit):
+        # stacklevel=2: в журнале указывается место вызова в модели, а не этот модуль
+        if self.level == TraceLevel.FULL:
+            logging.debug("%s", control_unit, stacklevel=2)
+        else:
+            logging.debug("%s", control_unit.brief(), stacklevel=2)
+
+
+class TeeSink(TraceSink):
+    """Несколько приёмников сразу (например, журнал и профилировщик). Уровень -- наибольший из них."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self.level = max(sink.level for sink in sinks)
+
+    def microstep(self, message, *args):
+        for sink in self.sinks:
+            sink.microstep(message, *args)
+
+    def instruction(self, control_unit):
+        for sink in self.sinks:
+            sink.instruction(control_unit)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def make_sink(level):
+    if TraceLevel(level) == TraceLevel.NONE:
+        return TraceSink()
+    return TextTraceSink(level)
+
+
+# --- Двоичная трассировка ---
+#
+# Файл: TRACE_MAGIC, длина заголовка (u32), заголовок в JSON, далее записи фиксированной длины TRACE_RECORD:
+#   tag      B  RECORD_INSTRUCTION, RECORD_WRITE или RECORD_INPUT
+#   opcode   B  номер в TRACE_OPCODES, NO_OPCODE для начального состояния
+#   kinds    B  вид значений value/nos/a по два бита (VALUE_INT, VALUE_PADDING, VALUE_OTHER);
+#               у RECORD_INPUT -- сколько кодов символов (1..3) в value/nos/a
+#   pc       I  PC после инструкции / адрес записи
+#   address  I  адрес исполненной инструкции
+#   arg      i  аргумент инструкции
+#   tick     Q  модельное время
+#   value    q  TOS после инструкции / записанное значение
+#   nos      q
+#   a        q
+# Буферы ввода-вывода, стек возвратов и дамп памяти в запись не входят -- trace_dump восстанавливает их
+# по опкодам из начального состояния в заголовке. Порт 0 читает поток блоками, поэтому в заголовке --
+# только то, что прочитано до начала, а каждый следующий блок пишется записями RECORD_INPUT перед
+# инструкцией, которая его прочитала; ввод целиком -- заголовок и все RECORD_INPUT по порядку.
+TRACE_MAGIC = b"CSATRACE"
+TRACE_VERSION = 2
+TRACE_RECORD = struct.Struct("<BBBxIIiQqqq")
+RECORD_INSTRUCTION = ord("I")
+RECORD_WRITE = ord("W")
+RECORD_INPUT = ord("R")
+TRACE_OPCODES = list(Opcode)
+NO_OPCODE = 255
+VALUE_INT, VALUE_PADDING, VALUE_OTHER = 0, 1, 2
+# Окно дампа памяти -- как в ControlUnit.__str__
+DUMP_BEFORE, DUMP_AFTER = 1, 50
+
+
+def encode_value(value):
+    """Значение ячейки -> (вид, целое). Заполнитель "0" и ячейки с инструкциями хранятся только видом."""
+    if isinstance(value, int):
+        return VALUE_INT, value
+    if value == "0":
+        return VALUE_PADDING, 0
+    return VALUE_OTHER, 0
+
+
+def encode_cell(cell):
+    """Ячейка начального дампа для заголовка (JSON)."""
+    if isinstance(cell, int) or cell == "0":
+        return cell
+    return {"repr": repr(cell)}
+
+
+class BinaryTraceSink(TraceSink):
+    """Компактная двоичная трассировка в файл (формат -- TRACE_RECORD), читается утилитой trace_dump.
+
+    Память не растёт с длиной прогона: записи сразу уходят в буферизованный файл.
+    Первый вызов instruction() пишет заголовок с начальным состоянием (simulation() делает его до первой
+    инструкции).
+    """
+
+    level = TraceLevel.INSTRUCTION
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.file = open(path, "wb", buffering=buffer_size)
+        self.write = self.file.write
+        self.started = False
+        self.opcode_numbers = {opcode: number for number, opcode in enumerate(TRACE_OPCODES)}
+        self.previous = (0, 0)  # (TOS, NOS) до текущей инструкции -- из них берутся адрес и значение записи
+        self.input_chunk = None  # блок порта 0, уже записанный в трассу
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_header(self, control_unit):
+        data_path = control_unit.data_path
+        start = data_path.code_len - DUMP_BEFORE
+        header = json.dumps({
+            "version": TRACE_VERSION,
+            "dump_start": start,
+            "dump": [encode_cell(cell) for cell in data_path.data_memory.cells(start, data_path.code_len + DUMP_AFTER)],
+            "input": data_path.input_buffer0.pending(),  # следующие блоки потока -- записями RECORD_INPUT
+        }).encode("utf-8")
+        self.write(TRACE_MAGIC + struct.pack("<I", len(header)) + header)
+        self.input_chunk = data_path.input_buffer0.chunk
+        self.started = True
+
+    def write_input(self, chunk, tick):
+        """Блок, который порт 0 прочитал из потока: по три кода символов в записи."""
+        codes = [ord(char) for char in chunk]
+        for start in range(0, len(codes), 3):
+            part = codes[start:start + 3]
+            self.write(TRACE_RECORD.pack(RECORD_INPUT, NO_OPCODE, len(part), 0, 0, 0, tick, *part, *[0] * (3 - len(part))))
+
+    def instruction(self, control_unit):
+        if not self.started:
+            self.write_header(control_unit)
+        data_path = control_unit.data_path
+        stack = data_path.stack
+        tick = control_unit.get_tick()
+        chunk = data_path.input_buffer0.chunk
+        if chunk is not self.input_chunk:
+            self.input_chunk = chunk
+            self.write_input(chunk, tick)
+        current = control_unit.current
+        if current is None:
+            opcode, arg, address = NO_OPCODE, 0, 0
+        else:
+            opcode = self.opcode_numbers[current["opcode"]]
+            arg = current.get("arg", 0)
+            address = control_unit.current_address
+            if current["opcode"] is Opcode.STORE:
+                value_kind, value = encode_value(self.previous[0])
+                self.write(TRACE_RECORD.pack(RECORD_WRITE, opcode, value_kind, self.previous[1], address, arg,
+                                             tick, value, 0, 0))
+        first, second = stack.first, stack.second
+        first_kind, first_value = encode_value(first)
+        second_kind, second_value = encode_value(second)
+        a_kind, a_value = encode_value(data_path.a)
+        self.write(TRACE_RECORD.pack(RECORD_INSTRUCTION, opcode, first_kind | second_kind << 2 | a_kind << 4,
+                                     data_path.program_counter, address, arg, tick, first_value, second_value, a_value))
+        self.previous = (first, second)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
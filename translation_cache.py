@@ -0,0 +1,128 @@
+"""Кэш трансляции на диске: результат translator.main по хэшу исходника и версии транслятора.
+
+Запись кэша -- каталог <sha256> с файлами:
+    target.bin, target.bin.hex, target.bin.base64, target.bin.sym -- выходные файлы транслятора;
+    variables.json -- таблица переменных (имя -> адрес);
+    stdout -- вывод транслятора (листинг), при попадании печатается заново.
+
+Версия транслятора -- хэш исходников translator.py, isa.py, symbols.py, optimizer.py и alu.py: правка транслятора
+сбрасывает кэш.
+Запись появляется атомарно (переименование каталога), поэтому кэш можно делить между процессами; если
+запись исчезла, пока из неё копировали (вытеснение в другом процессе), трансляция повторяется как промах.
+Размер кэша ограничен: после записи вытесняются записи, к которым дольше всего не обращались
+(время обращения -- mtime каталога записи).
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+
+DEFAULT_DIRECTORY = str(Path.home() / ".cache" / "csa-lab4" / "translations")
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+ARTIFACTS = ("target.bin", "target.bin.hex", "target.bin.base64", "target.bin.sym")
+
+
+def translator_version():
+    digest = hashlib.sha256()
+    for name in ("translator.py", "isa.py", "symbols.py", "optimizer.py", "alu.py"):
+        digest.update(Path(__file__).with_name(name).read_bytes())
+    return digest.hexdigest()
+
+
+class TranslationCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = translator_version()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source_bytes, variant=""):
+        """variant -- режим трансляции (например, "optimize"): у разных режимов разные записи."""
+        return hashlib.sha256(self.version.encode("ascii") + variant.encode("ascii") + source_bytes).hexdigest()
+
+    def lookup(self, key):
+        """Каталог записи или None. Попадание обновляет время обращения."""
+        entry = os.path.join(self.directory, key)
+        if not Path(entry).is_dir():
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(entry)
+        return entry
+
+    def store(self, key, source, translate_file):
+        """Транслировать source через translate_file(source, target) -> Translator в новую запись."""
+        entry = os.path.join(self.directory, key)
+        staging = f"{entry}.{os.getpid()}.tmp"
+        os.makedirs(staging, exist_ok=True)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                translator = translate_file(source, os.path.join(staging, "target.bin"))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        with open(os.path.join(staging, "stdout"), "w", encoding="utf-8") as file:
+            file.write(stdout.getvalue())
+        with open(os.path.join(staging, "variables.json"), "w", encoding="utf-8") as file:
+            json.dump(translator.variables_map, file)
+        try:
+            Path(staging).replace(entry)
+        except OSError:
+            # другой процесс успел первым -- его запись такая же
+            shutil.rmtree(staging)
+        self.evict(keep=entry)
+        return entry
+
+    def evict(self, keep=None):
+        """Удалять самые давние записи, пока кэш больше max_bytes (запись keep не трогается)."""
+        entries = []
+        total = 0
+        for entry in Path(self.directory).iterdir():
+            if not entry.is_dir() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                size = sum(file.stat().st_size for file in entry.iterdir())
+                entries.append((entry.stat().st_mtime, str(entry), size))
+            except OSError:
+                continue  # запись удаляет другой процесс
+            total += size
+        for _, entry, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry != keep:
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+    def translate(self, source, target, translate_file, variant=""):
+        """Как translate_file(source, target), но при попадании -- копирование файлов из кэша.
+
+        Возвращает таблицу переменных.
+        """
+        with open(source, "rb") as file:
+            key = self.key(file.read(), variant)
+        os.makedirs(os.path.dirname(os.path.abspath(target)) or ".", exist_ok=True)
+        entry = self.lookup(key)
+        if entry is not None:
+            try:
+                listing, variables = self.copy(entry, target)
+            except OSError:
+                entry = None  # запись удалил evict() другого процесса -- как промах
+            else:
+                self.hits += 1
+        if entry is None:
+            self.misses += 1
+            listing, variables = self.copy(self.store(key, source, translate_file), target)
+        print(listing, end="")
+        return variables
+
+    def copy(self, entry, target):
+        """Файлы записи -> target; возвращает (листинг, таблица переменных)."""
+        for artifact, suffix in zip(ARTIFACTS, ("", ".hex", ".base64", ".sym")):
+            shutil.copyfile(os.path.join(entry, artifact), target + suffix)
+        with open(os.path.join(entry, "stdout"), encoding="utf-8") as file:
+            listing = file.read()
+        with open(os.path.join(entry, "variables.json"), encoding="utf-8") as file:
+            return listing, json.load(file)
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import os
+import shutil
+
+import pytest
+
+import translator
+from translation_cache import TranslationCache
+
+
+def translate(cache, source, target):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        translator.main(source, target, cache)
+    outputs = []
+    for suffix in ("", ".hex", ".base64", ".sym"):
+        with open(target + suffix, "rb") as file:
+            outputs.append(file.read())
+    return stdout.getvalue(), outputs
+
+
+def test_warm_translation_matches_cold(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache"))
+    source = os.path.join("examples", "sort")
+    expected = translate(None, source, str(tmp_path / "plain.bin"))
+
+    assert translate(cache, source, str(tmp_path / "cold.bin")) == expected
+    assert translate(cache, source, str(tmp_path / "warm" / "out.bin")) == expected
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_hit_does_not_translate(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache"))
+    source = os.path.join("examples", "hello_world")
+    variables = cache.translate(source, str(tmp_path / "a.bin"), translator.translate_file)
+
+    def fail(source, target):
+        raise AssertionError("translated on a cache hit")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert cache.translate(source, str(tmp_path / "b.bin"), fail) == variables
+    assert variables == translator.translate_file(source, str(tmp_path / "c.bin")).variables_map
+
+
+def test_entry_evicted_during_copy_is_a_miss(tmp_path, monkeypatch):
+    cache = TranslationCache(str(tmp_path / "cache"))
+    source = os.path.join("examples", "sort")
+    expected = translate(cache, source, str(tmp_path / "a.bin"))
+    copyfile = shutil.copyfile
+    copied = []
+
+    def evicting_copyfile(source_path, target_path):
+        # другой процесс удаляет запись, когда первый файл уже скопирован
+        if len(copied) == 1:
+            shutil.rmtree(os.path.dirname(source_path))
+        copied.append(target_path)
+        return copyfile(source_path, target_path)
+
+    monkeypatch.setattr(shutil, "copyfile", evicting_copyfile)
+    assert translate(cache, source, str(tmp_path / "b.bin")) == expected
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_changed_source_misses(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache"))
+    source = str(tmp_path / "program")
+    shutil.copyfile(os.path.join("examples", "hello_world"), source)
+    translate(cache, source, str(tmp_path / "a.bin"))
+    with open(source, "a", encoding="utf-8") as file:
+        file.write("\n; comment\n")  # другой хэш при том же коде
+    translate(cache, source, str(tmp_path / "b.bin"))
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    directory = tmp_path / "cache"
+    cache = TranslationCache(str(directory), max_bytes=0)
+    names = ["hello_world", "cat", "sort"]
+    for name in names:
+        translate(cache, os.path.join("examples", name), str(tmp_path / f"{name}.bin"))
+    # предел 0: остаётся только последняя запись
+    assert len(list(directory.iterdir())) == 1
+
+    cache.max_bytes = 10 ** 9
+    for name in names:
+        translate(cache, os.path.join("examples", name), str(tmp_path / f"{name}.bin"))
+    entries = {entry.name: entry.stat().st_mtime for entry in directory.iterdir()}
+    oldest = min(entries, key=entries.get)
+    os.utime(directory / oldest, (0, 0))
+    cache.max_bytes = sum(sum(file.stat().st_size for file in entry.iterdir()) for entry in directory.iterdir()) - 1
+    cache.evict()
+    assert sorted(entry.name for entry in directory.iterdir()) == sorted(set(entries) - {oldest})
+
+
+def test_failed_translation_leaves_no_entry(tmp_path):
+    directory = tmp_path / "cache"
+    with pytest.raises(KeyError):
+        translate(TranslationCache(str(directory)), os.path.join("examples", "simple_sum"), str(tmp_path / "a.bin"))
+    assert list(directory.iterdir()) == []
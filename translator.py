@@ -1,9 +1,100 @@
+import argparse
 import base64
+import functools
 import os
 import re
-import sys
-
-from isa import Opcode, Term, to_bytes, to_hex
+from collections import namedtuple
+
+import optimizer
+from isa import Opcode, Term, append_cell, to_bytes, write_hex
+from symbols import Symbols, sidecar_path
+from translation_cache import DEFAULT_DIRECTORY, DEFAULT_MAX_BYTES, TranslationCache
+
+HEX_NUMBER = re.compile(r"^0[xX][0-9A-Fa-f]+$")
+DEC_NUMBER = re.compile(r"^[0-9]+$")
+
+# Аргумент, известный только после прохода: kind -- "label" (ссылка вперёд) или "variable"
+Reference = namedtuple("Reference", "name kind")
+
+INSTRUCTIONS = frozenset({
+    "drop", "dup", "swap", "+", "-", "*", "/", "%", "negate", "=", "<", ">", "and", "or", "xor", "invert",
+    "if", "!", "@", "in", "halt", "lit", "out", "jump", "call", "ret", "c",
+})
+MATH_INSTRUCTIONS = frozenset({"+", "-", "*", "/", "%", "negate", "and", "or", "xor", "invert", "=", ">", "<"})
+INSTR_WITHOUT_ARG = frozenset({
+    "@", "!", "ret", "+", "-", "*", "/", "%", "negate", "and", "or", "xor", "invert", "=", ">", "<",
+    "dup", "drop", "swap", "c", "halt",
+})
+SECOND_TYPE_INSTRUCTIONS = frozenset({"jump", "call", "if", "in", "out", "lit"})
+WORD_TO_OPCODE = {
+    "drop": Opcode.DROP,
+    "dup": Opcode.DUP,
+    "swap": Opcode.SWAP,
+    "+": Opcode.ADD,
+    "-": Opcode.SUB,
+    "*": Opcode.MUL,
+    "/": Opcode.DIV,
+    "%": Opcode.MOD,
+    "negate": Opcode.NEGATE,
+    "=": Opcode.EQUAL,
+    "<": Opcode.LESS,
+    ">": Opcode.GREATER,
+    "and": Opcode.AND,
+    "or": Opcode.OR,
+    "xor": Opcode.XOR,
+    "invert": Opcode.INVERT,
+    "if": Opcode.IF,
+    "!": Opcode.STORE,
+    "@": Opcode.FETCH,
+    "in": Opcode.IN,
+    "lit": Opcode.LIT,
+    "out": Opcode.OUT,
+    "jump": Opcode.JUMP,
+    "call": Opcode.CALL,
+    "ret": Opcode.RET,
+    "VARIABLE": Opcode.VARIABLE,
+    ":": Opcode.DEFINE_FUNC,
+    "halt": Opcode.HALT,
+    "c": Opcode.CARRY,
+}
+
+
+class Token(namedtuple("Token", "kind opcode arity size")):
+    """Класс слова исходника (classify).
+
+    kind -- вид терма: "label", "variable", "string", "hex", "dec", "if", "argument" (инструкция с аргументом),
+    "instruction" (без аргумента) или "name" (имя метки или переменной); opcode -- код операции;
+    arity -- сколько следующих термов забирает слово; size -- вклад в адрес первого прохода
+    (инструкция без аргумента -- 1, число, строка и имя -- 4, инструкция с аргументом -- 0: её место
+    считается по терму-аргументу).
+    """
+
+
+LABEL = Token("label", None, 0, 0)
+HEX = Token("hex", None, 0, 4)
+DEC = Token("dec", None, 0, 4)
+NAME = Token("name", None, 0, 4)
+KEYWORDS = {
+    **{word: Token("instruction", WORD_TO_OPCODE[word], 0, 1) for word in INSTR_WITHOUT_ARG},
+    **{word: Token("argument", WORD_TO_OPCODE[word], 1, 0) for word in SECOND_TYPE_INSTRUCTIONS},
+    "if": Token("if", Opcode.IF, 1, 0),
+    "VARIABLE": Token("variable", Opcode.VARIABLE, 1, 0),
+    'S"': Token("string", Opcode.STORE, 0, 4),
+}
+
+
+def classify(word):
+    """Один поиск по таблице на слово; шаблоны проверяются только для слов не из таблицы."""
+    token = KEYWORDS.get(word)
+    if token is not None:
+        return token
+    if ":" in word:
+        return LABEL
+    if HEX_NUMBER.fullmatch(word):
+        return HEX
+    if DEC_NUMBER.fullmatch(word):
+        return DEC
+    return NAME
 
 
 # комментарии разрешены только после #
@@ -20,295 +111,182 @@ class Translator:
         self.functions_map = {}
         self.variables_queue = {}
         self.addresses_in_conditions = {}
+        self.label_offsets = {}  # метка - адрес первого прохода (для ссылок вперёд)
+        self.label_delta = 0
+        self.last_address = None  # адрес последней инструкции кода
+        self.source_map = []  # (адрес инструкции в образе, строка с 1, номер слова) -- для файла символов
+        self.code_end = 0  # адрес после последней инструкции в образе
+        self.variable_sizes = {}  # имя - размер переменной в адресах
+        self.label_operands = set()  # адреса инструкций, чей аргумент -- адрес метки (для оптимизатора)
+        self.variable_operands = set()  # адреса инструкций, чей аргумент -- адрес переменной
 
     def instructions(self):
-        return {
-            "drop", "dup", "swap", "+", "-", "*", "/", "%", "negate", "=", "<", ">", "and", "or", "xor", "invert",
-            "if", "!", "@", "in", "halt", "lit", "out", "jump", "call", "ret", "c"
-        }
+        return INSTRUCTIONS
 
     def math_instructions(self):  # на этапе трансляции они будут развернуты в POP_AC + POP_DR + INSTR
-        return {
-            "+",
-            "-",
-            "*",
-            "/",
-            "%",
-            "negate",
-            "and",
-            "or",
-            "xor",
-            "invert",
-            "=",
-            ">",
-            "<",
-        }
+        return MATH_INSTRUCTIONS
 
     def instr_without_arg(self):  # без аргумента
-        return {
-            "@",
-            "!",
-            "ret",
-            "+",
-            "-",
-            "*",
-            "/",
-            "%",
-            "negate",
-            "and",
-            "or",
-            "xor",
-            "invert",
-            "=",
-            ">",
-            "<",
-            "dup",
-            "drop",
-            "swap",
-            "c",
-            "halt",
-        }
+        return INSTR_WITHOUT_ARG
 
     def second_type_instructions(self):  # с аргументом + LOAD_IMM + CALL
-        return {"jump", "call", "if", "in", "out", "lit"}
+        return SECOND_TYPE_INSTRUCTIONS
 
     def word_to_opcode(self, symbol):
         """Отображение операторов исходного кода в коды операций."""
-        return {
-            "drop": Opcode.DROP,
-            "dup": Opcode.DUP,
-            "swap": Opcode.SWAP,
-            "+": Opcode.ADD,
-            "-": Opcode.SUB,
-            "*": Opcode.MUL,
-            "/": Opcode.DIV,
-            "%": Opcode.MOD,
-            "negate": Opcode.NEGATE,
-            "=": Opcode.EQUAL,
-            "<": Opcode.LESS,
-            ">": Opcode.GREATER,
-            "and": Opcode.AND,
-            "or": Opcode.OR,
-            "xor": Opcode.XOR,
-            "invert": Opcode.INVERT,
-            "if": Opcode.IF,
-            "!": Opcode.STORE,
-            "@": Opcode.FETCH,
-            "in": Opcode.IN,
-            "lit": Opcode.LIT,
-            "out": Opcode.OUT,
-            "jump": Opcode.JUMP,
-            "call": Opcode.CALL,
-            "ret": Opcode.RET,
-            "VARIABLE": Opcode.VARIABLE,
-            ":": Opcode.DEFINE_FUNC,
-            "halt": Opcode.HALT,
-            "c": Opcode.CARRY,
-        }.get(symbol)
-
-    def text_to_terms(self, text):
-        """Трансляция текста в последовательность операторов языка (токенов).
+        return WORD_TO_OPCODE.get(symbol)
 
-        Включает в себя:
+    def iter_terms(self, lines):
+        """Генератор термов по строкам исходного текста (строки можно брать прямо из файла).
 
-        - отсеивание всего, что не: команда, имя переменной, имя лейбла, число;
-        - проверка формальной корректности программы (if - then; while - repeat)
+        После слова ; до конца строки -- комментарий.
         """
-
-        terms = []
-        for line_num, line in enumerate(text.split("\n")):
-            words = line.strip().split()
-            for pos, word in enumerate(words, 1):
+        for line_num, line in enumerate(lines):
+            for pos, word in enumerate(line.split(), 1):
                 if word == ";":
                     break  # если встретили ;, значит это комментарий, значит до конца строки все скипаем
 
                 # слово может быть: командой, числом, лейблом, названием переменной
                 # если это число, потом я его распаршу
-                terms.append(Term(line_num, pos, word))  # Добавляем токен
+                yield Term(line_num, pos, word)
 
-        # pos - адрес, потом переименую
-        return terms
-
-    def translate_stage_1(self, text):
-        """Первый этап трансляции.
-        Убираются все токены, которые не отображаются напрямую в команды,
-        создается условная таблица линковки для лейблов функций и названий переменных.
-        """
-        terms = self.text_to_terms(text)
+    def text_to_terms(self, text):
+        """Трансляция текста в последовательность операторов языка (токенов)."""
+        return list(self.iter_terms(text.split("\n")))
 
-        # Транслируем термы в машинный код.
-        code = []
-        brackets_stack = []
+    def scan_labels(self, terms):
+        """Классифицирует термы, попутно считая для меток «предварительные» адреса.
 
-        i = 0
+        Ссылка вперёд получает предварительный адрес метки (со сдвигом, при котором первая метка
+        стоит по адресу 8), ссылка назад -- адрес, присвоенный метке при разборе. Возвращает тройки
+        (предыдущий терм, терм, Token).
+        """
         address = 8
-        hex_number_pattern = r"^0[xX][0-9A-Fa-f]+$"
-        dec_number_pattern = r"^[0-9]+$"
-        # last_begin = []
-        while i < len(terms):
-            term = terms[i]
-            # print(term)
-            if ":" in term.word:
-                label = terms[i].word.split(":")[0]
-                self.functions_map[label] = address
-                address -= 4
-            elif self.word_to_opcode(term.word) == Opcode.VARIABLE:
-                address -= 4
-            elif term.word in self.instr_without_arg():
-                address -= 3
-            elif self.word_to_opcode(term.word):
-                i += 1
-                continue
-            i += 1
-            address += 4
-        i = 0
+        previous = None
+        for term in terms:
+            token = classify(term.word)
+            if token is LABEL:
+                self.label_offsets[term.word.split(":")[0]] = address
+            address += token.size
+            yield previous, term, token
+            previous = term
+
+    def stream_instructions(self, terms):
+        """Один проход по термам: генератор инструкций в порядке кода.
+
+        Аргумент, адрес которого станет известен только в конце (ссылка вперёд на метку или на переменную),
+        -- Reference; его разрешает resolve() после прохода. Последняя инструкция придерживается:
+        VARIABLE забирает её значение.
+        """
+        self.label_offsets = {}
+        stream = self.scan_labels(terms)
+        held = None  # терм, прочитанный после инструкции с аргументом, но не ставший её аргументом
+        pending = None
         address = 8
-        min_address = min(self.functions_map.values())
-        delta = min_address - 8
-
-        for key in self.functions_map:
-            self.functions_map[key] -= delta
-
-        # print(self.functions_map)
-        while i < len(terms):
-            term = terms[i]
-            # print(term, address)
+        while True:
+            item = held if held is not None else next(stream, None)
+            held = None
+            if item is None:
+                break
+            previous, term, token = item
+            kind = token.kind
+            instruction = None
             # если это 16 cc число - load_imm
-            if re.fullmatch(hex_number_pattern, term.word):
-
-                arg = int(term.word, 16)
-                assert -2 ** 63 <= arg <= 2 ** 63 - 1, "Argument is not in range!"
-                code.append(
-                    {
-                        "address": address,
-                        "opcode": self.word_to_opcode(terms[i - 1].word),
-                        "arg": arg,
-                        "term": term,
-                    }
-                )
+            if kind == "hex":
+                instruction = self.number_instruction(address, previous, term, int(term.word, 16))
             # или 10 сс
-            elif re.fullmatch(dec_number_pattern, term.word):
-                arg = int(term.word)
-                assert -2 ** 63 <= arg <= 2 ** 63 - 1, "Argument is not in range!"
+            elif kind == "dec":
                 address -= 4
-                code.append(
-                    {
-                        "address": address,
-                        "opcode": self.word_to_opcode(terms[i - 1].word),
-                        "arg": arg,
-                        "term": term,
-                    }
-
-                )
-
-
-            elif term.word == 'S"':
-                i += 1
-                string = ""
-                while not terms[i].word.endswith('"'):
-                    string += terms[i].word
-                    string += " "
-                    i += 1
-                string += terms[i].word[:-1]
-
-                code.append(
-                    {
-                        "address": address,
-                        "opcode": Opcode.STORE,
-                        "arg": chr(len(string)) + string,
-                        "term": term,
-                    }
-                )
-
-
-            # если встретили определение слова
-            elif self.word_to_opcode(term.word) == Opcode.VARIABLE:
-                # после обработки всех термов, мы добавим его в конец
-                value = code[-1]["arg"]  # берем отсюда, так как тут число уже прошло конвертацию
-                label = terms[i + 1].word
-                self.variables_queue[label] = value
-                i += 1  # перепрыгиваем через лейбл, тк мы его обработали
-                code.pop()
+                instruction = self.number_instruction(address, previous, term, int(term.word))
+
+            elif kind == "string":
+                words = []
+                _, part, _ = next(stream)
+                while not part.word.endswith('"'):
+                    words.append(part.word)
+                    _, part, _ = next(stream)
+                words.append(part.word[:-1])
+                string = " ".join(words)
+                instruction = {"address": address, "opcode": Opcode.STORE, "arg": chr(len(string)) + string,
+                               "term": term}
+
+            # определение переменной: значение -- аргумент предыдущей инструкции, сама она убирается
+            elif kind == "variable":
+                if pending is None:
+                    raise ValueError(f"VARIABLE without a value at line {term.line}")
+                _, name, _ = next(stream)
+                self.variables_queue[name.word] = pending["arg"]
+                pending = None
                 address -= 8
 
-            # если встретили определение функции
-            elif ":" in term.word:
-                label = terms[i].word.split(":")[0]
-                self.functions_map[label] = address
-                # address -= 4
-                i += 1
+            elif kind == "label":
+                self.functions_map[term.word.split(":")[0]] = address
                 continue
 
-            # обработка if, чтобы вставить им потом в аругменты адреса переходов
-            elif self.word_to_opcode(term.word) == Opcode.IF:
-                brackets_stack.append({"address": address, "opcode": Opcode.IF})
-                code.append({"address": address, "opcode": Opcode.IF, "arg": self.functions_map[terms[i + 1].word],
-                             "term": term})
-                i += 1
+            elif kind == "if":
+                _, target, _ = next(stream)
+                instruction = {"address": address, "opcode": Opcode.IF, "arg": self.label_arg(target.word),
+                               "term": term}
+                self.label_operands.add(address)
 
             # если встретили переменную или вызов функции
-            elif term.word in self.second_type_instructions():
-                # print("каким должно быть", term.word, address)
-                arg = terms[i + 1].word
+            elif kind == "argument":
+                item = next(stream)
+                arg, arg_kind = item[1].word, item[2].kind
                 if arg in self.variables_queue:
-                    code.append(
-                        {
-                            "address": address,
-                            "opcode": self.word_to_opcode(term.word),
-                            "arg": arg,
-                            "term": term,
-                        }
-                    )
-                    i += 1
-                elif arg in self.functions_map:
-                    # print(arg)
-                    code.append(
-                        {
-                            "address": address,
-                            "opcode": self.word_to_opcode(term.word),
-                            "arg": self.functions_map[arg],
-                            "term": term,
-                        }
-                    )
-                    i += 1
-                elif arg in self.second_type_instructions():
-                    # print("каким ", term.word, address)
-                    code.append(
-                        {
-                            "address": address,
-                            "opcode": self.word_to_opcode(term.word),
-                            "arg": terms[i + 1].word,
-                            "term": term,
-                        }
-                    )
-                    i += 1
-                # else:
-                #    assert arg in self.variables_map or arg in self.functions_map, f"Label f'{arg}'is not defined!"
+                    arg = Reference(arg, "variable")
+                elif arg in self.functions_map or arg_kind == "name":
+                    arg = self.label_arg(arg)
+                    self.label_operands.add(address)
+                elif arg_kind in ("argument", "if"):
+                    arg = Reference(arg, "variable")
+                else:
+                    held = item  # число: станет инструкцией с опкодом этого терма
+                if held is None:
+                    instruction = {"address": address, "opcode": token.opcode, "arg": arg, "term": term}
             else:
-                # print(self.word_to_opcode(term.word), address)
-                code.append({"address": address, "opcode": self.word_to_opcode(term.word), "term": term})
+                instruction = {"address": address, "opcode": token.opcode, "term": term}
                 address -= 3
 
-            # if term.word in self.instr_without_arg():
-            #    address -= 3
-
-            i += 1
+            if instruction is not None:
+                if pending is not None:
+                    self.last_address = pending["address"]
+                    yield pending
+                pending = instruction
             address += 4
-            # print(address)
-        return code
-
-    def translate_stage_2(self, code):
 
-        """
-        Вместо лейблов подставляются адреса,
-        в if подставляются адреса переходов,
-        переменные сохраняются после halt.
-        """
-        # сначала сохраним переменные в конце кода, чтобы потом подставлять их адреса
-        curr_address = code[-1]["address"] + 1
+        if pending is not None:
+            self.last_address = pending["address"]
+            yield pending
+        delta = min(self.label_offsets.values()) - 8 if self.label_offsets else 0
+        self.label_delta = delta
+        for label, offset in self.label_offsets.items():
+            self.functions_map.setdefault(label, offset - delta)
+
+    def number_instruction(self, address, previous, term, arg):
+        assert -2 ** 63 <= arg <= 2 ** 63 - 1, "Argument is not in range!"
+        opcode = self.word_to_opcode(previous.word) if previous is not None else None
+        return {"address": address, "opcode": opcode, "arg": arg, "term": term}
+
+    def label_arg(self, label):
+        """Адрес метки, если она уже встречалась, иначе ссылка вперёд."""
+        if label in self.functions_map:
+            return self.functions_map[label]
+        return Reference(label, "label")
+
+    def resolve(self, reference):
+        """Адрес для ссылки из stream_instructions (после конца прохода и place_variables)."""
+        if reference.kind == "variable":
+            return self.variables_map[reference.name]
+        return self.label_offsets[reference.name] - self.label_delta
+
+    def place_variables(self, last_address):
+        """Переменные размещаются после последней инструкции; возвращает их записи в порядке объявления."""
+        cells = []
+        curr_address = last_address + 1
         for label, value in self.variables_queue.items():
             self.variables_map[label] = curr_address
-            code.append({"address": curr_address, "arg": value})
+            cells.append({"address": curr_address, "arg": value})
             if isinstance(value, int):
                 if -2 ** 31 <= value <= 2 ** 31 - 1:
                     size = 4
@@ -316,7 +294,32 @@ class Translator:
                     size = 8
             elif isinstance(value, str):
                 size = len(value) * 4
+            self.variable_sizes[label] = size
             curr_address += size
+        return cells
+
+    def translate_stage_1(self, text):
+        """Первый этап трансляции.
+        Убираются все токены, которые не отображаются напрямую в команды,
+        создается условная таблица линковки для лейблов функций и названий переменных.
+        Ссылки на переменные остаются именами до translate_stage_2.
+        """
+        code = list(self.stream_instructions(self.iter_terms(text.split("\n"))))
+        for instruction in code:
+            arg = instruction.get("arg")
+            if isinstance(arg, Reference):
+                instruction["arg"] = arg.name if arg.kind == "variable" else self.resolve(arg)
+        return code
+
+    def translate_stage_2(self, code):
+
+        """
+        Вместо лейблов подставляются адреса,
+        в if подставляются адреса переходов,
+        переменные сохраняются после halt.
+        """
+        # сначала сохраним переменные в конце кода, чтобы потом подставлять их адреса
+        code.extend(self.place_variables(code[-1]["address"]))
 
         for instruction in code:
             if "arg" in instruction:
@@ -326,31 +329,86 @@ class Translator:
                 elif isinstance(arg, str) and "opcode" in instruction:
 
                     instruction["arg"] = self.variables_map[arg]
+                    self.variable_operands.add(instruction["address"])
                     # если переменной с таким именем нет, транслятор выдаст ошибку еще на первом этапе
 
         return code
 
-    def get_first_executable_instr(self):
-        return self.functions_map["_start"]
+    def translate(self, lines):
+        """Потоковая трансляция строк исходника сразу в бинарный образ.
 
+        Инструкции пишутся в буфер по мере разбора; аргументы-ссылки (вперёд на метку и на переменные)
+        дописываются по таблице исправлений в конце. Кроме буфера хранятся только таблицы меток,
+        переменных и исправлений.
+        """
+        binary_code = bytearray(8)
+        fixups = []  # (смещение аргумента в буфере, Reference)
+        self.last_address = None
+        self.source_map = []
+        for instruction in self.stream_instructions(self.iter_terms(lines)):
+            arg = instruction.get("arg")
+            if isinstance(arg, Reference):
+                fixups.append((len(binary_code) + 1, arg))
+                instruction["arg"] = 0
+            self.source_map.append((len(binary_code), instruction["term"].line + 1, instruction["term"].pos))
+            append_cell(binary_code, instruction)
+        self.code_end = len(binary_code)
+        for cell in self.place_variables(self.last_address):
+            append_cell(binary_code, cell)
+        for offset, reference in fixups:
+            arg = self.resolve(reference)
+            binary_code[offset:offset + 3] = bytes(((arg >> 16) & 0xFF, (arg >> 8) & 0xFF, arg & 0xFF))
+        binary_code[4:8] = self.get_first_executable_instr().to_bytes(4, byteorder="big")
+        return bytes(binary_code)
+
+    def listing(self, lines):
+        """Записи кода с окончательными аргументами, как их выдаёт translate_stage_2, -- повторным проходом
+        по тем же строкам после translate (без хранения всего кода)."""
+        replay = Translator()
+        for instruction in replay.stream_instructions(replay.iter_terms(lines)):
+            arg = instruction.get("arg")
+            if isinstance(arg, Reference):
+                instruction["arg"] = self.resolve(arg)
+            yield instruction
+        yield from replay.place_variables(replay.last_address)
 
-def main(source, target):
-    """Функция запуска транслятора. Параметры -- исходный и целевой файлы."""
-    translator = Translator()
-    with open(source, encoding="utf-8") as f:
-        source = f.read()
+    def get_first_executable_instr(self):
+        return self.functions_map["_start"]
 
-    code = translator.translate_stage_1(source)
 
-    code = translator.translate_stage_2(code)
-    for instr in code:
-        print(instr)
-    first_ex_instr = translator.get_first_executable_instr()
-    # print("first_ex_instr", first_ex_instr)
-    binary_code = to_bytes(code, first_ex_instr)
-    # print(binary_code)
-    hex_code = to_hex(code, translator.variables_map)
+def translate_file(source, target, optimize=False):
+    """Трансляция файла source в target (+ .hex, .base64, .sym) с печатью листинга. Возвращает Translator.
 
+    Исходник читается построчно дважды: трансляция в образ и печать листинга. С optimize -- по этапам
+    (translate_stage_1, translate_stage_2, optimizer.optimize, to_bytes) и с печатью сэкономленного.
+    """
+    translator = Translator()
+    words = 1  # len(text.split(" ")) без чтения всего текста
+
+    def counting_spaces(lines):
+        nonlocal words
+        for line in lines:
+            words += line.count(" ")
+            yield line
+
+    count = 0
+    if optimize:
+        with open(source, encoding="utf-8") as f:
+            text = "".join(counting_spaces(f))
+        code = translator.translate_stage_2(translator.translate_stage_1(text))
+        before = sum("opcode" in instr for instr in code)
+        code, stats = optimizer.optimize(code, translator)
+        binary_code = to_bytes(code, translator.get_first_executable_instr())
+        for instr in code:
+            print(instr)
+            count += 1
+    else:
+        with open(source, encoding="utf-8") as f:
+            binary_code = translator.translate(f)
+        with open(source, encoding="utf-8") as f:
+            for instr in translator.listing(counting_spaces(f)):
+                print(instr)
+                count += 1
     # Убедимся, что каталог назначения существует
     os.makedirs(os.path.dirname(os.path.abspath(target)) or ".", exist_ok=True)
 
@@ -358,14 +416,39 @@ def main(source, target):
     with open(target, "wb") as f:
         f.write(binary_code)
     with open(target + ".hex", "w") as f:
-        f.write(hex_code)
+        write_hex(f, binary_code, translator.variables_map)
     with open(target + ".base64", "w") as f:
         f.write(base64.b64encode(binary_code).decode("utf-8"))
+    Symbols.from_translator(translator).write(sidecar_path(target))
+
+    print("source LoC:", words, "code instr:", count)
+    if optimize:
+        saved = before - sum("opcode" in instr for instr in code)
+        rewrites = ", ".join(f"{pattern}: {number}" for pattern, number in sorted(stats.items()))
+        print("optimized: saved instr:", saved, f"({rewrites})" if rewrites else "")
+    return translator
+
 
-    print("source LoC:", len(source.split(" ")), "code instr:", len(code))
+def main(source, target, cache=None, optimize=False):
+    """Функция запуска транслятора. Параметры -- исходный и целевой файлы,
+    cache -- translation_cache.TranslationCache или None (без кэша), optimize -- оконная оптимизация."""
+    if cache is None:
+        translate_file(source, target, optimize)
+    else:
+        cache.translate(source, target, functools.partial(translate_file, optimize=optimize),
+                        variant="optimize" if optimize else "")
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) == 3, "Wrong arguments: translator.py <input_file> <target_file>"
-    _, source, target = sys.argv
-    main(source, target)
+    parser = argparse.ArgumentParser(description="Транслятор в машинный код стекового процессора.")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--no-cache", action="store_true", help="транслировать заново, не используя кэш")
+    parser.add_argument("--cache-dir", default=DEFAULT_DIRECTORY, help="каталог кэша трансляции")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+                        help="предел размера кэша, МиБ")
+    parser.add_argument("--optimize", action="store_true",
+                        help="оконная оптимизация кода (swap swap, lit 0 +, хвостовые вызовы и т.п.)")
+    args = parser.parse_args()
+    main(args.source, args.target,
+         None if args.no_cache else TranslationCache(args.cache_dir, args.cache_size * 2 ** 20), args.optimize)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from isa import to_bytes
+from translator import Translator, classify
+
+EXAMPLES = ["arifm", "cat", "hello_user_name", "hello_world", "memory_save", "prob1", "sort", "test", "test_sort"]
+
+
+def translate_in_stages(text):
+    translator = Translator()
+    code = translator.translate_stage_2(translator.translate_stage_1(text))
+    return to_bytes(code, translator.get_first_executable_instr()), code, translator.variables_map
+
+
+@pytest.mark.parametrize("name", EXAMPLES)
+def test_streaming_translation_matches_stages(name):
+    with open(os.path.join("examples", name), encoding="utf-8") as file:
+        text = file.read()
+    binary, code, variables_map = translate_in_stages(text)
+
+    translator = Translator()
+    with open(os.path.join("examples", name), encoding="utf-8") as file:
+        assert translator.translate(file) == binary
+    assert translator.variables_map == variables_map
+    assert list(translator.listing(text.split("\n"))) == code
+
+
+def test_forward_and_backward_references():
+    text = """0x5 VARIABLE counter
+_start:
+    lit counter @
+    call forward
+back:
+    if back
+    jump forward
+    halt
+forward:
+    ret"""
+    binary, code, _ = translate_in_stages(text)
+    assert Translator().translate(iter(text.split("\n"))) == binary
+    args = [instruction.get("arg") for instruction in code]
+    # переменная -- сразу после последней инструкции (ret по адресу 26), ссылка вперёд на forward
+    # дописывается после прохода
+    assert args == [27, None, 26, 17, 26, None, None, 5]
+
+
+@pytest.mark.parametrize(("word", "kind", "size"), [
+    ("dup", "instruction", 1), ("halt", "instruction", 1), ("lit", "argument", 0), ("if", "if", 0),
+    ("VARIABLE", "variable", 0), ('S"', "string", 4), ("loop:", "label", 0), (":", "label", 0),
+    ("0x1F", "hex", 4), ("42", "dec", 4), ("counter", "name", 4), ("0xZZ", "name", 4),
+])
+def test_classify(word, kind, size):
+    token = classify(word)
+    assert (token.kind, token.size) == (kind, size)
+    if kind in ("instruction", "argument", "if"):
+        assert token.opcode == Translator().word_to_opcode(word)